@@ -0,0 +1,5 @@
+"""
+QuickPurge benchmarks: seeded synthetic trees (synthetic.py) and a runner
+timing the scanner, database and exclusion paths (run.py).
+Run with `python -m benchmarks` from the repository root.
+"""
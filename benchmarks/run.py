@@ -0,0 +1,277 @@
+"""
+Scanner benchmark runner.
+
+    python -m benchmarks [--files 5000] [--seed 0] [--out results.json]
+
+Generates a seeded synthetic tree in a temp dir, then times
+scanner.scan_folder phase by phase (cold and warm hash cache), the database
+write / read paths, exclusion matching and chunked file reads. Prints one
+JSON document.
+"""
+import os
+import json
+import hashlib
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+import config
+from quickpurge import database, scanner, utils
+from quickpurge.metrics import peak_rss_bytes
+from quickpurge.exclusion_rules import should_exclude, get_matcher, ExclusionMatcher
+from .synthetic import generate_tree, SIZE_DISTRIBUTIONS
+
+MB = 1024 * 1024
+
+
+def _rate(count, seconds):
+    return round(count / seconds, 1) if seconds > 0 else None
+
+
+def _scratch_dir():
+    """
+    A fresh temp dir the scanner will actually walk. The default rules
+    protect /var, which is where macOS keeps its temp dirs, so those fall
+    back to the current directory, then the home directory.
+    """
+    matcher = ExclusionMatcher([])
+    for parent in (None, os.getcwd(), os.path.expanduser("~")):
+        path = tempfile.mkdtemp(prefix="quickpurge-bench-", dir=parent)
+        if not matcher.excludes_folder(path):
+            return path
+        os.rmdir(path)
+    raise RuntimeError("no temp dir outside the default exclusion rules; pass --workdir")
+
+
+def bench_scan(root, **scan_options):
+    """One scan_folder run; returns wall time per phase and throughput."""
+    marks = {}
+    done = {}
+
+    def on_progress(info):
+        stage = info.get("stage")
+        if stage == "hashing" and "hash" not in marks:
+            marks["hash"] = time.perf_counter()
+        elif stage == "done":
+            done.update(info)
+
+    start = time.perf_counter()
+    scan_id = scanner.scan_folder(root, on_progress=on_progress, **scan_options)
+    end = time.perf_counter()
+    hash_start = marks.get("hash", end)
+
+    stages = done.get("stages", {})
+    bytes_hashed = sum(st["bytes_read"] for st in stages.values())
+    walk_s = hash_start - start
+    hash_s = end - hash_start
+    total_s = end - start
+    return {
+        "scan_id": scan_id,
+        "seconds": {"walk": round(walk_s, 4), "hash": round(hash_s, 4), "total": round(total_s, 4)},
+        "files": done.get("files_scanned", 0),
+        "files_per_s": _rate(done.get("files_scanned", 0), total_s),
+        "walk_files_per_s": _rate(done.get("files_scanned", 0), walk_s),
+        "bytes_hashed": bytes_hashed,
+        "mb_per_s_hashed": _rate(bytes_hashed / MB, hash_s),
+        "duplicates": done.get("total_duplicates", 0),
+        "bytes_reclaimable": done.get("total_size_saved", 0),
+        "cache_hits": done.get("cache_hits", 0),
+        "stages": stages,
+        "phases": done.get("metrics", {}).get("phases", {}),  # scanner's own breakdown
+    }
+
+
+def bench_database(groups=2000, members=3, page_size=500):
+    """Time DuplicateWriter inserts, paged / full reads and hash cache lookups."""
+    scan_id = database.start_scan()
+    rows = groups * members
+
+    start = time.perf_counter()
+    with database.DuplicateWriter() as writer:
+        for g in range(groups):
+            writer.add_group(scan_id, f"{g:064x}", 1000 + g,
+                             [(f"/bench/{g}/{m}", float(m)) for m in range(members)])
+    write_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after, paged = None, 0
+    while True:
+        page = database.get_duplicates_page(scan_id, "size", True, after, page_size)
+        if not page:
+            break
+        paged += len(page)
+        after = (page[-1][-1], page[-1][0])
+    page_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    database.get_all_duplicates(scan_id)
+    all_s = time.perf_counter() - start
+
+    class _St:
+        st_dev = 1
+        st_mtime_ns = 1
+        st_ctime_ns = 1
+
+    stats = []
+    for i in range(rows):
+        st = _St()
+        st.st_ino, st.st_size = i, 1000 + i
+        stats.append(st)
+    with database.HashCache(scan_id) as cache:
+        for i, st in enumerate(stats):
+            cache.store(f"/bench/{i}", st, f"{i:064x}")
+        cache.flush()
+        start = time.perf_counter()
+        for st in stats:
+            cache.lookup(st)
+        lookup_s = time.perf_counter() - start
+
+    return {
+        "rows": rows,
+        "write_rows_per_s": _rate(rows, write_s),
+        "page_rows_per_s": _rate(paged, page_s),
+        "get_all_duplicates_s": round(all_s, 4),
+        "cache_lookups_per_s": _rate(rows, lookup_s),
+    }
+
+
+def bench_exclusions(root, repeat=3):
+    """Time should_exclude() and the compiled matcher over every path of the tree."""
+    database.add_exclusion(os.path.join(root, "d0_0", "d1_1"))
+    database.add_exclusion(os.path.join(root, "does-not-exist"))
+    database.add_exclusion(".tmp", is_folder=False)
+    paths = [os.path.join(d, f) for d, _, files in os.walk(root) for f in files]
+    calls = len(paths) * repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for p in paths:
+            should_exclude(p)
+    should_s = time.perf_counter() - start
+
+    matcher = get_matcher()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for p in paths:
+            matcher.excludes(p)
+    matcher_s = time.perf_counter() - start
+    return {
+        "calls": calls,
+        "should_exclude_per_s": _rate(calls, should_s),
+        "matcher_excludes_per_s": _rate(calls, matcher_s),
+    }
+
+
+def bench_reads(workdir, size=32 * MB, chunk_size=MB):
+    """Read throughput of utils.file_chunks vs. file_buffers (serial / threaded) over one file."""
+    path = os.path.join(workdir, "reads.bin")
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+    readers = {
+        "file_chunks": lambda f: utils.file_chunks(f, chunk_size),
+        "file_buffers_serial": lambda f: utils.file_buffers(f, chunk_size, threaded=False),
+        "file_buffers_threaded": lambda f: utils.file_buffers(f, chunk_size, threaded=True),
+    }
+    results = {"bytes": size, "chunk_size": chunk_size}
+    for name, chunks in readers.items():
+        h = hashlib.blake2b()
+        start = time.perf_counter()
+        with open(path, "rb", buffering=0) as f:
+            for data in chunks(f):
+                h.update(data)
+        results[f"{name}_mb_per_s"] = _rate(size / MB, time.perf_counter() - start)
+    os.remove(path)
+    return results
+
+
+def run_benchmarks(files=5000, seed=0, size_dist="lognormal", mean_size=64 * 1024,
+                   dup_ratio=0.2, same_size_ratio=0.1, hardlink_share=0.05, depth=3,
+                   fanout=4, workers=config.HASH_WORKERS, pool=config.HASH_POOL,
+                   algorithm=config.HASH_ALGORITHM, workdir=None, keep=False):
+    """Run every benchmark in a scratch directory and return the results dict."""
+    params = dict(files=files, seed=seed, size_dist=size_dist, mean_size=mean_size,
+                  dup_ratio=dup_ratio, same_size_ratio=same_size_ratio,
+                  hardlink_share=hardlink_share, depth=depth, fanout=fanout,
+                  workers=workers, pool=pool, algorithm=algorithm)
+    workdir = workdir or _scratch_dir()
+    tree = os.path.join(workdir, "tree")
+    saved = (config.DB_PATH, utils.LOG_STREAM, utils.NOTIFICATIONS)
+    utils.LOG_STREAM = open(os.devnull, "w")
+    utils.NOTIFICATIONS = False
+    try:
+        start = time.perf_counter()
+        manifest = generate_tree(tree, files=files, seed=seed, size_dist=size_dist,
+                                 mean_size=mean_size, dup_ratio=dup_ratio,
+                                 same_size_ratio=same_size_ratio,
+                                 hardlink_share=hardlink_share, depth=depth, fanout=fanout)
+        manifest["generate_s"] = round(time.perf_counter() - start, 4)
+
+        config.DB_PATH = os.path.join(workdir, "scan.db")
+        database.init_db()
+        options = dict(workers=workers, pool=pool, algorithm=algorithm)
+        scan = {
+            "cold": bench_scan(tree, **options),   # empty hash cache
+            "warm": bench_scan(tree, **options),   # unchanged tree, cache hits
+        }
+        if not scan["cold"]["files"]:
+            raise RuntimeError(f"the scan found no files under {tree}; is it excluded?")
+        exclusions = bench_exclusions(tree)
+        reads = bench_reads(workdir)
+
+        config.DB_PATH = os.path.join(workdir, "bench.db")
+        database.init_db()
+        db = bench_database(groups=max(1, files // 3))
+    finally:
+        utils.LOG_STREAM.close()
+        config.DB_PATH, utils.LOG_STREAM, utils.NOTIFICATIONS = saved
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "params": params,
+        "tree": manifest,
+        "scan": scan,
+        "database": db,
+        "exclusions": exclusions,
+        "reads": reads,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size-dist", choices=SIZE_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--mean-size", type=int, default=64 * 1024, help="bytes")
+    parser.add_argument("--dup-ratio", type=float, default=0.2)
+    parser.add_argument("--same-size-ratio", type=float, default=0.1)
+    parser.add_argument("--hardlink-share", type=float, default=0.05)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=config.HASH_WORKERS)
+    parser.add_argument("--pool", choices=("thread", "process"), default=config.HASH_POOL)
+    parser.add_argument("--algorithm", default=config.HASH_ALGORITHM)
+    parser.add_argument("--workdir", help="where to build the tree (default: a temp dir the scanner walks)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated tree and DBs")
+    parser.add_argument("--out", help="also write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        files=args.files, seed=args.seed, size_dist=args.size_dist, mean_size=args.mean_size,
+        dup_ratio=args.dup_ratio, same_size_ratio=args.same_size_ratio,
+        hardlink_share=args.hardlink_share, depth=args.depth, fanout=args.fanout,
+        workers=args.workers, pool=args.pool, algorithm=args.algorithm,
+        workdir=args.workdir, keep=args.keep,
+    )
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0
@@ -0,0 +1,99 @@
+"""
+Seeded synthetic directory trees for benchmarks.
+The same arguments (and seed) always produce the same paths, sizes and bytes.
+"""
+import os
+import random
+
+SIZE_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+
+def _pick_size(rng, dist, mean_size, max_size):
+    if dist == "fixed":
+        size = mean_size
+    elif dist == "uniform":
+        size = rng.randint(0, 2 * mean_size)
+    elif dist == "lognormal":
+        # sigma 1.5: mostly small files with a long tail of big ones, like a home dir
+        size = int(rng.lognormvariate(0, 1.5) * mean_size / 3.08)  # exp(1.5**2 / 2) ~ 3.08
+    else:
+        raise ValueError(f"Unknown size distribution: {dist!r} (use one of {SIZE_DISTRIBUTIONS})")
+    # at least 1 byte: empty files would all be duplicates of each other
+    return max(1, min(size, max_size))
+
+
+def _dir_paths(root, depth, fanout):
+    """All directories of a tree `depth` levels deep with `fanout` children each."""
+    dirs = [root]
+    level = [root]
+    for d in range(depth):
+        level = [os.path.join(parent, f"d{d}_{i}") for parent in level for i in range(fanout)]
+        dirs.extend(level)
+    return dirs
+
+
+def generate_tree(root, files=1000, seed=0, size_dist="lognormal", mean_size=64 * 1024,
+                  max_size=64 * 1024 * 1024, dup_ratio=0.2, same_size_ratio=0.1,
+                  hardlink_share=0.05, depth=3, fanout=4):
+    """
+    Write a synthetic tree under `root` and return its manifest.
+    - dup_ratio: share of files that are byte-identical copies of an earlier file
+    - same_size_ratio: share with an existing file's size but different bytes
+      (exercises the sample / full hashing stages)
+    - hardlink_share: share created as hardlinks to an earlier file
+    - depth / fanout: shape of the directory tree files are spread over
+    """
+    rng = random.Random(seed)
+    dirs = _dir_paths(root, depth, fanout)
+    for d in dirs:
+        os.makedirs(d, exist_ok=True)
+
+    manifest = {
+        "seed": seed,
+        "files": 0,
+        "bytes": 0,
+        "duplicates": 0,
+        "same_size": 0,
+        "hardlinks": 0,
+        "dirs": len(dirs),
+    }
+    originals = []  # (path, size, content seed)
+    for n in range(files):
+        path = os.path.join(rng.choice(dirs), f"f{n:07d}.bin")
+        roll = rng.random()
+        kind = "unique"
+        if originals and roll < hardlink_share:
+            kind = "hardlink"
+        elif originals and roll < hardlink_share + dup_ratio:
+            kind = "duplicate"
+        elif originals and roll < hardlink_share + dup_ratio + same_size_ratio:
+            kind = "same_size"
+
+        if kind == "hardlink":
+            src = rng.choice(originals)[0]
+            try:
+                os.link(src, path)
+                manifest["hardlinks"] += 1
+                manifest["files"] += 1
+                continue
+            except OSError:
+                kind = "duplicate"  # no hardlink support here; fall back to a copy
+
+        if kind == "duplicate":
+            _, size, content_seed = rng.choice(originals)
+            manifest["duplicates"] += 1
+        elif kind == "same_size":
+            size = rng.choice(originals)[1]
+            content_seed = rng.getrandbits(64)
+            manifest["same_size"] += 1
+        else:
+            size = _pick_size(rng, size_dist, mean_size, max_size)
+            content_seed = rng.getrandbits(64)
+
+        with open(path, "wb") as f:
+            f.write(random.Random(content_seed).randbytes(size))
+        if kind != "duplicate":
+            originals.append((path, size, content_seed))
+        manifest["files"] += 1
+        manifest["bytes"] += size
+    return manifest
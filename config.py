@@ -15,14 +15,36 @@ DB_PATH = os.path.join(BASE_DIR, "quickpurge.db")
 ARCHIVE_DIR = os.path.join(BASE_DIR, "archive")
 THUMBNAIL_CACHE = os.path.join(BASE_DIR, "assets", "thumbnails")
 
-# Ensure required folders exist
-os.makedirs(ARCHIVE_DIR, exist_ok=True)
-os.makedirs(THUMBNAIL_CACHE, exist_ok=True)
+
+
+def ensure_dirs():
+    """Create the app's data folders (called at startup, never at import)."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    os.makedirs(THUMBNAIL_CACHE, exist_ok=True)
+
 
 # ------------------------
 # Hashing Settings
 # ------------------------
 HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB chunks to save memory
+HASH_ALGORITHM = "blake2b"  # see quickpurge.hashing.HASH_BACKENDS
+HASH_WORKERS = min(4, os.cpu_count() or 1)  # parallel hashing jobs (1 = sequential)
+HASH_POOL = "thread"  # "thread" or "process"
+ARCHIVE_WORKERS = 4  # parallel moves in bulk archive / restore (safe_delete.archive_many)
+ARCHIVE_BATCH = 500  # files per manifest transaction in bulk archive / restore
+ARCHIVE_MOUNT_ROOTS = True  # archive into a hidden .quickpurge_archive on each file's own filesystem
+ARCHIVE_DEDUP = False  # content-addressed archive: one stored blob per digest, shared by every copy
+WALK_THREADS = min(4, os.cpu_count() or 1)  # threads listing directories (1 = serial)
+CHECKPOINT_INTERVAL = 30  # seconds between scan checkpoints while walking (see resume_scan)
+INCREMENTAL_SCAN = False  # reuse listings of directories unchanged since the last scan
+FULL_VERIFY_INTERVAL = 7 * 24 * 3600  # seconds; incremental scans re-list everything this often
+
+# ------------------------
+# Startup
+# ------------------------
+# PRAGMA quick_check runs on every launch; the full integrity_check only
+# when the last one is older than this.
+INTEGRITY_CHECK_INTERVAL = 7 * 24 * 3600  # seconds
 
 # ------------------------
 # AMD Adrenalin Theme Colors
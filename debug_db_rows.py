@@ -1,5 +1,6 @@
 from quickpurge import database
-from quickpurge.database import DB_PATH, get_all_duplicates
+from config import DB_PATH
+from quickpurge.database import get_all_duplicates
 import sqlite3, pprint
 
 conn = sqlite3.connect(DB_PATH)
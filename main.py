@@ -4,17 +4,21 @@ import time
 import logging
 import sqlite3
 import PySimpleGUI as sg
-from quickpurge.exclusion_rules import should_exclude
 
-# Import your package modules
-from quickpurge import database, utils, ui, thumbnail   # ✅ added thumbnail
-from quickpurge.safe_delete import ensure_archive_folder
-from quickpurge.database import DB_PATH
+import config
+# Import your package modules (ui is imported in main(), behind the splash)
+from quickpurge import database, utils, thumbnail   # ✅ added thumbnail
+from quickpurge.safe_delete import ensure_archive_folder, ensure_manifest
+from config import DB_PATH
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 
 def show_loading_screen():
+    """
+    Open the splash window and return it. It stays up only while
+    initialize() runs (see update_loading_screen / close_loading_screen).
+    """
     sg.theme("DarkGrey14")
 
     layout = [
@@ -54,58 +58,60 @@ def show_loading_screen():
         icon=thumbnail.get_app_icon(),   # ✅ added icon here
     )
 
-    progress_bar = window["-PROGRESS-"]
-    total_duration = 3.0  # seconds total for loading (shorter)
-    fade_duration = 0.8
-    start_time = time.time()
-
-    while True:
-        now = time.time()
-        elapsed = now - start_time
-        if elapsed > total_duration:
-            elapsed = total_duration
-
-        progress = int((elapsed / total_duration) * 100)
-        progress_bar.UpdateBar(progress)
-
-        # optional fade
-        fade_start = total_duration - fade_duration
-        if elapsed >= fade_start:
-            fade_progress = (elapsed - fade_start) / fade_duration
-            alpha = max(0.0, min(1.0, fade_progress))
-            try:
-                window.TKroot.attributes("-alpha", alpha)
-            except Exception:
-                pass
-
-        event, _ = window.read(timeout=100)
-        if event in (sg.WIN_CLOSED, "Exit"):
-            window.close()
-            return
-
-        if elapsed >= total_duration:
-            break
+    return window
+
+
+def update_loading_screen(window, percent):
+    """Advance the splash progress bar (no-op if the splash failed to open)."""
+    if window is None:
+        return
+    try:
+        window["-PROGRESS-"].UpdateBar(percent)
+        window.read(timeout=0)  # let Tk repaint
+    except Exception:
+        pass
+
 
+def close_loading_screen(window):
+    if window is None:
+        return
     try:
-        window.TKroot.attributes("-alpha", 1.0)
+        window.close()
     except Exception:
         pass
 
-    window.close()
+
+def full_check_due(db_path):
+    """True when the last full integrity_check is older than config.INTEGRITY_CHECK_INTERVAL."""
+    if not os.path.exists(db_path):
+        return False  # nothing to check; init_db creates it
+    try:
+        conn = sqlite3.connect(db_path, timeout=10)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'last_integrity_check'").fetchone()
+        finally:
+            conn.close()
+        last = int(row[0]) if row else 0
+    except Exception:
+        last = 0
+    return time.time() - last >= config.INTEGRITY_CHECK_INTERVAL
 
 
-def check_db_integrity(db_path):
-    """Run PRAGMA integrity_check() and return (True, "ok") if ok else (False, details)."""
+def check_db_integrity(db_path, full=False):
+    """
+    Run PRAGMA quick_check (or the much slower integrity_check when `full`)
+    and return (True, "ok") if ok else (False, details).
+    """
     try:
         if not os.path.exists(db_path):
             # No DB -> treat as OK (will be created by init_db)
             return True, "no_db"
         conn = sqlite3.connect(db_path, timeout=10)
         cur = conn.cursor()
-        cur.execute("PRAGMA integrity_check;")
+        cur.execute("PRAGMA integrity_check;" if full else "PRAGMA quick_check;")
         rows = cur.fetchall()
         conn.close()
-        # integrity_check returns [('ok',)]
+        # quick_check / integrity_check return [('ok',)]
         if rows and rows[0][0] == "ok":
             return True, "ok"
         return False, rows
@@ -114,24 +120,31 @@ def check_db_integrity(db_path):
         return False, str(e)
 
 
-def initialize():
+def initialize(progress=None):
     """
     Initialization logic:
-     - create app archive folder using same helper as rest of app
+     - create app data / archive folders using same helper as rest of app
      - initialize DB schema
-     - verify DB integrity and offer to reset it if corrupted
-     - clear transient duplicates so UI starts fresh (keeps scan history)
+     - verify DB integrity (quick_check; full check on a schedule) and offer to reset it if corrupted
+     - prune old duplicate rows (keeps scan history, the latest results and resumable scans)
      - log app start
+    `progress(percent)` is called between steps (drives the splash screen).
     """
+    progress = progress or (lambda percent: None)
+
     # ensure archive exists (same folder used by safe_delete)
     try:
+        config.ensure_dirs()
         ensure_archive_folder()
     except Exception as e:
         logging.warning("Could not ensure archive folder: %s", e)
+    progress(20)
 
     # check DB integrity before init
     try:
-        ok, info = check_db_integrity(DB_PATH)
+        full = full_check_due(DB_PATH)
+        ok, info = check_db_integrity(DB_PATH, full=full)
+        progress(60)
         if not ok:
             # Ask user whether to rename/reset DB (preserve copy as .corrupt.bak)
             msg = (
@@ -157,31 +170,40 @@ def initialize():
 
         # Initialize/create DB schema (safe to call repeatedly)
         database.init_db()
+        ensure_manifest()  # older archives: .meta.json sidecars -> archive_entries
+        if full and ok:
+            database.set_meta("last_integrity_check", int(time.time()))
     except Exception as e:
         logging.exception("Database initialization failed: %s", e)
         sg.popup_error(f"Database initialization failed:\n{e}", keep_on_top=True)
 
-    # Ensure the transient duplicates table is empty at startup so UI is ready for a fresh scan.
-    # This preserves the scans history while clearing any leftover duplicate rows that caused
-    # previous 'expected 2 values' problems when old rows lingered.
+    # Drop duplicate rows of superseded scans. Scans with a checkpoint keep
+    # theirs so they can be resumed (see scanner.resume_scan).
     try:
-        database.clear_duplicates()
-        logging.debug("Cleared transient duplicates table at startup.")
+        database.prune_scan_results()
+        logging.debug("Pruned old duplicate rows at startup.")
     except Exception as e:
-        logging.exception("Failed to clear duplicates at startup: %s", e)
+        logging.exception("Failed to prune duplicates at startup: %s", e)
+    progress(90)
 
     utils.log("QuickPurge started.")
 
 
 def main():
-    # show a brief loading screen
+    # the loading screen is shown only while initialization actually runs
+    splash = None
     try:
-        show_loading_screen()
+        splash = show_loading_screen()
     except Exception:
         # fail gracefully; don't block app start for loading screen issues
         logging.debug("Loading screen failed or was closed.")
 
-    initialize()
+    try:
+        initialize(progress=lambda percent: update_loading_screen(splash, percent))
+        from quickpurge import ui  # the GUI module is the heaviest import; load it behind the splash
+        update_loading_screen(splash, 100)
+    finally:
+        close_loading_screen(splash)
 
     # run the UI (blocks until user exits)
     try:
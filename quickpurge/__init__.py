@@ -6,9 +6,24 @@ Expose main modules for convenient imports in tests and other code.
 __version__ = "1.0.0"
 __author__ = "KuzuiYaridomi"
 
-# Re-export package submodules but DO NOT import UI at package import time
-from . import scanner, database, safe_delete, utils, exclusion_rules, thumbnail, history
-# Note: ui is intentionally NOT imported here to avoid GUI dependency during tests
+import importlib
+
+# Submodules are imported lazily on first attribute access (quickpurge.scanner
+# etc.), so `import quickpurge` stays cheap and pulls in no optional
+# dependencies. Note: ui is intentionally NOT listed here to avoid a GUI
+# dependency during tests; import quickpurge.ui explicitly.
+_SUBMODULES = ("scanner", "database", "safe_delete", "utils", "exclusion_rules", "thumbnail", "history")
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_SUBMODULES))
+
 
 __all__ = [
     "scanner",
@@ -0,0 +1,6 @@
+"""python -m quickpurge: the headless CLI (see quickpurge.cli)."""
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,398 @@
+"""
+Headless command line interface (no PySimpleGUI / Tk).
+
+    quickpurge scan PATH... [--workers N] [--pool thread|process] [--algorithm NAME] [--incremental]
+    quickpurge resume [SCAN_ID] | --list     (continue an interrupted scan)
+    quickpurge watch PATH... [--backend auto|inotify|poll] (until Ctrl-C)
+    quickpurge report [--scan-id N] [--limit N]
+    quickpurge archive PATH... | -          (paths from stdin, one per line)
+    quickpurge restore ARCHIVED_FILE... | --all
+    quickpurge history [--limit N]
+
+Results are written to stdout as NDJSON (one JSON object per line, each with
+a "type" field); progress and logs go to stderr.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+
+import config
+from . import database, history, scanner, utils, safe_delete
+from .hashing import HASH_BACKENDS
+
+# Exit codes
+EXIT_OK = 0
+EXIT_DUPLICATES = 1   # scan --fail-on-duplicates found duplicates
+EXIT_USAGE = 2        # bad arguments (argparse uses 2 as well)
+EXIT_PARTIAL = 3      # some archive / restore operations failed
+EXIT_NOT_FOUND = 4    # no such scan / nothing to report
+EXIT_INTERRUPTED = 130
+
+
+def _write(obj, out=None):
+    """Write one NDJSON record to stdout."""
+    out = out or sys.stdout
+    out.write(json.dumps(obj) + "\n")
+    out.flush()
+
+
+class _ProgressPrinter:
+    """on_progress callback printing throttled status lines to stderr."""
+
+    def __init__(self, stream=None, interval=0.5, enabled=True):
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.enabled = enabled
+        self._last = 0.0
+
+    def __call__(self, info):
+        if not self.enabled:
+            return
+        stage = info.get("stage")
+        if stage in ("group_found", "group_extended"):
+            return
+        now = time.monotonic()
+        if stage in ("grouping", "hashing") and now - self._last < self.interval:
+            return
+        self._last = now
+        if stage == "done":
+            line = (f"done: {info.get('files_scanned', 0)} files, "
+                    f"{info.get('total_duplicates', 0)} duplicates, "
+                    f"{info.get('total_size_saved', 0)} bytes reclaimable")
+        elif stage in ("archive", "restore"):
+            line = f"{stage}: {info.get('done', 0)}/{info.get('total', 0)} ({info.get('failed', 0)} failed)"
+            if info.get("copied"):
+                line += f", {info['copied']} copied across filesystems"
+        elif stage == "watch_update":
+            line = f"changed: {len(info.get('paths', []))} copies of {info.get('size', 0)} bytes"
+        elif stage in ("grouping", "hashing"):
+            line = f"{stage}: {info.get('files_scanned', 0)}/{info.get('total_files', 0)} {info.get('path', '')}"
+        else:
+            detail = info.get("folder") or info.get("drive") or ""
+            line = f"{stage}: {detail}"
+        print(line, file=self.stream, flush=True)
+
+
+def _positive_int(text):
+    """argparse type: an integer >= 1."""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+
+def _positive_float(text):
+    """argparse type: a number > 0."""
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {text}")
+    return value
+
+
+def _latest_scan_id():
+    rows = database.get_scan_history(limit=1)
+    return rows[0][0] if rows else None
+
+
+def _write_groups(scan_id, limit=None):
+    """Write one "group" record per duplicate group; returns the number written."""
+    groups = database.get_duplicate_groups(scan_id, limit=limit)
+    for group_id, digest, size, count, wasted in groups:
+        _write({
+            "type": "group",
+            "scan_id": scan_id,
+            "digest": digest,
+            "size": size,
+            "member_count": count,
+            "wasted_bytes": wasted,
+            "paths": [path for path, _ in database.get_group_members(group_id)],
+        })
+    return len(groups)
+
+
+def _write_hardlinks(scan_id):
+    """Write one "hardlinks" record per inode reached through several paths; returns the number written."""
+    sets = database.get_hardlink_sets(scan_id)
+    for paths, size in sets:
+        _write({"type": "hardlinks", "scan_id": scan_id, "size": size, "paths": paths})
+    return len(sets)
+
+
+def _run(scan, args):
+    """
+    Run scan(on_progress, cancel_flag) and write its groups and summary.
+    Ctrl-C cancels the scan cleanly: it is checkpointed and the summary
+    carries the resume_scan_id for `quickpurge resume`.
+    """
+    progress = _ProgressPrinter(enabled=not args.quiet)
+    done = {}
+
+    def on_progress(info):
+        if info.get("stage") == "done":
+            done.update(info)
+        progress(info)
+
+    cancel = {"cancel": False}
+
+    def on_sigint(signum, frame):
+        if cancel["cancel"]:
+            raise KeyboardInterrupt  # second Ctrl-C: stop without waiting
+        cancel["cancel"] = True
+        print("interrupt: saving checkpoint (Ctrl-C again to abort)", file=sys.stderr, flush=True)
+
+    try:
+        previous = signal.signal(signal.SIGINT, on_sigint)
+    except ValueError:
+        previous = False  # not the main thread; Ctrl-C stays a KeyboardInterrupt
+    try:
+        scan_id = scan(on_progress, cancel)
+    except KeyboardInterrupt:
+        _write({"type": "summary", "status": "interrupted"})
+        return EXIT_INTERRUPTED
+    finally:
+        if previous is not False:
+            signal.signal(signal.SIGINT, previous)
+    if scan_id is None:
+        _write({"type": "summary", "status": "cancelled", "resume_scan_id": done.get("resume_scan_id")})
+        return EXIT_INTERRUPTED
+
+    _write_groups(scan_id)
+    _write_hardlinks(scan_id)
+    done.pop("stage", None)
+    _write(dict(done, type="summary", status="ok", scan_id=scan_id))
+    if getattr(args, "fail_on_duplicates", False) and done.get("total_duplicates"):
+        return EXIT_DUPLICATES
+    return EXIT_OK
+
+
+def cmd_scan(args):
+    for path in args.paths:
+        if not os.path.isdir(path):
+            print(f"quickpurge: not a directory: {path}", file=sys.stderr)
+            return EXIT_NOT_FOUND
+    return _run(lambda on_progress, cancel_flag: scanner.scan_folder(
+        args.paths,
+        on_progress=on_progress,
+        cancel_flag=cancel_flag,
+        workers=args.workers,
+        pool=args.pool,
+        walk_threads=args.walk_threads,
+        algorithm=args.algorithm,
+        incremental=args.incremental,
+    ), args)
+
+
+def cmd_resume(args):
+    resumable = database.get_resumable_scans()
+    if args.list:
+        for scan_id, timestamp, phase, folders, updated_at in resumable:
+            _write({"type": "resumable", "scan_id": scan_id, "timestamp": timestamp,
+                    "phase": phase, "folders": folders, "updated_at": updated_at})
+        return EXIT_OK
+    scan_id = args.scan_id or (resumable[0][0] if resumable else None)
+    if scan_id is None or database.load_checkpoint(scan_id) is None:
+        print("quickpurge: no interrupted scan to resume", file=sys.stderr)
+        return EXIT_NOT_FOUND
+    return _run(lambda on_progress, cancel_flag: scanner.resume_scan(
+        scan_id,
+        on_progress=on_progress,
+        cancel_flag=cancel_flag,
+        workers=args.workers,
+        pool=args.pool,
+        walk_threads=args.walk_threads,
+    ), args)
+
+
+def cmd_watch(args):
+    from .watcher import Watcher
+    for path in args.paths:
+        if not os.path.isdir(path):
+            print(f"quickpurge: not a directory: {path}", file=sys.stderr)
+            return EXIT_NOT_FOUND
+    progress = _ProgressPrinter(enabled=not args.quiet)
+    w = Watcher(args.paths, backend=args.backend, poll_interval=args.interval,
+                on_progress=progress, workers=args.workers, pool=args.pool,
+                walk_threads=args.walk_threads, algorithm=args.algorithm)
+    try:
+        scan_id = w.start()
+        if scan_id is None:
+            return EXIT_INTERRUPTED
+        _write_groups(scan_id)
+        _write({"type": "watching", "scan_id": scan_id, "paths": w.roots})
+        while True:
+            for change in w.step(timeout=1.0):
+                _write(dict(change, type="group_update", scan_id=scan_id,
+                            member_count=len(change["paths"])))
+    except KeyboardInterrupt:
+        return EXIT_OK  # Ctrl-C is the normal way to stop watching
+    finally:
+        w.close()
+
+
+def cmd_report(args):
+    scan_id = args.scan_id or _latest_scan_id()
+    if scan_id is None:
+        print("quickpurge: no scans recorded yet", file=sys.stderr)
+        return EXIT_NOT_FOUND
+    if not database.scan_exists(scan_id):
+        print(f"quickpurge: no such scan: {scan_id}", file=sys.stderr)
+        return EXIT_NOT_FOUND
+    _write_groups(scan_id, limit=args.limit)
+    _write_hardlinks(scan_id)
+    return EXIT_OK
+
+
+def _read_paths(paths):
+    if paths == ["-"]:
+        return [line.rstrip("\n") for line in sys.stdin if line.strip()]
+    return paths
+
+
+def _write_bulk(results, record_type, key):
+    """One NDJSON record per archive_many / restore_many result; returns the failure count."""
+    failed = 0
+    for r in results:
+        record = {"type": record_type, key: r[key], "ok": r["ok"]}
+        if r.get("copied"):
+            record["copied"] = True  # crossed filesystems: a full copy, not a rename
+        if r.get("deduplicated"):
+            record["deduplicated"] = True  # content already in the archive; nothing stored
+        if not r["ok"]:
+            record["error"] = r["error"]
+            failed += 1
+        _write(record)
+    return failed
+
+
+def cmd_archive(args):
+    scan_id = args.scan_id or _latest_scan_id()
+    paths = [os.path.abspath(path) for path in _read_paths(args.paths)]
+    results = safe_delete.archive_many(paths, scan_id=scan_id, workers=args.workers, dedup=args.dedup,
+                                       on_progress=_ProgressPrinter(enabled=not args.quiet))
+    return EXIT_PARTIAL if _write_bulk(results, "archived", "path") else EXIT_OK
+
+
+def cmd_restore(args):
+    if args.all:
+        files = [entry[1] for entry in database.iter_archive_entries()]
+    else:
+        files = _read_paths(args.files)
+    results = safe_delete.restore_many(files, workers=args.workers,
+                                       on_progress=_ProgressPrinter(enabled=not args.quiet))
+    return EXIT_PARTIAL if _write_bulk(results, "restored", "archive_path") else EXIT_OK
+
+
+def cmd_history(args):
+    for record in history.get_scan_history(limit=args.limit):
+        _write(dict(record, type="scan"))
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="quickpurge",
+        description="Find and archive duplicate files without the GUI. "
+                    "Results are NDJSON on stdout; progress goes to stderr.",
+    )
+    parser.add_argument("--db", help=f"SQLite database (default: {config.DB_PATH})")
+    parser.add_argument("-v", "--verbose", action="store_true", help="also write log messages to stderr")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("scan", help="scan folders for duplicates")
+    p.add_argument("paths", nargs="+", metavar="PATH")
+    p.add_argument("--workers", type=_positive_int, default=config.HASH_WORKERS, help="parallel hashing jobs")
+    p.add_argument("--pool", choices=("thread", "process"), default=config.HASH_POOL)
+    p.add_argument("--walk-threads", type=_positive_int, default=config.WALK_THREADS)
+    p.add_argument("--algorithm", choices=sorted(HASH_BACKENDS), default=config.HASH_ALGORITHM)
+    p.add_argument("--incremental", action=argparse.BooleanOptionalAction, default=config.INCREMENTAL_SCAN,
+                   help="reuse listings of directories unchanged since the last scan")
+    p.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    p.add_argument("--fail-on-duplicates", action="store_true",
+                   help=f"exit with {EXIT_DUPLICATES} when duplicates are found")
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser("resume", help="continue a cancelled or interrupted scan")
+    p.add_argument("scan_id", nargs="?", type=int, metavar="SCAN_ID", help="default: most recent")
+    p.add_argument("--list", action="store_true", help="list resumable scans instead")
+    p.add_argument("--workers", type=_positive_int, default=config.HASH_WORKERS, help="parallel hashing jobs")
+    p.add_argument("--pool", choices=("thread", "process"), default=config.HASH_POOL)
+    p.add_argument("--walk-threads", type=_positive_int, default=config.WALK_THREADS)
+    p.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    p.set_defaults(func=cmd_resume)
+
+    p = sub.add_parser("watch", help="scan, then keep the duplicate groups live as files change")
+    p.add_argument("paths", nargs="+", metavar="PATH")
+    p.add_argument("--backend", choices=("auto", "inotify", "poll"), default="auto",
+                   help="inotify on Linux, else polling (default: auto)")
+    p.add_argument("--interval", type=_positive_float, default=2.0, help="seconds between polls (poll backend)")
+    p.add_argument("--workers", type=_positive_int, default=config.HASH_WORKERS, help="parallel hashing jobs")
+    p.add_argument("--pool", choices=("thread", "process"), default=config.HASH_POOL)
+    p.add_argument("--walk-threads", type=_positive_int, default=config.WALK_THREADS)
+    p.add_argument("--algorithm", choices=sorted(HASH_BACKENDS), default=config.HASH_ALGORITHM)
+    p.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("report", help="print the duplicate groups of a scan")
+    p.add_argument("--scan-id", type=int, help="default: latest scan")
+    p.add_argument("--limit", type=_positive_int, help="only the N most wasteful groups")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("archive", help="move files to the archive (restorable)")
+    p.add_argument("paths", nargs="+", metavar="PATH", help="files to archive, or - to read them from stdin")
+    p.add_argument("--scan-id", type=int, help="scan whose results are updated (default: latest)")
+    p.add_argument("--workers", type=_positive_int, default=config.ARCHIVE_WORKERS, help="parallel moves")
+    p.add_argument("--dedup", action=argparse.BooleanOptionalAction, default=config.ARCHIVE_DEDUP,
+                   help="store each distinct content once (content-addressed archive)")
+    p.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser("restore", help="move archived files back to their original paths")
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument("files", nargs="*", default=[], metavar="ARCHIVED_FILE")
+    group.add_argument("--all", action="store_true", help="restore everything in the archive")
+    p.add_argument("--workers", type=_positive_int, default=config.ARCHIVE_WORKERS, help="parallel moves")
+    p.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser("history", help="list recent scans")
+    p.add_argument("--limit", type=_positive_int, default=20)
+    p.set_defaults(func=cmd_history)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "restore" and not args.all and not args.files:
+        print("quickpurge restore: give ARCHIVED_FILE... or --all", file=sys.stderr)
+        return EXIT_USAGE
+    if args.command == "watch" and args.backend == "inotify" and not sys.platform.startswith("linux"):
+        print("quickpurge watch: the inotify backend is only available on Linux", file=sys.stderr)
+        return EXIT_USAGE
+
+    # stdout carries NDJSON only
+    devnull = None if args.verbose else open(os.devnull, "w")
+    saved_stream = utils.LOG_STREAM
+    utils.LOG_STREAM = devnull or sys.stderr
+    utils.NOTIFICATIONS = False
+    if args.db:
+        config.DB_PATH = os.path.abspath(args.db)
+
+    try:
+        database.init_db()
+        safe_delete.ensure_manifest()
+        # arguments are validated above and by the parser; anything raised
+        # from here on is a real failure, not a usage error
+        return args.func(args)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    finally:
+        utils.LOG_STREAM = saved_stream
+        if devnull is not None:
+            devnull.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,27 @@
 import logging, traceback
+import itertools
+import json
 import sqlite3
 import os
 import time
 
-from config import DB_PATH
+import config
 
 def get_connection():
     # allow cross-thread use + wait for lock release
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+    # (read config.DB_PATH at call time so tests can point it at a temp DB)
+    conn = sqlite3.connect(config.DB_PATH, timeout=30, check_same_thread=False)
     conn.execute("PRAGMA journal_mode=WAL;")  # better concurrency
     return conn
 
+def _table_columns(cur, table):
+    return [row[1] for row in cur.execute(f"PRAGMA table_info({table})")]
+
+def _ensure_column(cur, table, column, decl):
+    """Add `column` to an existing table (init_db's forward migration)."""
+    if column not in _table_columns(cur, table):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
 def init_db():
     conn = get_connection()
     cur = conn.cursor()
@@ -25,8 +36,46 @@ def init_db():
             file_size INTEGER
         )
     """)
+    # 0 = unknown: sorted on the bare column so idx_dup_mtime serves ORDER BY
+    _ensure_column(cur, "duplicates", "file_mtime", "REAL NOT NULL DEFAULT 0")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_hash ON duplicates(file_hash)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_scan ON duplicates(scan_id)")
+    # keyset pagination indexes for the duplicates table view
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_dup_size ON duplicates(scan_id, file_size, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_dup_path ON duplicates(scan_id, file_path, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_dup_mtime ON duplicates(scan_id, file_mtime, id)")
+
+    # --- Duplicate groups (one row per digest; duplicates rows are its members) ---
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS dup_groups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_id INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            member_count INTEGER NOT NULL,
+            wasted_bytes INTEGER NOT NULL
+        )
+    """)
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_groups_key ON dup_groups(scan_id, digest, size)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_groups_wasted ON dup_groups(scan_id, wasted_bytes)")
+    _ensure_column(cur, "duplicates", "group_id", "INTEGER")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_dup_group ON duplicates(group_id)")
+    # the group's wasted_bytes, copied onto each member for the "wasted" sort
+    _ensure_column(cur, "duplicates", "group_wasted", "INTEGER NOT NULL DEFAULT 0")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_dup_wasted ON duplicates(scan_id, group_wasted, id)")
+
+    # --- Hardlinks (paths sharing one inode; reported apart from real copies) ---
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS hardlinks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_id INTEGER,
+            st_dev INTEGER,
+            st_ino INTEGER,
+            file_path TEXT,
+            file_size INTEGER
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_hardlinks_scan ON hardlinks(scan_id, st_dev, st_ino)")
 
     # --- Scans (history) table ---
     cur.execute("""
@@ -38,6 +87,10 @@ def init_db():
             total_size_saved INTEGER
         )
     """)
+    # rows from before hash_algo existed were hashed with SHA-256
+    _ensure_column(cur, "scans", "hash_algo", "TEXT DEFAULT 'sha256'")
+    # JSON blob of per-phase timings and counters (quickpurge.metrics.ScanMetrics)
+    _ensure_column(cur, "scans", "metrics", "TEXT")
 
     # add a small meta table to track schema version
     cur.execute("""
@@ -48,6 +101,109 @@ def init_db():
     """)
     # set a schema version if not exists
     cur.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', '1')")
+    version = int(cur.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()[0])
+    if version < 2:
+        _migrate_duplicate_groups(cur)
+        cur.execute("UPDATE meta SET value = '2' WHERE key = 'schema_version'")
+    if version < 3:
+        _migrate_sort_columns(cur)
+        cur.execute("UPDATE meta SET value = '3' WHERE key = 'schema_version'")
+    # a path is a member of at most one group per scan
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_dup_member ON duplicates(scan_id, file_path)")
+    # bumped on every exclusion edit so compiled matchers know when to reload
+    cur.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('exclusions_version', '0')")
+
+    # --- Scan checkpoints (resume_scan) ---
+    # one row per unfinished scan: phase, scan roots and the walk frontier
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS scan_checkpoints (
+            scan_id INTEGER PRIMARY KEY,
+            phase TEXT NOT NULL,
+            folders TEXT NOT NULL,
+            algorithm TEXT NOT NULL,
+            frontier TEXT NOT NULL,
+            counters TEXT NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    """)
+    # 1 for `scan --incremental`, so a resumed walk keeps using the directory index
+    _ensure_column(cur, "scan_checkpoints", "incremental", "INTEGER NOT NULL DEFAULT 0")
+    # files accepted by the walk so far (stat fields of walker.FileEntry)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS scan_files (
+            scan_id INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            st_dev INTEGER NOT NULL,
+            st_ino INTEGER NOT NULL,
+            st_nlink INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            ctime_ns INTEGER NOT NULL
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_scan_files ON scan_files(scan_id)")
+    # size buckets whose groups are fully written
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS scan_buckets (
+            scan_id INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (scan_id, size)
+        )
+    """)
+
+    # --- Archive manifest (one row per archived file, see safe_delete) ---
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS archive_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            archive_path TEXT NOT NULL UNIQUE,
+            original_path TEXT NOT NULL,
+            size INTEGER,
+            digest TEXT,
+            archived_at INTEGER,
+            scan_id INTEGER
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_archive_original ON archive_entries(original_path)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_archive_time ON archive_entries(archived_at, id)")
+    # content-addressed mode: entries share one blob per digest, freed at refcount 0
+    _ensure_column(cur, "archive_entries", "blob", "TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_archive_blob ON archive_entries(blob)")
+    # "archive" / "restore" while a bulk batch moves the file (see safe_delete.reconcile_pending)
+    _ensure_column(cur, "archive_entries", "pending", "TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_archive_pending ON archive_entries(pending) "
+                "WHERE pending IS NOT NULL")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS archive_blobs (
+            path TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            size INTEGER,
+            refcount INTEGER NOT NULL
+        )
+    """)
+
+    # --- Directory index (incremental walks, see DirIndex) ---
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS dir_index (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            entry_count INTEGER NOT NULL,
+            listed_at_ns INTEGER NOT NULL,
+            subdirs TEXT NOT NULL
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS dir_index_files (
+            dir TEXT NOT NULL,
+            name TEXT NOT NULL,
+            size INTEGER,
+            st_dev INTEGER,
+            st_ino INTEGER,
+            st_nlink INTEGER,
+            mtime_ns INTEGER,
+            ctime_ns INTEGER,
+            PRIMARY KEY (dir, name)
+        )
+    """)
 
     # --- Exclusions table ---
     cur.execute("""
@@ -59,31 +215,149 @@ def init_db():
     """)
     cur.execute("CREATE INDEX IF NOT EXISTS idx_excl_folder ON exclusions(is_folder)")
 
+    # --- Hash cache (digests reused across scans while the inode is unchanged) ---
+    cols = _table_columns(cur, "file_hashes")
+    if cols and "algo" not in cols:
+        # pre-algo cache layout; it's only a cache, so rebuild it
+        cur.execute("DROP TABLE file_hashes")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS file_hashes (
+            algo TEXT NOT NULL,
+            st_dev INTEGER NOT NULL,
+            st_ino INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            ctime_ns INTEGER NOT NULL,
+            file_path TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            last_seen INTEGER,
+            PRIMARY KEY (algo, st_dev, st_ino, size, mtime_ns, ctime_ns)
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_fh_seen ON file_hashes(last_seen)")
+
     conn.commit()
     conn.close()
 
 
-def start_scan():
+def _migrate_duplicate_groups(cur):
+    """
+    Schema 1 -> 2: older scans inserted a group's first path once per extra
+    copy. Drop the repeated rows, then build dup_groups from what is left.
+    """
+    cur.execute("""
+        DELETE FROM duplicates WHERE id NOT IN (
+            SELECT MIN(id) FROM duplicates GROUP BY scan_id, file_path
+        )
+    """)
+    cur.execute("""
+        INSERT OR IGNORE INTO dup_groups (scan_id, digest, size, member_count, wasted_bytes)
+        SELECT scan_id, file_hash, file_size, COUNT(*), (COUNT(*) - 1) * file_size
+        FROM duplicates WHERE group_id IS NULL
+        GROUP BY scan_id, file_hash, file_size
+    """)
+    cur.execute("""
+        UPDATE duplicates SET group_id = (
+            SELECT g.id FROM dup_groups g
+            WHERE g.scan_id = duplicates.scan_id
+              AND g.digest = duplicates.file_hash
+              AND g.size = duplicates.file_size
+        ) WHERE group_id IS NULL
+    """)
+
+
+def _migrate_sort_columns(cur):
+    """
+    Schema 2 -> 3: unknown mtimes become 0 instead of NULL, and each member
+    gets a copy of its group's wasted_bytes, so every page sort is on a
+    bare indexed column.
+    """
+    cur.execute("UPDATE duplicates SET file_mtime = 0 WHERE file_mtime IS NULL")
+    cur.execute("""
+        UPDATE duplicates SET group_wasted = (
+            SELECT wasted_bytes FROM dup_groups g WHERE g.id = duplicates.group_id
+        ) WHERE group_id IS NOT NULL
+    """)
+
+
+def start_scan(hash_algo=None):
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute("INSERT INTO scans (timestamp, total_files, total_duplicates, total_size_saved) VALUES (?, ?, ?, ?)",
-                (int(time.time()), 0, 0, 0))
+    cur.execute("INSERT INTO scans (timestamp, total_files, total_duplicates, total_size_saved, hash_algo) VALUES (?, ?, ?, ?, ?)",
+                (int(time.time()), 0, 0, 0, hash_algo or config.HASH_ALGORITHM))
     scan_id = cur.lastrowid
     conn.commit()
     conn.close()
     return scan_id
 
-def finish_scan(scan_id, total_files, total_duplicates, total_size_saved):
+def finish_scan(scan_id, total_files, total_duplicates=None, total_size_saved=None, metrics=None):
+    """
+    Record a scan's totals. Totals left as None are summed from the scan's
+    dup_groups (extra copies and their wasted bytes). `metrics` (a dict) is
+    stored as JSON on the scan row.
+    Returns (total_duplicates, total_size_saved) as stored.
+    """
     conn = get_connection()
     cur = conn.cursor()
+    if total_duplicates is None or total_size_saved is None:
+        dups, wasted = cur.execute("""
+            SELECT COALESCE(SUM(member_count - 1), 0), COALESCE(SUM(wasted_bytes), 0)
+            FROM dup_groups WHERE scan_id = ? AND member_count > 1
+        """, (scan_id,)).fetchone()
+        total_duplicates = dups if total_duplicates is None else total_duplicates
+        total_size_saved = wasted if total_size_saved is None else total_size_saved
     cur.execute("""
         UPDATE scans
         SET total_files=?, total_duplicates=?, total_size_saved=?
         WHERE id=?
     """, (total_files, total_duplicates, total_size_saved, scan_id))
+    if metrics is not None:
+        cur.execute("UPDATE scans SET metrics=? WHERE id=?", (json.dumps(metrics), scan_id))
+    conn.commit()
+    conn.close()
+    return total_duplicates, total_size_saved
+
+def set_scan_metrics(scan_id, metrics):
+    """Store the metrics blob of a scan (e.g. one that was cancelled)."""
+    conn = get_connection()
+    conn.execute("UPDATE scans SET metrics=? WHERE id=?", (json.dumps(metrics), scan_id))
     conn.commit()
     conn.close()
 
+# --- Meta ---
+def get_meta(key, default=None):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT value FROM meta WHERE key = ?", (key,))
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else default
+
+def set_meta(key, value):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+    conn.commit()
+    conn.close()
+
+# exclusion edits made by this process: lets get_matcher() notice them
+# without reading exclusions_version from the DB on every check
+exclusion_edits = 0
+
+
+def _bump_exclusions_version(cur):
+    global exclusion_edits
+    exclusion_edits += 1
+    cur.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('exclusions_version', '0')")
+    cur.execute("""
+        UPDATE meta SET value = CAST(value AS INTEGER) + 1
+        WHERE key = 'exclusions_version'
+    """)
+
+def get_exclusions_version():
+    """Return the exclusion rules version stamp (changes on every add/remove)."""
+    return int(get_meta("exclusions_version", 0))
+
 # --- Exclusion rules ---
 def add_exclusion(pattern, is_folder=True):
     conn = get_connection()
@@ -92,6 +366,7 @@ def add_exclusion(pattern, is_folder=True):
         "INSERT INTO exclusions (pattern, is_folder) VALUES (?, ?)",
         (pattern, 1 if is_folder else 0)
     )
+    _bump_exclusions_version(cur)
     conn.commit()
     conn.close()
 
@@ -102,6 +377,7 @@ def remove_exclusion(pattern):
         "DELETE FROM exclusions WHERE pattern = ?",
         (pattern,)
     )
+    _bump_exclusions_version(cur)
     conn.commit()
     conn.close()
 
@@ -114,40 +390,434 @@ def get_exclusions():
     conn.close()
     return rows
 
+def get_exclusion_rules():
+    """Return a list of (pattern, is_folder) tuples."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT pattern, is_folder FROM exclusions")
+    rows = [(row[0], bool(row[1])) for row in cur.fetchall()]
+    conn.close()
+    return rows
+
 # --- Duplicates ---
-def insert_duplicate(scan_id, file_path, file_hash, file_size):
-    """Insert one duplicate file record into DB."""
+# dup_groups holds one row per (scan, digest, size) with its member count and
+# reclaimable bytes; duplicates holds one row per member path (group_id).
+
+def _group_values(scan_id, file_hash, file_size, count):
+    return (scan_id, file_hash, file_size, count, (count - 1) * file_size)
+
+
+def insert_duplicate(scan_id, file_path, file_hash, file_size, file_mtime=None):
+    """Insert one duplicate file record into DB, adding it to its group."""
     conn = get_connection()
     cur = conn.cursor()
+    row = cur.execute(
+        "SELECT id, member_count FROM dup_groups WHERE scan_id=? AND digest=? AND size=?",
+        (scan_id, file_hash, file_size),
+    ).fetchone()
+    if row is None:
+        cur.execute(
+            "INSERT INTO dup_groups (scan_id, digest, size, member_count, wasted_bytes) VALUES (?, ?, ?, ?, ?)",
+            _group_values(scan_id, file_hash, file_size, 0),
+        )
+        group_id, count = cur.lastrowid, 0
+    else:
+        group_id, count = row
     cur.execute(
-        "INSERT INTO duplicates (scan_id, file_path, file_hash, file_size) VALUES (?, ?, ?, ?)",
-        (scan_id, file_path, file_hash, file_size),
+        "INSERT OR IGNORE INTO duplicates (scan_id, group_id, file_path, file_hash, file_size, file_mtime) VALUES (?, ?, ?, ?, ?, ?)",
+        (scan_id, group_id, file_path, file_hash, file_size, file_mtime or 0),
     )
+    if cur.rowcount:
+        count += 1
+        cur.execute("UPDATE dup_groups SET member_count=?, wasted_bytes=? WHERE id=?",
+                    (count, (count - 1) * file_size, group_id))
+        cur.execute("UPDATE duplicates SET group_wasted=? WHERE group_id=?",
+                    ((count - 1) * file_size, group_id))
     conn.commit()
     conn.close()
 
 
+class DuplicateWriter:
+    """
+    Buffered writes of finalized duplicate groups over one connection.
+    Each group is written exactly once (a dup_groups row plus one member row
+    per path), all queued groups in a single transaction, once `batch_size`
+    member rows are queued or the oldest queued group is `max_age` seconds
+    old. finish_bucket() marks a size bucket complete in the same
+    transaction as its groups, so a resumed scan never writes a group twice.
+    Use as a context manager, or call flush()/close() explicitly.
+    """
+
+    def __init__(self, batch_size=2000, max_age=1.0):
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.groups_written = 0
+        self.rows_written = 0
+        self.write_seconds = 0.0
+        self._conn = None
+        self._groups = []
+        self._buckets = []
+        self._queued = 0
+        self._first_at = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def open(self):
+        if self._conn is None:
+            self._conn = get_connection()
+
+    def finish_bucket(self, scan_id, file_size):
+        """Queue the checkpoint mark for a size bucket whose groups were all added."""
+        self._buckets.append((scan_id, file_size))
+
+    def add_group(self, scan_id, file_hash, file_size, members):
+        """Queue one complete group; members are (file_path, file_mtime) pairs."""
+        members = list(members)
+        if len(members) < 2:
+            return
+        if not self._groups:
+            self._first_at = time.monotonic()
+        self._groups.append((scan_id, file_hash, file_size, members))
+        self._queued += len(members)
+        if (self._queued >= self.batch_size
+                or time.monotonic() - self._first_at >= self.max_age):
+            self.flush()
+
+    def flush(self):
+        """Write all queued groups, their members and bucket marks in one transaction."""
+        if not self._groups and not self._buckets:
+            return
+        start = time.perf_counter()
+        self.open()
+        rows = []
+        with self._conn:
+            cur = self._conn.cursor()
+            for scan_id, file_hash, file_size, members in self._groups:
+                cur.execute(
+                    "INSERT INTO dup_groups (scan_id, digest, size, member_count, wasted_bytes) VALUES (?, ?, ?, ?, ?)",
+                    _group_values(scan_id, file_hash, file_size, len(members)),
+                )
+                group_id = cur.lastrowid
+                wasted = (len(members) - 1) * file_size
+                rows.extend((scan_id, group_id, path, file_hash, file_size, mtime or 0, wasted)
+                            for path, mtime in members)
+            cur.executemany(
+                "INSERT INTO duplicates (scan_id, group_id, file_path, file_hash, file_size, file_mtime, group_wasted) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            cur.executemany("INSERT OR IGNORE INTO scan_buckets (scan_id, size) VALUES (?, ?)", self._buckets)
+        self.groups_written += len(self._groups)
+        self.rows_written += len(rows)
+        self._groups = []
+        self._buckets = []
+        self._queued = 0
+        self._first_at = None
+        self.write_seconds += time.perf_counter() - start
+
+    def close(self):
+        """Flush anything pending and release the connection (safe to call twice)."""
+        try:
+            self.flush()
+        finally:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def stat_key(st):
+    """Cache key for a stat result: (st_dev, st_ino, size, mtime_ns, ctime_ns)."""
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+class HashCache:
+    """
+    Persistent digest cache keyed by (st_dev, st_ino, size, mtime_ns, ctime_ns)
+    per hash algorithm, so digests of different algorithms never mix.
+    Lookups hit the primary key on one held connection; new digests and
+    last_seen touches are buffered and written in batches.
+    """
+
+    def __init__(self, scan_id=None, batch_size=2000, algorithm=None):
+        self.scan_id = scan_id
+        self.algorithm = algorithm or config.HASH_ALGORITHM
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self.bytes_avoided = 0
+        self.write_seconds = 0.0
+        self._conn = None
+        self._stores = []
+        self._touches = []
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def open(self):
+        if self._conn is None:
+            self._conn = get_connection()
+
+    def lookup(self, st):
+        """Return the cached digest for a stat result, or None."""
+        self.open()
+        key = (self.algorithm,) + stat_key(st)
+        row = self._conn.execute("""
+            SELECT digest FROM file_hashes
+            WHERE algo=? AND st_dev=? AND st_ino=? AND size=? AND mtime_ns=? AND ctime_ns=?
+        """, key).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.bytes_avoided += st.st_size
+        self._touches.append((self.scan_id,) + key)
+        if len(self._touches) >= self.batch_size:
+            self.flush()
+        return row[0]
+
+    def store(self, file_path, st, digest):
+        """Queue a freshly computed digest for the file described by `st`."""
+        self._stores.append((self.algorithm,) + stat_key(st) + (file_path, digest, self.scan_id))
+        if len(self._stores) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._stores and not self._touches:
+            return
+        start = time.perf_counter()
+        self.open()
+        with self._conn:
+            if self._stores:
+                self._conn.executemany("""
+                    INSERT OR REPLACE INTO file_hashes
+                        (algo, st_dev, st_ino, size, mtime_ns, ctime_ns, file_path, digest, last_seen)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, self._stores)
+            if self._touches:
+                self._conn.executemany("""
+                    UPDATE file_hashes SET last_seen=?
+                    WHERE algo=? AND st_dev=? AND st_ino=? AND size=? AND mtime_ns=? AND ctime_ns=?
+                """, self._touches)
+        self._stores = []
+        self._touches = []
+        self.write_seconds += time.perf_counter() - start
+
+    def evict_missing(self, roots, walked=None):
+        """
+        Drop entries under `roots` not seen by this scan whose file is gone
+        or has changed since it was hashed. `walked` maps the paths the
+        scan's walk produced to their stat results; those rows are checked
+        against it, and only paths the walk didn't visit are stat'ed.
+        Returns the number evicted.
+        """
+        self.flush()
+        self.open()
+        prefixes = []
+        for root in roots:
+            root = os.path.abspath(os.path.normpath(root))
+            prefixes.append(root if root.endswith(os.sep) else root + os.sep)
+        prefixes = tuple(prefixes)
+
+        stale = []
+        for row in self._conn.execute("""
+            SELECT algo, st_dev, st_ino, size, mtime_ns, ctime_ns, file_path
+            FROM file_hashes WHERE last_seen IS NOT ?
+        """, (self.scan_id,)):
+            path = row[6]
+            if not path.startswith(prefixes):
+                continue
+            st = walked.get(path) if walked is not None else None
+            if st is None:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    pass
+            if st is not None and stat_key(st) == tuple(row[1:6]):
+                continue
+            stale.append(row[:6])
+
+        if stale:
+            with self._conn:
+                self._conn.executemany("""
+                    DELETE FROM file_hashes
+                    WHERE algo=? AND st_dev=? AND st_ino=? AND size=? AND mtime_ns=? AND ctime_ns=?
+                """, stale)
+        return len(stale)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _subtree_bounds(path):
+    """(lo, hi) such that lo <= p < hi for every path p strictly below `path`."""
+    prefix = path if path.endswith(os.sep) else path + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+class DirIndex:
+    """
+    Directory listings from earlier scans, for incremental walks.
+    `known` maps each indexed directory under `roots` to
+    (mtime_ns, entry_count, listed_at_ns); the walker reuses listing(path)
+    for directories whose mtime and entry count still match instead of
+    stat'ing every file again. record() queues fresh listings, written in
+    batches. With trust=False nothing is loaded: every directory is listed
+    and re-recorded (the periodic full verify).
+    """
+
+    def __init__(self, roots=(), trust=True, batch_size=500):
+        self.batch_size = batch_size
+        self.write_seconds = 0.0
+        self.known = {}
+        self._conn = None
+        self._records = []
+        if trust:
+            self.open()
+            for root in roots:
+                root = os.path.abspath(os.path.normpath(root))
+                lo, hi = _subtree_bounds(root)
+                for path, mtime_ns, count, listed_at in self._conn.execute("""
+                    SELECT path, mtime_ns, entry_count, listed_at_ns FROM dir_index
+                    WHERE path = ? OR (path >= ? AND path < ?)
+                """, (root, lo, hi)):
+                    self.known[path] = (mtime_ns, count, listed_at)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def open(self):
+        if self._conn is None:
+            self._conn = get_connection()
+
+    def listing(self, path):
+        """Stored (subdirs, files) of `path`, as Walker.walk yields them."""
+        from .walker import FileEntry
+        self.open()
+        row = self._conn.execute("SELECT subdirs FROM dir_index WHERE path = ?", (path,)).fetchone()
+        subdirs = [os.path.join(path, name) for name in json.loads(row[0])] if row else []
+        files = [FileEntry(os.path.join(path, name), *rest) for name, *rest in self._conn.execute("""
+            SELECT name, size, st_dev, st_ino, st_nlink, mtime_ns, ctime_ns
+            FROM dir_index_files WHERE dir = ?
+        """, (path,))]
+        return subdirs, files
+
+    def record(self, path, mtime_ns, entry_count, listed_at_ns, subdirs, files):
+        """Queue the fresh listing of `path` (subdirs: full paths, files: FileEntry)."""
+        self._records.append((path, mtime_ns, entry_count, listed_at_ns,
+                              [os.path.basename(d) for d in subdirs], files))
+        if len(self._records) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._records:
+            return
+        start = time.perf_counter()
+        self.open()
+        with self._conn:
+            cur = self._conn.cursor()
+            for path, mtime_ns, count, listed_at, subdirs, files in self._records:
+                # subdirectories that disappeared take their whole subtree with them
+                old = cur.execute("SELECT subdirs FROM dir_index WHERE path = ?", (path,)).fetchone()
+                for name in set(json.loads(old[0]) if old else ()) - set(subdirs):
+                    gone = os.path.join(path, name)
+                    lo, hi = _subtree_bounds(gone)
+                    cur.execute("DELETE FROM dir_index WHERE path = ? OR (path >= ? AND path < ?)",
+                                (gone, lo, hi))
+                    cur.execute("DELETE FROM dir_index_files WHERE dir = ? OR (dir >= ? AND dir < ?)",
+                                (gone, lo, hi))
+                cur.execute("""
+                    INSERT OR REPLACE INTO dir_index (path, mtime_ns, entry_count, listed_at_ns, subdirs)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (path, mtime_ns, count, listed_at, json.dumps(subdirs)))
+                cur.execute("DELETE FROM dir_index_files WHERE dir = ?", (path,))
+                cur.executemany("""
+                    INSERT INTO dir_index_files
+                        (dir, name, size, st_dev, st_ino, st_nlink, mtime_ns, ctime_ns)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, [(path, os.path.basename(f.path)) + tuple(f[1:]) for f in files])
+        self._records = []
+        self.write_seconds += time.perf_counter() - start
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
 def get_all_duplicates(scan_id):
+    """Return [(file_hash, joined_paths, file_size)], one row per group (paths joined by CHAR(31))."""
     conn = get_connection()
     cur = conn.cursor()
     cur.execute("""
-        SELECT
-            GROUP_CONCAT(file_path, CHAR(31)) AS joined_paths,
-            file_size
-        FROM duplicates
-        WHERE scan_id = ?
-        GROUP BY file_hash, file_size
-        HAVING COUNT(*) > 1
+        SELECT g.id, g.digest, g.size, d.file_path
+        FROM dup_groups g
+        JOIN duplicates d ON d.group_id = g.id
+        WHERE g.scan_id = ? AND g.member_count > 1
+        ORDER BY g.id, d.id
     """, (scan_id,))
+    rows = []
+    for _, members in itertools.groupby(cur, key=lambda r: r[0]):
+        members = list(members)
+        rows.append((members[0][1], "\x1f".join(m[3] for m in members), members[0][2]))
+    conn.close()
+    return rows
+
+
+def get_duplicate_groups(scan_id, limit=None):
+    """Return [(group_id, digest, size, member_count, wasted_bytes)], most wasted first."""
+    conn = get_connection()
+    cur = conn.cursor()
+    sql = """
+        SELECT id, digest, size, member_count, wasted_bytes FROM dup_groups
+        WHERE scan_id = ? AND member_count > 1
+        ORDER BY wasted_bytes DESC, id
+    """
+    if limit:
+        cur.execute(sql + " LIMIT ?", (scan_id, limit))
+    else:
+        cur.execute(sql, (scan_id,))
     rows = cur.fetchall()
     conn.close()
     return rows
 
 
+def get_group_members(group_id):
+    """Return [(file_path, file_mtime)] of one group, in insertion order."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT file_path, NULLIF(file_mtime, 0) FROM duplicates WHERE group_id = ? ORDER BY id", (group_id,))
+    rows = cur.fetchall()
+    conn.close()
+    return rows
 
 
 def safe_get_all_duplicates(scan_id):
-    """Return list of (joined_paths, size). Guaranteed to return list even on error."""
+    """Return list of (joined_paths, size). Guaranteed to return list even on error.
+    (get_all_duplicates rows are (file_hash, joined_paths, size); the hash is dropped here.)"""
     try:
         if not scan_id:
             logging.debug("safe_get_all_duplicates called with no scan_id -> returning [].")
@@ -192,10 +862,245 @@ def safe_get_all_duplicates(scan_id):
 
 
 
+def insert_hardlink_sets(conn, scan_id, link_sets):
+    """Record hardlink sets on `conn` (caller commits): each set is a list of entries (path, st_size, st_dev, st_ino, ...)."""
+    conn.executemany(
+        "INSERT INTO hardlinks (scan_id, st_dev, st_ino, file_path, file_size) VALUES (?, ?, ?, ?, ?)",
+        [(scan_id, e.st_dev, e.st_ino, e.path, e.st_size) for links in link_sets for e in links],
+    )
+
+
+def get_hardlink_sets(scan_id):
+    """Return [(paths, size)] for every inode reached through more than one path."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT GROUP_CONCAT(file_path, CHAR(31)), file_size
+        FROM hardlinks
+        WHERE scan_id = ?
+        GROUP BY st_dev, st_ino
+    """, (scan_id,))
+    rows = [(joined.split("\x1f"), size) for joined, size in cur.fetchall()]
+    conn.close()
+    return rows
+
+
+# --- Paged duplicates view (keyset pagination) ---
+# sort name -> SQL expression; every sort is made total by adding d.id.
+# Each is a bare duplicates column with a (scan_id, column, id) index, so a
+# page is an index range scan and never a sort of the whole scan.
+DUPLICATE_SORTS = {
+    "size": "d.file_size",
+    "wasted": "d.group_wasted",
+    "path": "d.file_path",
+    "mtime": "d.file_mtime",
+}
+
+
+def _duplicates_page_query(scan_id, sort, descending, after, limit):
+    """SQL and parameters of one get_duplicates_page() query."""
+    if sort not in DUPLICATE_SORTS:
+        raise ValueError(f"Unknown sort: {sort!r}")
+    key = DUPLICATE_SORTS[sort]
+    direction = "DESC" if descending else "ASC"
+    op = "<" if descending else ">"
+    params = [scan_id]
+    where = "d.scan_id = ? AND g.member_count > 1"
+    if after is not None:
+        where += f" AND ({key} {op} ? OR ({key} = ? AND d.id {op} ?))"
+        params += [after[0], after[0], after[1]]
+    params.append(limit)
+    sql = f"""
+        SELECT d.id, d.file_path, d.file_size, NULLIF(d.file_mtime, 0), d.file_hash, d.group_wasted, {key}
+        FROM duplicates d
+        JOIN dup_groups g ON g.id = d.group_id
+        WHERE {where}
+        ORDER BY {key} {direction}, d.id {direction}
+        LIMIT ?
+    """
+    return sql, params
+
+
+def get_duplicates_page(scan_id, sort="size", descending=True, after=None, limit=500):
+    """
+    One page of duplicate rows, ordered by `sort` then id.
+    `after` is the (sort_value, id) of the last row of the previous page.
+    Returns [(id, file_path, file_size, file_mtime, file_hash, wasted, sort_value)]
+    (file_mtime is None when unknown).
+    """
+    sql, params = _duplicates_page_query(scan_id, sort, descending, after, limit)
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def count_duplicates(scan_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT COALESCE(SUM(member_count), 0) FROM dup_groups
+        WHERE scan_id = ? AND member_count > 1
+    """, (scan_id,))
+    count = cur.fetchone()[0]
+    conn.close()
+    return count
+
+
+def get_duplicate_paths(ids, batch_size=500):
+    """Return file paths for the given duplicate row ids."""
+    ids = list(ids)
+    paths = []
+    conn = get_connection()
+    for i in range(0, len(ids), batch_size):
+        chunk = ids[i:i + batch_size]
+        marks = ",".join("?" * len(chunk))
+        paths += [r[0] for r in conn.execute(
+            f"SELECT file_path FROM duplicates WHERE id IN ({marks}) ORDER BY id", chunk)]
+    conn.close()
+    return paths
+
+
+def iter_duplicate_ids(scan_id, batch_size=5000):
+    """Yield (id, file_path) for every duplicate row of a scan, in id order."""
+    conn = get_connection()
+    try:
+        last = -1
+        while True:
+            rows = conn.execute(
+                "SELECT id, file_path FROM duplicates WHERE scan_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (scan_id, last, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            yield from rows
+            last = rows[-1][0]
+    finally:
+        conn.close()
+
+
+# --- Scan checkpoints ---
+def save_checkpoint(scan_id, phase, folders, algorithm, frontier, counters, new_files=(), link_sets=(),
+                    incremental=False):
+    """
+    Persist a scan's progress in one transaction: `new_files` (FileEntry-like,
+    accepted since the last checkpoint) are appended and the checkpoint row
+    (phase, roots, unwalked frontier, counters, incremental flag) is replaced.
+    `link_sets` are the walk's hardlink sets, written with the checkpoint that
+    ends the walk.
+    """
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO scan_files (scan_id, path, size, st_dev, st_ino, st_nlink, mtime_ns, ctime_ns) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(scan_id, e.path, e.st_size, e.st_dev, e.st_ino, e.st_nlink, e.st_mtime_ns, e.st_ctime_ns)
+             for e in new_files],
+        )
+        insert_hardlink_sets(conn, scan_id, link_sets)
+        conn.execute("""
+            INSERT OR REPLACE INTO scan_checkpoints
+                (scan_id, phase, folders, algorithm, frontier, counters, updated_at, incremental)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (scan_id, phase, json.dumps(list(folders)), algorithm, json.dumps(list(frontier)),
+              json.dumps(counters), int(time.time()), int(bool(incremental))))
+    conn.close()
+
+
+def load_checkpoint(scan_id):
+    """Return the checkpoint dict of an unfinished scan, or None."""
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT phase, folders, algorithm, frontier, counters, updated_at, incremental
+        FROM scan_checkpoints WHERE scan_id = ?
+    """, (scan_id,)).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    return {
+        "scan_id": scan_id,
+        "phase": row[0],
+        "folders": json.loads(row[1]),
+        "algorithm": row[2],
+        "frontier": json.loads(row[3]),
+        "counters": json.loads(row[4]),
+        "updated_at": row[5],
+        "incremental": bool(row[6]),
+    }
+
+
+def iter_checkpoint_files(scan_id, batch_size=5000):
+    """Yield (path, size, st_dev, st_ino, st_nlink, mtime_ns, ctime_ns) of a scan's walked files."""
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            "SELECT path, size, st_dev, st_ino, st_nlink, mtime_ns, ctime_ns FROM scan_files "
+            "WHERE scan_id = ? ORDER BY rowid", (scan_id,))
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def get_done_buckets(scan_id):
+    """Sizes whose duplicate groups are already written for this scan."""
+    conn = get_connection()
+    sizes = {r[0] for r in conn.execute("SELECT size FROM scan_buckets WHERE scan_id = ?", (scan_id,))}
+    conn.close()
+    return sizes
+
+
+def clear_checkpoint(scan_id):
+    """Drop all resume state of a scan (it finished, or is being discarded)."""
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM scan_checkpoints WHERE scan_id = ?", (scan_id,))
+        conn.execute("DELETE FROM scan_files WHERE scan_id = ?", (scan_id,))
+        conn.execute("DELETE FROM scan_buckets WHERE scan_id = ?", (scan_id,))
+    conn.close()
+
+
+def get_resumable_scans():
+    """Return [(scan_id, timestamp, phase, folders, updated_at)] of unfinished scans, newest first."""
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT c.scan_id, s.timestamp, c.phase, c.folders, c.updated_at
+        FROM scan_checkpoints c JOIN scans s ON s.id = c.scan_id
+        ORDER BY c.scan_id DESC
+    """).fetchall()
+    conn.close()
+    return [(sid, ts, phase, json.loads(folders), updated) for sid, ts, phase, folders, updated in rows]
+
+
+def prune_scan_results():
+    """
+    Drop duplicate / hardlink rows of old scans, keeping the latest finished
+    scan and every scan that can still be resumed.
+    """
+    conn = get_connection()
+    with conn:
+        keep = [r[0] for r in conn.execute("SELECT scan_id FROM scan_checkpoints")]
+        latest = conn.execute(
+            "SELECT MAX(id) FROM scans WHERE id NOT IN (SELECT scan_id FROM scan_checkpoints)"
+        ).fetchone()[0]
+        if latest is not None:
+            keep.append(latest)
+        marks = ",".join("?" * len(keep)) or "NULL"
+        for table in ("duplicates", "dup_groups", "hardlinks"):
+            conn.execute(f"DELETE FROM {table} WHERE scan_id NOT IN ({marks})", keep)
+    conn.close()
+
+
 def delete_duplicate_group(file_hash, scan_id):
     conn = get_connection()
     cur = conn.cursor()
     cur.execute("DELETE FROM duplicates WHERE file_hash=? AND scan_id=?", (file_hash, scan_id))
+    cur.execute("DELETE FROM dup_groups WHERE digest=? AND scan_id=?", (file_hash, scan_id))
     conn.commit()
     conn.close()
 
@@ -203,6 +1108,11 @@ def clear_db():
     conn = get_connection()
     cur = conn.cursor()
     cur.execute("DELETE FROM duplicates")
+    cur.execute("DELETE FROM dup_groups")
+    cur.execute("DELETE FROM hardlinks")
+    cur.execute("DELETE FROM scan_checkpoints")
+    cur.execute("DELETE FROM scan_files")
+    cur.execute("DELETE FROM scan_buckets")
     cur.execute("DELETE FROM scans")
     conn.commit()
     conn.close()
@@ -211,30 +1121,322 @@ def clear_duplicates():
     conn = get_connection()
     cur = conn.cursor()
     cur.execute("DELETE FROM duplicates")
+    cur.execute("DELETE FROM dup_groups")
+    cur.execute("DELETE FROM hardlinks")
     conn.commit()
     conn.close()
 
 
 
 # --- Scan history ---
+def scan_exists(scan_id):
+    conn = get_connection()
+    row = conn.execute("SELECT 1 FROM scans WHERE id=?", (scan_id,)).fetchone()
+    conn.close()
+    return row is not None
+
+
+def get_scan_algorithm(scan_id):
+    """Hash algorithm a scan used (config.HASH_ALGORITHM if the scan is unknown)."""
+    conn = get_connection()
+    row = conn.execute("SELECT hash_algo FROM scans WHERE id=?", (scan_id,)).fetchone()
+    conn.close()
+    return row[0] if row and row[0] else config.HASH_ALGORITHM
+
+
+# column order of get_scan_history() rows, independent of migration order
+SCAN_HISTORY_COLUMNS = ("id", "timestamp", "total_files", "total_duplicates", "total_size_saved",
+                        "hash_algo", "metrics")
+
+
 def get_scan_history(limit=None):
+    """Rows of SCAN_HISTORY_COLUMNS, newest scan first."""
     conn = get_connection()
     cur = conn.cursor()
+    query = f"SELECT {', '.join(SCAN_HISTORY_COLUMNS)} FROM scans ORDER BY id DESC"
     if limit:
-        cur.execute("SELECT * FROM scans ORDER BY id DESC LIMIT ?", (limit,))
+        cur.execute(query + " LIMIT ?", (limit,))
     else:
-        cur.execute("SELECT * FROM scans ORDER BY id DESC")
+        cur.execute(query)
     rows = cur.fetchall()
     conn.close()
     return rows
 
+# --- Archive manifest ---
+# insert/delete take the caller's connection: safe_delete commits the row
+# in the same transaction as the file move. An entry with a blob has no
+# file of its own: its bytes live in the shared archive_blobs file.
+def insert_archive_entry(conn, archive_path, original_path, size, digest=None, scan_id=None,
+                         archived_at=None, blob=None):
+    insert_archive_entries(conn, [(archive_path, original_path, size, digest, blob)], scan_id, archived_at)
+
+
+def insert_archive_entries(conn, entries, scan_id=None, archived_at=None, pending=None):
+    """
+    entries: [(archive_path, original_path, size, digest, blob)]; a None
+    digest is taken from the scan. Each entry with a blob adds one
+    reference to that blob's archive_blobs row. `pending` marks rows whose
+    file is still being moved (cleared with set_archive_pending).
+    """
+    archived_at = int(time.time()) if archived_at is None else archived_at
+    rows = []
+    for archive_path, original_path, size, digest, blob in entries:
+        if digest is None and scan_id is not None:
+            row = conn.execute("SELECT file_hash FROM duplicates WHERE scan_id=? AND file_path=?",
+                               (scan_id, original_path)).fetchone()
+            digest = row[0] if row else None
+        rows.append((archive_path, original_path, size, digest, archived_at, scan_id, blob, pending))
+    conn.executemany("""
+        INSERT INTO archive_entries (archive_path, original_path, size, digest, archived_at, scan_id, blob, pending)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.executemany("""
+        INSERT INTO archive_blobs (path, digest, size, refcount) VALUES (?, ?, ?, 1)
+        ON CONFLICT(path) DO UPDATE SET refcount = refcount + 1
+    """, [(blob, digest, size) for _, _, size, digest, _, _, blob, _ in rows if blob is not None])
+
+
+def set_archive_pending(conn, archive_paths, pending=None):
+    """Mark entries as being moved ("archive" / "restore"), or settled with None."""
+    conn.executemany("UPDATE archive_entries SET pending=? WHERE archive_path=?",
+                     [(pending, p) for p in archive_paths])
+
+
+def get_pending_archive_entries():
+    """Entries left pending by an interrupted bulk batch: [(archive_path, original_path, size, blob, pending)]."""
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT archive_path, original_path, size, blob, pending
+        FROM archive_entries WHERE pending IS NOT NULL
+    """).fetchall()
+    conn.close()
+    return rows
+
+
+def delete_archive_entry(conn, archive_path):
+    return delete_archive_entries(conn, [archive_path])
+
+
+def delete_archive_entries(conn, archive_paths):
+    """
+    Delete entries and release their blob references. Returns the blob
+    paths whose refcount dropped to zero; the caller removes those files
+    once the transaction has committed.
+    """
+    released = []
+    for archive_path in archive_paths:
+        row = conn.execute("SELECT blob FROM archive_entries WHERE archive_path=?", (archive_path,)).fetchone()
+        if row is None:
+            continue
+        conn.execute("DELETE FROM archive_entries WHERE archive_path=?", (archive_path,))
+        if row[0] is None:
+            continue
+        conn.execute("UPDATE archive_blobs SET refcount = refcount - 1 WHERE path=?", (row[0],))
+        if conn.execute("DELETE FROM archive_blobs WHERE path=? AND refcount <= 0", (row[0],)).rowcount:
+            released.append(row[0])
+    return released
+
+
+def detach_archive_blobs(conn, archive_paths):
+    """
+    Drop the blob reference of entries whose file was stored at its own
+    archive path after all. Returns the blob paths whose refcount dropped
+    to zero, as delete_archive_entries() does.
+    """
+    released = []
+    for archive_path in archive_paths:
+        row = conn.execute("SELECT blob FROM archive_entries WHERE archive_path=?", (archive_path,)).fetchone()
+        if row is None or row[0] is None:
+            continue
+        conn.execute("UPDATE archive_entries SET blob=NULL WHERE archive_path=?", (archive_path,))
+        conn.execute("UPDATE archive_blobs SET refcount = refcount - 1 WHERE path=?", (row[0],))
+        if conn.execute("DELETE FROM archive_blobs WHERE path=? AND refcount <= 0", (row[0],)).rowcount:
+            released.append(row[0])
+    return released
+
+
+def get_archive_blobs(blob_paths, batch_size=500):
+    """Return {blob_path: (digest, size, refcount)}."""
+    blob_paths = list(blob_paths)
+    blobs = {}
+    conn = get_connection()
+    for i in range(0, len(blob_paths), batch_size):
+        chunk = blob_paths[i:i + batch_size]
+        marks = ",".join("?" * len(chunk))
+        for path, digest, size, refcount in conn.execute(
+                f"SELECT path, digest, size, refcount FROM archive_blobs WHERE path IN ({marks})", chunk):
+            blobs[path] = (digest, size, refcount)
+    conn.close()
+    return blobs
+
+
+def get_archive_blob_usage():
+    """Return (blobs, stored_bytes) of the content-addressed archive store."""
+    conn = get_connection()
+    row = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM archive_blobs").fetchone()
+    conn.close()
+    return row
+
+
+def get_archive_entry(archive_path):
+    """Return (id, archive_path, original_path, size, digest, archived_at, scan_id, blob) or None."""
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT id, archive_path, original_path, size, digest, archived_at, scan_id, blob
+        FROM archive_entries WHERE archive_path=?
+    """, (archive_path,)).fetchone()
+    conn.close()
+    return row
+
+
+def get_archive_entries(archive_paths, batch_size=500):
+    """Return {archive_path: (id, archive_path, original_path, size, digest, archived_at, scan_id, blob)}."""
+    archive_paths = list(archive_paths)
+    entries = {}
+    conn = get_connection()
+    for i in range(0, len(archive_paths), batch_size):
+        chunk = archive_paths[i:i + batch_size]
+        marks = ",".join("?" * len(chunk))
+        for row in conn.execute(f"""
+            SELECT id, archive_path, original_path, size, digest, archived_at, scan_id, blob
+            FROM archive_entries WHERE archive_path IN ({marks})
+        """, chunk):
+            entries[row[1]] = row
+    conn.close()
+    return entries
+
+
+def _archive_filter(search):
+    if not search:
+        return "1", []
+    pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return "original_path LIKE ? ESCAPE '\\'", [pattern]
+
+
+def get_archive_page(search=None, after=None, limit=500):
+    """
+    One page of archive entries, newest first. `search` matches anywhere in
+    the original path; `after` is the (archived_at, id) of the previous
+    page's last row.
+    Returns [(id, archive_path, original_path, size, digest, archived_at, scan_id, blob)].
+    """
+    where, params = _archive_filter(search)
+    if after is not None:
+        where += " AND (archived_at < ? OR (archived_at = ? AND id < ?))"
+        params += [after[0], after[0], after[1]]
+    params.append(limit)
+    conn = get_connection()
+    rows = conn.execute(f"""
+        SELECT id, archive_path, original_path, size, digest, archived_at, scan_id, blob
+        FROM archive_entries WHERE {where}
+        ORDER BY archived_at DESC, id DESC
+        LIMIT ?
+    """, params).fetchall()
+    conn.close()
+    return rows
+
+
+def iter_archive_entries(search=None, batch_size=500):
+    """Every archive entry matching `search`, newest first, fetched page by page."""
+    after = None
+    while True:
+        page = get_archive_page(search, after, batch_size)
+        yield from page
+        if len(page) < batch_size:
+            return
+        after = (page[-1][5], page[-1][0])
+
+
+def count_archive_entries(search=None):
+    """Return (entries, total_bytes) matching `search`."""
+    where, params = _archive_filter(search)
+    conn = get_connection()
+    row = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM archive_entries WHERE {where}",
+                       params).fetchone()
+    conn.close()
+    return row
+
+
+def replace_group(scan_id, digest, size, members):
+    """
+    Set the members of one group to exactly `members` [(path, mtime)], as
+    watch mode does when files change. Fewer than two members removes the
+    group. Returns the group id, or None if it was removed.
+    """
+    return replace_groups(scan_id, [(digest, size, members)])[0]
+
+
+def replace_groups(scan_id, groups):
+    """
+    replace_group() for [(digest, size, members)] in one transaction. The
+    old rows of every group are deleted before any are inserted, so a path
+    that moved from one group to another never collides with its old row.
+    Returns the group ids (None for removed groups) in order.
+    """
+    conn = get_connection()
+    ids = []
+    with conn:
+        cur = conn.cursor()
+        existing = []
+        for digest, size, _ in groups:
+            row = cur.execute("SELECT id FROM dup_groups WHERE scan_id=? AND digest=? AND size=?",
+                              (scan_id, digest, size)).fetchone()
+            if row is not None:
+                cur.execute("DELETE FROM duplicates WHERE group_id=?", (row[0],))
+            existing.append(row[0] if row else None)
+        for (digest, size, members), group_id in zip(groups, existing):
+            if len(members) < 2:
+                if group_id is not None:
+                    cur.execute("DELETE FROM dup_groups WHERE id=?", (group_id,))
+                ids.append(None)
+                continue
+            if group_id is None:
+                cur.execute(
+                    "INSERT INTO dup_groups (scan_id, digest, size, member_count, wasted_bytes) VALUES (?, ?, ?, ?, ?)",
+                    _group_values(scan_id, digest, size, len(members)),
+                )
+                group_id = cur.lastrowid
+            else:
+                cur.execute("UPDATE dup_groups SET member_count=?, wasted_bytes=? WHERE id=?",
+                            (len(members), (len(members) - 1) * size, group_id))
+            wasted = (len(members) - 1) * size
+            cur.executemany(
+                "INSERT INTO duplicates (scan_id, group_id, file_path, file_hash, file_size, file_mtime, group_wasted) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(scan_id, group_id, path, digest, size, mtime or 0, wasted) for path, mtime in members],
+            )
+            ids.append(group_id)
+    conn.close()
+    return ids
+
+
 def remove_duplicate_by_path(scan_id, file_path):
+    """
+    Drop one member (e.g. after it was archived) and update its group.
+    A group left with a single member is no longer a duplicate and is removed.
+    """
+    remove_duplicates_by_paths(scan_id, [file_path])
+
+
+def remove_duplicates_by_paths(scan_id, file_paths):
+    """remove_duplicate_by_path for many paths, in one transaction."""
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute(
-        "DELETE FROM duplicates WHERE scan_id=? AND file_path LIKE ?",
-        (scan_id, f"%{file_path}%")
-    )
+    for file_path in file_paths:
+        row = cur.execute("SELECT id, group_id FROM duplicates WHERE scan_id=? AND file_path=?",
+                          (scan_id, file_path)).fetchone()
+        if row is None:
+            continue
+        cur.execute("DELETE FROM duplicates WHERE id=?", (row[0],))
+        cur.execute("""
+            UPDATE dup_groups
+            SET member_count = member_count - 1, wasted_bytes = (member_count - 2) * size
+            WHERE id=?
+        """, (row[1],))
+        cur.execute("UPDATE duplicates SET group_wasted = (SELECT wasted_bytes FROM dup_groups WHERE id=?) "
+                    "WHERE group_id=?", (row[1], row[1]))
+        cur.execute("DELETE FROM duplicates WHERE group_id IN "
+                    "(SELECT id FROM dup_groups WHERE id=? AND member_count < 2)", (row[1],))
+        cur.execute("DELETE FROM dup_groups WHERE id=? AND member_count < 2", (row[1],))
     conn.commit()
     conn.close()
-
@@ -1,7 +1,10 @@
 # quickpurge/exclusion_rules.py
 import os
 import sys
+import stat
 import logging
+import threading
+import config
 from .utils import log
 from . import database
 
@@ -31,6 +34,9 @@ else:  # Linux/macOS
 # Add common dev/build folders (always skipped)
 DEV_PROTECTED = ["node_modules", ".git", "__pycache__", "build", "dist", "venv"]
 
+# Per-filesystem archive folders (see safe_delete.archive_root); never scanned
+MOUNT_ARCHIVE_NAME = ".quickpurge_archive"
+
 # Normalize and drop Nones
 DEFAULT_PROTECTED_FOLDERS = [p for p in DEFAULT_PROTECTED_FOLDERS if p]
 
@@ -52,11 +58,8 @@ def delete_exclusion(pattern):
     database.remove_exclusion(pattern)
 
 def list_exclusions():
-    """Return DB rows — keep original shape used elsewhere."""
-    # DB may store (pattern,) or (pattern,is_folder). Adapt if needed.
-    rows = database.get_exclusions()
-    # If DB get_exclusions returns just patterns, convert to (pattern, True)
-    return [(r, True) if not isinstance(r, (list, tuple)) else r for r in rows]
+    """Return DB rows as (pattern, is_folder) tuples."""
+    return database.get_exclusion_rules()
 
 # Windows attribute check
 def _is_system_or_hidden_windows(path):
@@ -71,94 +74,208 @@ def _is_system_or_hidden_windows(path):
     except Exception:
         return False
 
-def _is_hardlink_or_special(path):
+def _is_special(path, st=None):
+    """FIFOs, sockets and device nodes (reading them can block or never end).
+    Hardlinks are NOT excluded: the scanner groups them by inode instead."""
     try:
-        st = os.stat(path)
-        return getattr(st, "st_nlink", 1) > 1
+        if st is None:
+            st = os.stat(path)
+        mode = getattr(st, "st_mode", None)  # walker FileEntries are regular files already
+        if mode is None:
+            return False
+        return not (stat.S_ISREG(mode) or stat.S_ISDIR(mode))
     except Exception:
         return False
 
-def should_exclude(path):
+
+# ---- Compiled matcher ----
+_TERMINAL = "\0"  # trie marker; can never be a path component
+
+
+def _archive_dirs():
+    """The home archive folder (read at call time: tests point it elsewhere)."""
+    from . import safe_delete  # safe_delete imports this module
+    return [safe_delete.ARCHIVE_DIR]
+
+
+def _path_parts(path):
+    """Normalized, lower-cased path components (drive/root collapsed away)."""
+    norm = os.path.abspath(os.path.normpath(path)).lower()
+    return [p for p in norm.split(os.sep) if p]
+
+
+class ExclusionMatcher:
     """
-    Return True if file/folder should be excluded from scanning.
-    Combines:
-      - user-defined DB exclusions
-      - default protected folders
-      - protected file extensions
-      - windows system/hidden attributes
-      - hard-links and other special files
+    Exclusion rules compiled once (per scan) instead of queried per file.
+    - folder rules and protected folders -> prefix trie over path components
+    - suffix rules -> one str.endswith() over a tuple, against the whole
+      normalized path (a rule may span components, e.g. "cache/x.tmp")
+    - DEV_PROTECTED folder names -> pruned wherever they appear in a walk
+    - archive folders (ARCHIVE_DIR, MOUNT_ARCHIVE_NAME anywhere) -> always
+      excluded, so archived files and blobs never show up as duplicates
+    `version` is the DB exclusions_version the rules were loaded at.
     """
-    if not path:
-        return True
 
-    # Normalize
-    try:
-        path_norm = os.path.abspath(os.path.normpath(path))
-    except Exception:
-        path_norm = path
+    def __init__(self, rules=(), protected_folders=None, version=None, dev_protected=None,
+                 archive_dirs=None):
+        self.version = version
+        self._trie = {}
+        self._exact = set()
+        suffixes = []
+        if dev_protected is None:
+            dev_protected = DEV_PROTECTED
+        self._dev_names = frozenset(n.lower() for n in dev_protected) | {MOUNT_ARCHIVE_NAME}
+        if archive_dirs is None:
+            archive_dirs = _archive_dirs()
+        for archive_dir in archive_dirs:
+            self._add_prefix(archive_dir)
 
-    # 1) DB exclusions
-    try:
-        exclusions = list_exclusions()  # list of (pattern, is_folder)
-    except Exception:
-        exclusions = []
+        for pattern, is_folder in rules:
+            if not pattern:
+                continue
+            if is_folder:
+                self._add_prefix(pattern)
+            else:
+                suffixes.append(pattern.lower())
 
-    path_lower = path_norm.lower()
+        if protected_folders is None:
+            protected_folders = DEFAULT_PROTECTED_FOLDERS
+        for prot in protected_folders:
+            if not prot:
+                continue
+            parts = _path_parts(prot)
+            prot_abs = os.path.abspath(prot)
+            if os.path.dirname(prot_abs) == prot_abs:
+                # a filesystem root protects itself as a scan target, not
+                # everything beneath it (that would exclude every path)
+                self._exact.add(tuple(parts))
+            else:
+                self._add_prefix(prot)
 
-    for pattern, is_folder in exclusions:
-        if not pattern:
-            continue
+        self._suffixes = tuple(suffixes)
+
+    @classmethod
+    def load(cls, version=None):
+        """Build a matcher from the rules currently stored in the DB."""
         try:
-            pat = os.path.abspath(os.path.normpath(pattern))
-            if is_folder:
-                # commonpath can raise if on different drives; handle safely
-                try:
-                    if os.path.commonpath([path_lower, pat.lower()]) == pat.lower():
-                        return True
-                except Exception:
-                    if path_lower.startswith(pat.lower()):
-                        return True
-            else:
-                if path_lower.endswith(pattern.lower()):
-                    return True
+            if version is None:
+                version = database.get_exclusions_version()
+            rules = database.get_exclusion_rules()
         except Exception:
-            # fallback string checks
-            if is_folder and path_lower.startswith(pattern.lower()):
-                return True
-            if not is_folder and path_lower.endswith(pattern.lower()):
+            rules = []
+        return cls(rules, version=version)
+
+    def _add_prefix(self, path):
+        node = self._trie
+        for part in _path_parts(path):
+            node = node.setdefault(part, {})
+        node[_TERMINAL] = True
+
+    def _prefix_match(self, parts):
+        node = self._trie
+        if _TERMINAL in node:
+            return True
+        for part in parts:
+            node = node.get(part)
+            if node is None:
+                return False
+            if _TERMINAL in node:
                 return True
+        return False
 
-    # 2) Default protected folders
-    for prot in DEFAULT_PROTECTED_FOLDERS:
-        if not prot:
-            continue
+    def excludes_folder(self, path):
+        """True if a folder rule or protected folder covers `path`."""
         try:
-            prot_norm = os.path.abspath(os.path.normpath(prot)).lower()
-            try:
-                if os.path.commonpath([path_lower, prot_norm]) == prot_norm:
-                    return True
-            except Exception:
-                if path_lower.startswith(prot_norm):
-                    return True
+            return self._prefix_match(_path_parts(path))
         except Exception:
-            continue
+            return False
 
-    # 3) Protected extensions
-    _, ext = os.path.splitext(path_lower)
-    if ext in PROTECTED_EXTENSIONS:
-        return True
+    def prunes_dir(self, path):
+        """True if a walk should not descend into directory `path` at all."""
+        if os.path.basename(os.path.normpath(path)).lower() in self._dev_names:
+            return True
+        return self.excludes_folder(path)
 
-    # 4) Windows attributes
-    if os.name == "nt":
-        if _is_system_or_hidden_windows(path_norm):
+    def excludes(self, path, st=None):
+        """Same checks as should_exclude(); `st` reuses an existing stat result
+        (an os.stat_result or a walker.FileEntry)."""
+        if not path:
             return True
 
-    # 5) Hardlinks or special file types
-    try:
-        if _is_hardlink_or_special(path_norm):
+        try:
+            norm = os.path.abspath(os.path.normpath(path)).lower()
+            parts = [p for p in norm.split(os.sep) if p]
+        except Exception:
+            return False
+
+        # 1) + 2) DB folder rules and default protected folders
+        if self._prefix_match(parts) or tuple(parts) in self._exact:
             return True
-    except Exception:
-        pass
+        if MOUNT_ARCHIVE_NAME in parts:
+            return True
+
+        last = parts[-1] if parts else ""
+
+        # DB suffix rules
+        if self._suffixes and norm.endswith(self._suffixes):
+            return True
+
+        # 3) Protected extensions
+        _, ext = os.path.splitext(last)
+        if ext in PROTECTED_EXTENSIONS:
+            return True
+
+        # 4) Windows attributes
+        if os.name == "nt":
+            if _is_system_or_hidden_windows(path):
+                return True
+
+        # 5) Special file types
+        try:
+            if _is_special(path, st):
+                return True
+        except Exception:
+            pass
+
+        return False
 
-    return False
 
+_matcher = None
+_matcher_key = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher(refresh=False):
+    """
+    Return the shared compiled matcher. Edits made through this process
+    recompile it right away. With refresh=True it also checks the
+    exclusions_version stamp in the meta table, which catches edits made by
+    another process. Scans and other operations ask for that once at their
+    start, so per-path checks (should_exclude) never touch the DB.
+    """
+    global _matcher, _matcher_key
+    key = (config.DB_PATH, tuple(_archive_dirs()), database.exclusion_edits)
+    with _matcher_lock:
+        if _matcher is not None and _matcher_key == key and not refresh:
+            return _matcher
+        try:
+            version = database.get_exclusions_version()
+        except Exception:
+            version = None
+        if _matcher is None or _matcher_key != key or _matcher.version != version:
+            _matcher = ExclusionMatcher.load(version)
+        _matcher_key = key
+        return _matcher
+
+
+def should_exclude(path):
+    """
+    Return True if file/folder should be excluded from scanning.
+    Combines:
+      - user-defined DB exclusions
+      - default protected folders
+      - protected file extensions
+      - windows system/hidden attributes
+      - special files (FIFOs, sockets, devices)
+    """
+    return get_matcher().excludes(path)
@@ -0,0 +1,171 @@
+import os
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# ---- Hash backends ----
+# name -> zero-arg factory returning a hashlib-style object (update/hexdigest).
+# Process-pool workers import this module fresh, so backends registered at
+# runtime (not at import) are only available to thread pools.
+HASH_BACKENDS = {}
+# backends whose digests may stand in for the bytes (content-addressed archive)
+COLLISION_RESISTANT = set()
+
+
+def register_backend(name, factory, collision_resistant=False):
+    """Register a hash algorithm under `name` (stored on scans.hash_algo)."""
+    HASH_BACKENDS[name] = factory
+    if collision_resistant:
+        COLLISION_RESISTANT.add(name)
+    else:
+        COLLISION_RESISTANT.discard(name)
+
+
+def get_backend(name):
+    """Return the factory for `name`; raises ValueError for unknown algorithms."""
+    try:
+        return HASH_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown hash algorithm: {name!r} (available: {', '.join(sorted(HASH_BACKENDS))})")
+
+
+def new_hasher(name):
+    return get_backend(name)()
+
+
+for _name in ("blake2b", "blake2s", "sha256", "sha1", "sha512", "sha3_256", "md5"):
+    if _name in hashlib.algorithms_available:
+        register_backend(_name, getattr(hashlib, _name), collision_resistant=_name not in ("md5", "sha1"))
+
+
+def benchmark_backends(size=64 * 1024 * 1024, chunk_size=1024 * 1024, names=None):
+    """
+    Measure in-memory throughput of each backend on this host.
+    Returns {name: MB/s}, fastest first.
+    """
+    buf = os.urandom(chunk_size)
+    rounds = max(1, size // chunk_size)
+    results = {}
+    for name in names or sorted(HASH_BACKENDS):
+        h = new_hasher(name)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            h.update(buf)
+        h.hexdigest()
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        results[name] = round(rounds * chunk_size / elapsed / (1024 * 1024), 1)
+    return dict(sorted(results.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def is_rotational(dev):
+    """
+    Best-effort check whether st_dev lives on a spinning disk.
+    Linux only (reads /sys/dev/block); anything else reports False.
+    """
+    try:
+        base = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+        # partitions keep their queue/ settings on the parent device
+        for cand in (os.path.join(base, "queue", "rotational"),
+                     os.path.join(base, "..", "queue", "rotational")):
+            if os.path.exists(cand):
+                with open(cand, "r") as f:
+                    return f.read().strip() == "1"
+    except Exception:
+        pass
+    return False
+
+
+class HashExecutor:
+    """
+    Runs hashing jobs on a thread or process pool and yields results as they
+    complete. hashlib releases the GIL on large updates, so threads already
+    scale; kind="process" sidesteps the GIL entirely for small files.
+
+    Jobs are (tag, st_dev, args) tuples. At most `per_device` jobs run on one
+    device at a time (default: `rotational_cap` for spinning disks, otherwise
+    `workers`), and devices are served round-robin.
+    With workers <= 1 jobs run inline on the calling thread.
+    """
+
+    def __init__(self, workers=1, kind="thread", per_device=None, rotational_cap=1):
+        if kind not in ("thread", "process"):
+            raise ValueError("kind must be 'thread' or 'process'")
+        self.workers = max(1, int(workers or 1))
+        self.kind = kind
+        self.per_device = per_device
+        self.rotational_cap = rotational_cap
+        self._caps = {}
+        self._pool = None
+        if self.workers > 1 and kind == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        elif self.workers > 1:
+            # imported on demand: multiprocessing is slow to import
+            from concurrent.futures import ProcessPoolExecutor
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+        return False
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def device_cap(self, dev):
+        if self.per_device:
+            return self.per_device
+        if dev not in self._caps:
+            self._caps[dev] = self.rotational_cap if is_rotational(dev) else self.workers
+        return self._caps[dev]
+
+    def run(self, func, jobs):
+        """Yield (tag, result, error) for func(*args) of every job, in completion order."""
+        if self._pool is None:
+            for tag, _dev, args in jobs:
+                try:
+                    yield tag, func(*args), None
+                except Exception as e:
+                    yield tag, None, e
+            return
+
+        queues = {}
+        for tag, dev, args in jobs:
+            queues.setdefault(dev, deque()).append((tag, args))
+
+        in_flight = {}   # future -> (tag, dev)
+        running = {}     # dev -> jobs in flight
+        limit = self.workers * 2
+
+        def fill():
+            progressed = True
+            while progressed and len(in_flight) < limit:
+                progressed = False
+                for dev, q in queues.items():
+                    if not q or running.get(dev, 0) >= self.device_cap(dev):
+                        continue
+                    tag, args = q.popleft()
+                    in_flight[self._pool.submit(func, *args)] = (tag, dev)
+                    running[dev] = running.get(dev, 0) + 1
+                    progressed = True
+                    if len(in_flight) >= limit:
+                        break
+
+        fill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                tag, dev = in_flight.pop(fut)
+                running[dev] -= 1
+                err = fut.exception()
+                yield tag, (None if err else fut.result()), err
+            fill()
+
+
+if __name__ == "__main__":
+    for algo, mbps in benchmark_backends().items():
+        print(f"{algo:10s} {mbps:10.1f} MB/s")
@@ -1,6 +1,7 @@
 from . import database
 from .utils import log
 import datetime
+import json
 
 def get_scan_history(limit=20):
     """
@@ -11,12 +12,16 @@ def get_scan_history(limit=20):
     rows = database.get_scan_history(limit)
     history = []
     for row in rows:
+        scan = dict(zip(database.SCAN_HISTORY_COLUMNS, row))
         history.append({
-            "scan_id": row[0],
-            "timestamp": datetime.datetime.fromtimestamp(row[1]).strftime("%Y-%m-%d %H:%M:%S"),
-            "total_files": row[2],
-            "total_duplicates": row[3],
-            "total_size_saved": row[4]
+            "scan_id": scan["id"],
+            "timestamp": datetime.datetime.fromtimestamp(scan["timestamp"]).strftime("%Y-%m-%d %H:%M:%S"),
+            "total_files": scan["total_files"],
+            "total_duplicates": scan["total_duplicates"],
+            "total_size_saved": scan["total_size_saved"],
+            "hash_algo": scan["hash_algo"],
+            # per-phase timings / counters (see quickpurge.metrics.ScanMetrics)
+            "metrics": json.loads(scan["metrics"]) if scan["metrics"] else None,
         })
     return history
 
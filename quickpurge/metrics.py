@@ -0,0 +1,70 @@
+import sys
+import time
+from contextlib import contextmanager
+
+PHASES = ("walk", "exclusion", "grouping", "hashing", "db_write")
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ScanMetrics:
+    """
+    Per-scan counters and wall time per phase (see PHASES).
+    snapshot() returns a JSON-ready dict; the scanner sends it through
+    on_progress while running and stores the final one on the scan row.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.counters = {
+            "files_stated": 0,
+            "files_hashed": 0,
+            "bytes_read": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "excluded_entries": 0,
+            "dirs_pruned": 0,
+        }
+        self.errors = {}
+
+    def add_time(self, phase, seconds):
+        self.phases[phase] += seconds
+
+    @contextmanager
+    def timed(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[phase] += time.perf_counter() - start
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def error(self, kind, n=1):
+        """Count an error by type (usually the exception class name)."""
+        if n:
+            self.errors[kind] = self.errors.get(kind, 0) + n
+
+    def snapshot(self, **extra):
+        data = {
+            "started_at": int(self.started_at),
+            "wall_s": round(time.perf_counter() - self._t0, 4),
+            "phases": {name: round(s, 4) for name, s in self.phases.items()},
+        }
+        data.update(self.counters)
+        data["errors"] = dict(self.errors)
+        data["peak_rss_bytes"] = peak_rss_bytes()
+        data.update(extra)
+        return data
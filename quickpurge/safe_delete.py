@@ -1,9 +1,14 @@
 import os
+import errno
 import shutil
+import filecmp
 import time
 import json
+from config import ARCHIVE_WORKERS, ARCHIVE_BATCH, ARCHIVE_MOUNT_ROOTS, ARCHIVE_DEDUP, HASH_ALGORITHM
+from . import database
+from .hashing import COLLISION_RESISTANT
 from .utils import log
-from .exclusion_rules import should_exclude
+from .exclusion_rules import should_exclude, get_matcher, MOUNT_ARCHIVE_NAME
 
 
 # Archive folder in the user's home directory
@@ -20,43 +25,159 @@ def ensure_archive_folder():
         log(f"Failed to create archive folder: {e}")
 
 
-def safe_delete(file_path):
+def in_archive(path):
+    """True if `path` lies inside an archive folder (ARCHIVE_DIR or any MOUNT_ARCHIVE_NAME)."""
+    path = os.path.abspath(path)
+    if MOUNT_ARCHIVE_NAME in path.split(os.sep):
+        return True
+    root = os.path.abspath(ARCHIVE_DIR)
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def _mount_top(path, st_dev):
+    """Topmost directory above `path` that is still on filesystem `st_dev`."""
+    top = os.path.dirname(os.path.abspath(path))
+    while True:
+        parent = os.path.dirname(top)
+        if parent == top:
+            return top
+        try:
+            if os.stat(parent).st_dev != st_dev:
+                return top
+        except OSError:
+            return top
+        top = parent
+
+
+def archive_root(path, st_dev, roots=None):
+    """
+    Archive folder on the same filesystem as `path` (device `st_dev`), so
+    archiving it is a rename rather than a copy: ARCHIVE_DIR when it shares
+    the device, else a hidden MOUNT_ARCHIVE_NAME folder at the top of the
+    mount (if ARCHIVE_MOUNT_ROOTS allows it and the folder can be created).
+    Falls back to ARCHIVE_DIR, which then means a cross-device copy.
+    `roots` caches the answer per device for the length of one operation.
+    """
+    if roots is not None and st_dev in roots:
+        return roots[st_dev]
+    ensure_archive_folder()
+    root = ARCHIVE_DIR
+    try:
+        same_device = os.stat(ARCHIVE_DIR).st_dev == st_dev
+    except OSError:
+        same_device = False
+    if not same_device and ARCHIVE_MOUNT_ROOTS:
+        candidate = os.path.join(_mount_top(path, st_dev), MOUNT_ARCHIVE_NAME)
+        try:
+            os.makedirs(candidate, exist_ok=True)
+            if os.stat(candidate).st_dev == st_dev and os.access(candidate, os.W_OK | os.X_OK):
+                root = candidate
+        except OSError as e:
+            log(f"Cannot use archive folder {candidate}: {e}")
+    if root == ARCHIVE_DIR and not same_device:
+        log(f"No archive folder on the filesystem of {path}; archiving it copies to {ARCHIVE_DIR}")
+    if roots is not None:
+        roots[st_dev] = root
+    return root
+
+
+def _archive_path(file_path, reserved=None, root=None):
+    """Unique archive path for `file_path` (names in `reserved` count as taken)."""
+    root = root or ARCHIVE_DIR
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    millis = int(time.time() * 1000) % 1000
+    base_name = os.path.basename(file_path)
+    archive_path = os.path.join(root, f"{timestamp}-{millis}_{base_name}")
+    n = 1
+    while (reserved is not None and archive_path in reserved) or os.path.exists(archive_path):
+        archive_path = os.path.join(root, f"{timestamp}-{millis}-{n}_{base_name}")
+        n += 1
+    if reserved is not None:
+        reserved.add(archive_path)
+    return archive_path
+
+
+def _archive_move(src, dst):
+    """
+    os.rename src -> dst; only across filesystems (EXDEV) fall back to
+    copying and deleting. Returns True if the file had to be copied.
+    """
+    try:
+        os.rename(src, dst)
+        return False
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    try:
+        shutil.copy2(src, dst)
+        os.remove(src)
+    except BaseException:
+        if os.path.exists(src) and os.path.exists(dst):
+            os.remove(dst)
+        raise
+    return True
+
+
+def _move_with_entry(src, dst, record, move=shutil.move):
+    """
+    move(src, dst) with record(conn) writing the manifest change in the
+    same transaction: the row is committed only if the move succeeded, and
+    the move is undone if the commit fails. Returns what move() returned.
+    """
+    conn = database.get_connection()
+    try:
+        record(conn)
+        moved = move(src, dst)
+        try:
+            conn.commit()
+        except Exception:
+            shutil.move(dst, src)
+            raise
+        return moved
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def safe_delete(file_path, scan_id=None, digest=None):
     """
     Moves the file to the archive folder instead of deleting it permanently.
-    Saves metadata so it can be restored later.
+    Its original path goes into the archive_entries table so it can be
+    restored later (digest defaults to the file's hash in `scan_id`).
+    With ARCHIVE_DEDUP the file goes to the content-addressed store instead
+    (see archive_many()).
     Returns True if successful, False otherwise.
     """
+    if ARCHIVE_DEDUP:
+        return archive_many([file_path], scan_id=scan_id, workers=1, dedup=True)[0]["ok"]
     try:
         ensure_archive_folder()
 
-        if should_exclude(file_path):
-            log(f"Refused to archive protected file: {file_path}")
+        if in_archive(file_path):
+            log(f"Refused to archive a file that is already in the archive: {file_path}")
             return False
 
-        if not os.path.exists(file_path):
-            log(f"File not found for archiving: {file_path}")
+        if should_exclude(file_path):
+            log(f"Refused to archive protected file: {file_path}")
             return False
 
         if not os.path.exists(file_path):
             log(f"File not found for archiving: {file_path}")
             return False
 
-        # Unique archive filename to prevent overwriting
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        millis = int(time.time() * 1000) % 1000
-        base_name = os.path.basename(file_path)
-        archive_name = f"{timestamp}-{millis}_{base_name}"
-        archive_path = os.path.join(ARCHIVE_DIR, archive_name)
-
-        # Move file to archive
-        shutil.move(file_path, archive_path)
-        log(f"File moved to archive: {file_path} -> {archive_path}")
-
-        # Save original path metadata
-        meta_path = archive_path + ".meta.json"
-        with open(meta_path, "w", encoding="utf-8") as mf:
-            json.dump({"original_path": file_path}, mf)
+        # Unique archive filename on the file's own filesystem
+        st = os.stat(file_path)
+        archive_path = _archive_path(file_path, root=archive_root(file_path, st.st_dev))
 
+        # Move file to archive, recording where it came from
+        copied = _move_with_entry(file_path, archive_path, lambda conn: database.insert_archive_entry(
+            conn, archive_path, file_path, st.st_size, digest=digest, scan_id=scan_id), move=_archive_move)
+        if copied:
+            log(f"File copied to archive across filesystems: {file_path} -> {archive_path}")
+        else:
+            log(f"File moved to archive: {file_path} -> {archive_path}")
         return True
 
     except Exception as e:
@@ -67,19 +188,40 @@ def safe_delete(file_path):
 def permanent_delete(file_path):
     """
     Permanently deletes a file in archive (use with caution).
+    A content-addressed entry drops its blob reference; the blob itself is
+    deleted with its last reference. An entry whose file is already gone is
+    dropped as well (True); False only if there was nothing to delete.
     """
     try:
+        entry = database.get_archive_entry(file_path)
+        if entry is not None and entry[7] is not None:
+            conn = database.get_connection()
+            with conn:
+                released = database.delete_archive_entry(conn, file_path)
+            conn.close()
+            _remove_blobs(released)
+            log(f"Archive entry permanently deleted: {file_path}"
+                + (f" (last reference, removed {released[0]})" if released else ""))
+            return True
         if os.path.exists(file_path):
             os.remove(file_path)
-            # Remove metadata too if exists
-            meta_path = file_path + ".meta.json"
-            if os.path.exists(meta_path):
-                os.remove(meta_path)
+            # drop its manifest entry too, if it was archived
+            conn = database.get_connection()
+            with conn:
+                database.delete_archive_entry(conn, file_path)
+            conn.close()
             log(f"File permanently deleted: {file_path}")
             return True
-        else:
-            log(f"File not found for permanent deletion: {file_path}")
-            return False
+        if entry is not None:
+            # the file is already gone: an entry that can't be restored or deleted goes too
+            conn = database.get_connection()
+            with conn:
+                database.delete_archive_entry(conn, file_path)
+            conn.close()
+            log(f"Archived file already gone, entry dropped: {file_path}")
+            return True
+        log(f"File not found for permanent deletion: {file_path}")
+        return False
     except Exception as e:
         log(f"Failed to permanently delete {file_path}: {e}")
         return False
@@ -91,24 +233,24 @@ def restore_file(archive_file):
     Returns True if successful, False otherwise.
     """
     try:
-        meta_path = archive_file + ".meta.json"
-        if not os.path.exists(meta_path):
-            log(f"No metadata found for restoring: {archive_file}")
+        entry = database.get_archive_entry(archive_file)
+        if entry is None:
+            log(f"No archive entry found for restoring: {archive_file}")
             return False
+        original_path = entry[2]
+        if entry[7] is not None:
+            # content-addressed: copy out of (or take) the shared blob
+            return restore_many([archive_file], workers=1)[0]["ok"]
 
-        with open(meta_path, "r", encoding="utf-8") as mf:
-            metadata = json.load(mf)
-        original_path = metadata.get("original_path")
-
-        if not original_path:
-            log(f"No original path in metadata for {archive_file}")
+        if os.path.exists(original_path):
+            log(f"Refused to restore over an existing file: {original_path}")
             return False
 
         # Ensure target directory exists
         os.makedirs(os.path.dirname(original_path), exist_ok=True)
 
-        shutil.move(archive_file, original_path)
-        os.remove(meta_path)  # remove metadata after restore
+        _move_with_entry(archive_file, original_path,
+                         lambda conn: database.delete_archive_entry(conn, archive_file))
         log(f"Restored file: {archive_file} -> {original_path}")
         return True
 
@@ -116,3 +258,444 @@ def restore_file(archive_file):
         log(f"Failed to restore {archive_file}: {e}")
         return False
 
+
+
+def import_sidecars(archive_dir=None):
+    """
+    Convert .meta.json sidecars written by older versions into
+    archive_entries rows, then delete them. Returns the number imported.
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    if not os.path.isdir(archive_dir):
+        return 0
+    imported = 0
+    conn = database.get_connection()
+    try:
+        for name in os.listdir(archive_dir):
+            if not name.endswith(".meta.json"):
+                continue
+            meta_path = os.path.join(archive_dir, name)
+            archive_path = meta_path[:-len(".meta.json")]
+            try:
+                with open(meta_path, "r", encoding="utf-8") as mf:
+                    original_path = json.load(mf).get("original_path")
+                size = os.path.getsize(archive_path)
+                archived_at = int(os.path.getmtime(meta_path))  # written right after the move
+            except (OSError, ValueError) as e:
+                log(f"Skipping archive metadata {meta_path}: {e}")
+                continue
+            if not original_path:
+                continue
+            with conn:
+                database.delete_archive_entry(conn, archive_path)  # re-import replaces
+                database.insert_archive_entry(conn, archive_path, original_path, size,
+                                              archived_at=archived_at)
+            os.remove(meta_path)
+            imported += 1
+    finally:
+        conn.close()
+    if imported:
+        log(f"Imported {imported} archive metadata files into the database.")
+    return imported
+
+
+def reconcile_pending():
+    """
+    Settle manifest rows left pending by an archive_many() / restore_many()
+    batch that never finished (crash, kill). Each row is checked against the
+    filesystem:
+    - archive: keep the row if the file reached the archive and left its
+      original path, else drop it (and a half-finished archive copy); a
+      blob entry whose file was stored on its own path loses its blob
+    - restore: drop the row once the file is back (a blob copy only when it
+      has the full size), else keep it
+    Returns the number of rows settled.
+    """
+    rows = database.get_pending_archive_entries()
+    keep, drop, detach = [], [], []
+    for archive_path, original, size, blob, pending in rows:
+        stored = os.path.exists(blob or archive_path)
+        back = os.path.exists(original)
+        if pending == "archive":
+            if blob is not None and os.path.exists(archive_path) and not back:
+                keep.append(archive_path)  # differed from the blob (see _absorb)
+                detach.append(archive_path)
+            elif stored and not back:
+                keep.append(archive_path)
+            else:
+                drop.append(archive_path)
+                if back and blob is None and stored:
+                    try:
+                        os.remove(archive_path)  # cross-device copy that never removed its source
+                    except OSError as e:
+                        log(f"Failed to remove partial archive copy {archive_path}: {e}")
+        elif blob is not None:
+            restored = back and (size is None or os.path.getsize(original) == size)
+            (drop if restored else keep).append(archive_path)
+        else:
+            (keep if stored else drop).append(archive_path)
+    if not rows:
+        return 0
+    conn = database.get_connection()
+    with conn:
+        released = database.delete_archive_entries(conn, drop)
+        released += database.detach_archive_blobs(conn, detach)
+        database.set_archive_pending(conn, keep)
+    conn.close()
+    _remove_blobs(released)
+    log(f"Settled {len(rows)} interrupted archive operations ({len(keep)} kept, {len(drop)} dropped).")
+    return len(rows)
+
+
+def ensure_manifest():
+    """
+    Run import_sidecars() once per database (older archives may still have
+    sidecars), and settle rows an interrupted bulk operation left pending.
+    """
+    if database.get_meta("archive_sidecars_imported") is None:
+        import_sidecars()
+        database.set_meta("archive_sidecars_imported", int(time.time()))
+    reconcile_pending()
+
+
+# ---- Bulk archive / restore ----
+def _emit(on_progress, **info):
+    if on_progress:
+        try:
+            on_progress(info)
+        except Exception:
+            pass
+
+
+def _cancelled(cancel_flag):
+    if callable(cancel_flag):
+        return cancel_flag()
+    return bool(cancel_flag and cancel_flag.get("cancel"))
+
+
+def _blob_path(root, algorithm, digest):
+    """Where the content-addressed store under archive root `root` keeps `digest`."""
+    return os.path.join(root, "blobs", algorithm, digest[:2], digest)
+
+
+def _remove_blobs(blob_paths):
+    """Delete blob files whose last reference is gone."""
+    for blob in blob_paths:
+        try:
+            os.remove(blob)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log(f"Failed to remove archive blob {blob}: {e}")
+
+
+def _absorb(target, srcs, store):
+    """
+    Archive `srcs` [(path, own archive path)], which all have the digest of
+    `target`. With `store` the first one is moved to `target` (rename, or a
+    copy across filesystems). The others are deleted once a byte comparison
+    shows `target` already holds their content; one that differs (a stale
+    cache entry, a collision) is moved to its own archive path instead.
+    Returns [(copied, error, separate)] per src.
+    """
+    outcomes = []
+    if store:
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            outcomes.append((_archive_move(srcs[0][0], target), None, False))
+        except Exception as e:
+            return [(False, e, False)] * len(srcs)
+    for src, own in srcs[len(outcomes):]:
+        try:
+            if not os.path.exists(target):
+                raise FileNotFoundError(f"archive blob missing: {target}")
+            if os.path.samefile(src, target):
+                raise ValueError(f"refusing to delete the archive blob itself: {src}")
+            if filecmp.cmp(src, target, shallow=False):
+                os.remove(src)
+                outcomes.append((False, None, False))
+            else:
+                log(f"Archive: {src} differs from blob {target}; storing it on its own.")
+                os.makedirs(os.path.dirname(own), exist_ok=True)
+                outcomes.append((_archive_move(src, own), None, True))
+        except Exception as e:
+            outcomes.append((False, e, False))
+    return outcomes
+
+
+def _materialize(source, targets, take):
+    """
+    Restore `source` to every path in `targets`. Each target gets a copy,
+    except that with `take` (nothing else references `source`) the last one
+    gets `source` itself by rename, provided every copy succeeded.
+    Returns [error or None] per target.
+    """
+    errors = []
+    for n, dst in enumerate(targets, 1):
+        try:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if take and n == len(targets) and not any(errors):
+                shutil.move(source, dst)
+            else:
+                try:
+                    shutil.copy2(source, dst)
+                except BaseException:
+                    if os.path.exists(dst):
+                        os.remove(dst)  # never leave a partial copy at the original path
+                    raise
+            errors.append(None)
+        except Exception as e:
+            errors.append(e)
+    return errors
+
+
+def _mover(workers, per_device):
+    """Bounded thread pool running at most `per_device` moves per filesystem at once."""
+    from .hashing import HashExecutor
+    return HashExecutor(workers=workers, kind="thread", per_device=per_device)
+
+
+def _run_groups(executor, func, groups):
+    """
+    Run func(target, paths, flag) for each group (target, flag, st_dev,
+    [(item, path)]) on `executor` and return {item: outcome}. One group's
+    files are handled by one job, in order; groups run in parallel.
+    A job that raises gives every item of its group that error.
+    """
+    jobs = [(n, dev, (target, [path for _, path in items], flag))
+            for n, (target, flag, dev, items) in enumerate(groups)]
+    outcomes = {}
+    for n, result, err in executor.run(func, jobs):
+        items = groups[n][3]
+        for k, (item, _) in enumerate(items):
+            outcomes[item] = result[k] if err is None else err
+    return outcomes
+
+
+def _content_digests(planned, cache):
+    """Digest of each planned (path, ...) file: from the hash cache when unchanged since it was hashed."""
+    from .scanner import calculate_hash  # scanner imports this module
+    return [calculate_hash(p, cache=cache) for p, *_ in planned]
+
+
+def archive_many(paths, scan_id=None, workers=ARCHIVE_WORKERS, per_device=None,
+                 on_progress=None, cancel_flag=None, batch_size=ARCHIVE_BATCH, dedup=ARCHIVE_DEDUP):
+    """
+    safe_delete() for many files, meant to run off the UI thread.
+    Each file is renamed into the archive folder on its own filesystem (see
+    archive_root()); files that still need a cross-device copy are reported
+    with "copied": True. Moves run on a bounded thread pool, at most
+    `per_device` at a time per source filesystem (default: one on spinning
+    disks). Manifest rows are written per batch, marked pending, in one
+    transaction before the batch moves. Afterwards one transaction drops
+    the rows of failed moves and confirms the rest, and another drops the
+    archived paths from `scan_id`'s duplicates. Rows a crash leaves pending
+    are settled by reconcile_pending() (run from ensure_manifest()).
+
+    With `dedup` the archive is content-addressed: bytes go to one blob per
+    digest under <archive root>/blobs, and every entry holds a reference to
+    it. The first copy is renamed into the blob. Every later copy is just
+    deleted ("deduplicated": True), so it costs no space and no copy.
+    Digests come from the scan's hash cache and are re-hashed only if a
+    file changed since it was scanned. A copy is only deleted after a byte
+    comparison with its blob, and dedup is refused (files are archived as
+    usual) when the digests come from a hash that isn't collision resistant.
+
+    on_progress gets {"stage": "archive", "done", "total", "failed", "copied"}
+    after each batch; cancel_flag (dict or callable) stops before the next
+    batch. Returns one {"path", "archive_path", "ok", "error", "copied",
+    "deduplicated"} dict per path.
+    """
+    ensure_archive_folder()
+    matcher = get_matcher(refresh=True)
+    results = []
+    planned = []  # (path, archive_path, size, st_dev, root)
+    reserved = set()
+    roots = {}
+
+    def fail(path, error):
+        results.append({"path": path, "archive_path": None, "ok": False, "error": error,
+                        "copied": False, "deduplicated": False})
+
+    for path in paths:
+        if in_archive(path):
+            fail(path, "already in the archive")
+            continue
+        if matcher.excludes(path):
+            fail(path, "protected file")
+            continue
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            fail(path, str(e))
+            continue
+        root = archive_root(path, st.st_dev, roots)
+        planned.append((path, _archive_path(path, reserved, root), st.st_size, st.st_dev, root))
+
+    digests = [None] * len(planned)
+    algorithm = (database.get_scan_algorithm(scan_id) if scan_id is not None else None) or HASH_ALGORITHM
+    if dedup and algorithm not in COLLISION_RESISTANT:
+        log(f"Archive: {algorithm} digests are not collision resistant; archiving without dedup.")
+        dedup = False
+    if dedup and planned:
+        with database.HashCache(scan_id, algorithm=algorithm) as cache:
+            digests = _content_digests(planned, cache)
+            algorithm = cache.algorithm
+        kept = []
+        for item, digest in zip(planned, digests):
+            if digest is None:
+                fail(item[0], "could not hash file")
+            else:
+                kept.append((item, _blob_path(item[4], algorithm, digest), digest))
+        planned = [item for item, _, _ in kept]
+        blobs = [blob for _, blob, _ in kept]
+        digests = [digest for _, _, digest in kept]
+    else:
+        blobs = [None] * len(planned)
+
+    total = len(results) + len(planned)
+    failed, copied = len(results), 0
+    _emit(on_progress, stage="archive", done=len(results), total=total, failed=failed, copied=copied)
+
+    with _mover(workers, per_device) as executor:
+        for start in range(0, len(planned), batch_size):
+            batch = planned[start:start + batch_size]
+            batch_blobs = blobs[start:start + batch_size]
+            if _cancelled(cancel_flag):
+                for p, *_ in batch:
+                    fail(p, "cancelled")
+                failed += len(batch)
+                continue
+            # one group per destination: a blob collects every copy of its content
+            stored = database.get_archive_blobs(b for b in batch_blobs if b is not None)
+            groups = {}
+            for i, ((p, a, _, dev, _), blob) in enumerate(zip(batch, batch_blobs)):
+                target = blob or a
+                if target not in groups:
+                    groups[target] = (target, target not in stored or not os.path.exists(target), dev, [])
+                groups[target][3].append((i, (p, a)))
+            # items that put bytes in the archive; any other blob member is deduplicated
+            storing = {items[0][0] for _, store, _, items in groups.values() if store}
+            conn = database.get_connection()
+            try:
+                # rows stay pending until their move is settled; a crash in between
+                # is resolved by reconcile_pending() at the next start
+                with conn:
+                    database.insert_archive_entries(
+                        conn, [(a, p, size, digests[start + i], batch_blobs[i])
+                               for i, (p, a, size, _, _) in enumerate(batch)], scan_id, pending="archive")
+                outcomes = _run_groups(executor, _absorb, list(groups.values()))
+                outcomes = {i: o if isinstance(o, tuple) else (False, o, False) for i, o in outcomes.items()}
+                with conn:
+                    released = database.delete_archive_entries(
+                        conn, [batch[i][1] for i, (_, err, _) in outcomes.items() if err])
+                    released += database.detach_archive_blobs(
+                        conn, [batch[i][1] for i, (_, err, separate) in outcomes.items() if separate])
+                    database.set_archive_pending(
+                        conn, [batch[i][1] for i, (_, err, _) in outcomes.items() if not err])
+            finally:
+                conn.close()
+            _remove_blobs(released)
+            moved = [p for i, (p, *_) in enumerate(batch) if not outcomes[i][1]]
+            if scan_id is not None and moved:
+                database.remove_duplicates_by_paths(scan_id, moved)
+            for i, (p, a, _, _, _) in enumerate(batch):
+                was_copied, err, separate = outcomes[i]
+                target = a if separate else batch_blobs[i] or a
+                if err:
+                    log(f"Failed to archive {p}: {err}")
+                    failed += 1
+                elif was_copied:
+                    log(f"Copied across filesystems to archive: {p} -> {target}")
+                    copied += 1
+                results.append({"path": p, "archive_path": a if not err else None, "ok": not err,
+                                "error": str(err) if err else None, "copied": bool(was_copied),
+                                "deduplicated": not err and not separate and i not in storing})
+            _emit(on_progress, stage="archive", done=len(results), total=total, failed=failed, copied=copied)
+    log(f"Archived {total - failed} of {total} files ({copied} copied across filesystems).")
+    return results
+
+
+def restore_many(archive_paths, workers=ARCHIVE_WORKERS, per_device=None,
+                 on_progress=None, cancel_flag=None, batch_size=ARCHIVE_BATCH):
+    """
+    restore_file() for many archived files, on the same bounded pool as
+    archive_many(). Entries are looked up in bulk, marked pending while
+    their batch moves, and the rows of restored files are deleted in one
+    transaction per batch. A file is never
+    restored over an existing one, and never over another entry restoring
+    to the same path. Content-addressed entries get a copy of their blob.
+    The blob's last reference gets the blob itself by rename, and a blob
+    nothing references any more is deleted.
+    on_progress gets {"stage": "restore", "done", "total", "failed"}.
+    Returns one {"path", "archive_path", "ok", "error"} dict per archive path
+    ("path" is the original path).
+    """
+    archive_paths = list(archive_paths)
+    entries = database.get_archive_entries(archive_paths)
+    results = []
+    planned = []  # (archive_path, original_path, st_dev, blob)
+    targets = set()
+    for archive_path in archive_paths:
+        entry = entries.get(archive_path)
+        original = entry[2] if entry else None
+        error = None
+        if entry is None:
+            error = "no archive entry"
+        elif original in targets or os.path.exists(original):
+            error = f"refusing to overwrite {original}"
+        else:
+            try:
+                dev = os.stat(entry[7] or archive_path).st_dev
+            except OSError as e:
+                error = str(e)
+        if error:
+            results.append({"path": original, "archive_path": archive_path, "ok": False, "error": error})
+            continue
+        targets.add(original)
+        planned.append((archive_path, original, dev, entry[7]))
+    total = len(results) + len(planned)
+    failed = len(results)
+    _emit(on_progress, stage="restore", done=len(results), total=total, failed=failed)
+
+    with _mover(workers, per_device) as executor:
+        for start in range(0, len(planned), batch_size):
+            batch = planned[start:start + batch_size]
+            if _cancelled(cancel_flag):
+                results += [{"path": o, "archive_path": a, "ok": False, "error": "cancelled"}
+                            for a, o, _, _ in batch]
+                failed += len(batch)
+                continue
+            # one group per source: a blob is copied out, and taken by its last reference
+            refcounts = database.get_archive_blobs(b for *_, b in batch if b is not None)
+            groups = {}
+            for i, (a, o, dev, blob) in enumerate(batch):
+                source = blob or a
+                if source not in groups:
+                    groups[source] = [source, True, dev, []]
+                groups[source][3].append((i, o))
+            for source, group in groups.items():
+                if source in refcounts:
+                    group[1] = len(group[3]) >= refcounts[source][2]
+            conn = database.get_connection()
+            try:
+                with conn:
+                    database.set_archive_pending(conn, [a for a, *_ in batch], "restore")
+                errors = _run_groups(executor, _materialize, [tuple(g) for g in groups.values()])
+                with conn:
+                    released = database.delete_archive_entries(
+                        conn, [a for i, (a, *_) in enumerate(batch) if not errors[i]])
+                    database.set_archive_pending(conn, [a for i, (a, *_) in enumerate(batch) if errors[i]])
+            finally:
+                conn.close()
+            _remove_blobs(released)
+            for i, (a, o, _, _) in enumerate(batch):
+                err = errors[i]
+                if err:
+                    log(f"Failed to restore {a}: {err}")
+                    failed += 1
+                results.append({"path": o, "archive_path": a, "ok": not err,
+                                "error": str(err) if err else None})
+            _emit(on_progress, stage="restore", done=len(results), total=total, failed=failed)
+    log(f"Restored {total - failed} of {total} files.")
+    return results
@@ -1,13 +1,19 @@
 import os
-import hashlib
-from config import HASH_CHUNK_SIZE
-from .utils import log, file_chunks, notify
+import time
+from config import (HASH_CHUNK_SIZE, HASH_ALGORITHM, HASH_WORKERS, HASH_POOL, WALK_THREADS,
+                    CHECKPOINT_INTERVAL, INCREMENTAL_SCAN, FULL_VERIFY_INTERVAL)
+from .utils import log, notify, file_buffers, adaptive_chunk_size
 from . import database
-from .exclusion_rules import should_exclude
+from .hashing import HashExecutor, get_backend, new_hasher
+from .walker import Walker, FileEntry, file_entry
+from .metrics import ScanMetrics
+from .exclusion_rules import should_exclude, get_matcher
 from .safe_delete import safe_delete
 
 SAFE_DELETE_DURING_SCAN = False  # True to auto-archive duplicates as found
 CHUNK_SIZE = HASH_CHUNK_SIZE
+SAMPLE_SIZE = 64 * 1024  # bytes read from each end of a file in the sample stage
+METRICS_EVERY = 200  # attach a metrics snapshot to every Nth progress event
 
 
 # ---- Helper: progress emitter ----
@@ -34,48 +40,269 @@ def _is_cancelled(cancel_flag):
     return False
 
 
-def calculate_hash(file_path):
-    """Calculate SHA256 hash in chunks to save memory (works for any file type)."""
-    sha256 = hashlib.sha256()
+def _log_hash_error(file_path, e):
+    if isinstance(e, PermissionError):
+        log(f"Skipping (no permission): {file_path}")
+    elif isinstance(e, FileNotFoundError):
+        log(f"Skipping (not found): {file_path}")
+    elif isinstance(e, OSError):
+        # Special handling for locked/in-use files (common with videos/photos in editors)
+        if e.errno == 22:  # Invalid argument (often bad path/locked file)
+            log(f"Skipping (invalid/locked): {file_path}")
+        else:
+            log(f"Skipping (OS error {e.errno}): {file_path} -> {e}")
+    else:
+        # Catch-all safety (shouldn't happen often)
+        log(f"Unexpected error hashing {file_path}: {e}")
+
+
+def _full_hash(file_path, key=None, algorithm=HASH_ALGORITHM):
+    """Digest of the whole file -> (digest, bytes_read, stable). Raises on read errors.
+    `stable` is True when the file still matches stat key `key` after reading,
+    i.e. the digest is safe to cache. Runs in hashing workers (thread or process)."""
+    hasher = new_hasher(algorithm)
+    bytes_read = 0
+    # Try opening in binary mode (works for images, videos, any type)
+    with open(file_path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        chunk_size = adaptive_chunk_size(size, CHUNK_SIZE)
+        # double-buffered readinto(); a reader thread only pays off past a couple of chunks
+        for view in file_buffers(f, chunk_size, threaded=size > 2 * chunk_size):
+            hasher.update(view)
+            bytes_read += len(view)
+
+    stable = key is not None and database.stat_key(os.stat(file_path)) == key
+    return hasher.hexdigest(), bytes_read, stable
+
+
+def _sample_hash(file_path, size, algorithm=HASH_ALGORITHM):
+    """Hash of size + first/last SAMPLE_SIZE bytes -> (key, bytes_read). Raises on read errors."""
+    hasher = new_hasher(algorithm)
+    hasher.update(str(size).encode())
+    with open(file_path, "rb") as f:
+        head = f.read(SAMPLE_SIZE)
+        f.seek(max(0, size - SAMPLE_SIZE))
+        tail = f.read(SAMPLE_SIZE)
+    hasher.update(head)
+    hasher.update(tail)
+    return hasher.digest(), len(head) + len(tail)
+
+
+def calculate_hash(file_path, cache=None, algorithm=None):
+    """Calculate the file's hash in chunks to save memory (works for any file type).
+    `algorithm` is a quickpurge.hashing backend name (default: config.HASH_ALGORITHM,
+    or the cache's algorithm). If a database.HashCache is given, an unchanged
+    file is answered from it without being read, and new digests are written back."""
+    if algorithm is None:
+        algorithm = cache.algorithm if cache is not None else HASH_ALGORITHM
+    elif cache is not None and cache.algorithm != algorithm:
+        raise ValueError(f"cache holds {cache.algorithm} digests, not {algorithm}")
+    get_backend(algorithm)
+
     try:
         # Normalize path (handles mixed slashes, relative paths)
         file_path = os.path.abspath(os.path.normpath(file_path))
 
-        # Try opening in binary mode (works for images, videos, any type)
-        with open(file_path, "rb") as f:
-            for chunk in file_chunks(f, CHUNK_SIZE):
-                sha256.update(chunk)
+        st = None
+        if cache is not None:
+            st = os.stat(file_path)
+            cached = cache.lookup(st)
+            if cached:
+                return cached
 
-        return sha256.hexdigest()
+        digest, _, stable = _full_hash(file_path, database.stat_key(st) if st else None, algorithm)
+        if stable:
+            cache.store(file_path, st, digest)
+        return digest
 
-    except PermissionError:
-        log(f"Skipping (no permission): {file_path}")
+    except Exception as e:
+        _log_hash_error(file_path, e)
         return None
 
-    except FileNotFoundError:
-        log(f"Skipping (not found): {file_path}")
-        return None
 
-    except OSError as e:
-        # Special handling for locked/in-use files (common with videos/photos in editors)
-        if e.errno == 22:  # Invalid argument (often bad path/locked file)
-            log(f"Skipping (invalid/locked): {file_path}")
+def _group_row(entry):
+    """(path, size, mtime) for group_found / group_extended events."""
+    return (entry.path, entry.st_size, entry.st_mtime_ns / 1e9)
+
+
+def _distinct_roots(folders):
+    """Normalize scan roots and drop any nested inside another (each path is walked once)."""
+    roots = sorted({os.path.abspath(os.path.normpath(f)) for f in folders})
+    kept = []
+    for root in roots:
+        if not any(root.startswith(k if k.endswith(os.sep) else k + os.sep) for k in kept):
+            kept.append(root)
+    return kept
+
+
+def _new_stage_stats():
+    return {
+        "sample": {"files": 0, "bytes_read": 0, "eliminated": 0},
+        "full": {"files": 0, "bytes_read": 0, "eliminated": 0},
+    }
+
+
+def _count_error(errors, err):
+    if errors is not None:
+        kind = type(err).__name__
+        errors[kind] = errors.get(kind, 0) + 1
+
+
+def _hash_candidates(buckets, cache, stages, executor, cancelled=None, algorithm=HASH_ALGORITHM,
+                     errors=None):
+    """
+    Multi-stage hashing of all size buckets ({size: [FileEntry]}, the walker's
+    stat results standing in for os.stat). Yields (size, entry, digest) for
+    every member as it is resolved; digest is None when the member was ruled
+    out (or unreadable).
+      1. digests already in the hash cache (no reads)
+      2. head/tail sample; members whose sample is unique in their bucket drop out
+      3. full digest for members whose sample still collides
+    Stages 2 and 3 run on `executor`. `stages` collects files / bytes_read /
+    eliminated per stage; read errors are counted by type into `errors`.
+    Stops early when `cancelled()` turns True.
+    """
+    known = {}        # size -> {digest: one cached path (its sample stands for all)}
+    counts = {}       # (size, digest) -> members with that digest
+    sample_jobs = []
+    full_jobs = []
+    for size, entries in buckets.items():
+        pending = []
+        for st in entries:
+            path = st.path
+            digest = cache.lookup(st) if cache is not None else None
+            if digest:
+                known.setdefault(size, {}).setdefault(digest, path)
+                counts[(size, digest)] = counts.get((size, digest), 0) + 1
+                yield size, st, digest
+            else:
+                pending.append((path, st))
+
+        if not pending:
+            continue
+        if size <= 2 * SAMPLE_SIZE:
+            # the sample would be the whole file; go straight to the full digest
+            full_jobs.extend((size, path, st) for path, st in pending)
         else:
-            log(f"Skipping (OS error {e.errno}): {file_path} -> {e}")
-        return None
+            sample_jobs.extend((size, path, None) for path in known.get(size, {}).values())
+            sample_jobs.extend((size, path, st) for path, st in pending)
+
+    # ---- sample stage ----
+    sample = stages["sample"]
+    by_sample = {}    # (size, key) -> [(path, st) | None for cached members]
+    jobs = ((job, job[2].st_dev if job[2] else 0, (job[1], job[0], algorithm)) for job in sample_jobs)
+    for (size, path, st), result, err in executor.run(_sample_hash, jobs):
+        if cancelled and cancelled():
+            return
+        if err is not None:
+            _count_error(errors, err)
+            if st is not None:
+                _log_hash_error(path, err)
+                yield size, st, None
+            continue
+        key, n = result
+        sample["bytes_read"] += n
+        if st is not None:
+            sample["files"] += 1
+        by_sample.setdefault((size, key), []).append((path, st) if st is not None else None)
+
+    for (size, _), members in by_sample.items():
+        if len(members) > 1:
+            full_jobs.extend((size, m[0], m[1]) for m in members if m is not None)
+            continue
+        for m in members:
+            if m is not None:
+                sample["eliminated"] += 1
+                yield size, m[1], None
+
+    # ---- full stage ----
+    full = stages["full"]
+    hashed = []
+    jobs = ((job, job[2].st_dev, (job[1], database.stat_key(job[2]), algorithm)) for job in full_jobs)
+    for (size, path, st), result, err in executor.run(_full_hash, jobs):
+        if cancelled and cancelled():
+            return
+        if err is not None:
+            _count_error(errors, err)
+            _log_hash_error(path, err)
+            yield size, st, None
+            continue
+        digest, n, stable = result
+        if stable and cache is not None:
+            cache.store(path, st, digest)
+        full["files"] += 1
+        full["bytes_read"] += n
+        counts[(size, digest)] = counts.get((size, digest), 0) + 1
+        hashed.append((size, digest))
+        yield size, st, digest
 
-    except Exception as e:
-        # Catch-all safety (shouldn't happen often)
-        log(f"Unexpected error hashing {file_path}: {e}")
-        return None
+    full["eliminated"] += sum(1 for k in hashed if counts[k] == 1)
 
 
-def scan_folder(folder_path, on_progress=None, cancel_flag=None):
+def _restat_candidates(files_by_size, errors):
+    """
+    Re-stat the members of every size bucket that will be hashed. Listings
+    reused by an incremental walk can be stale for files modified in place
+    (that doesn't touch the directory mtime), and a stale stat would let the
+    hash cache return the old digest. Files whose size changed move to their
+    new bucket, which is then checked too. Returns the number of stats.
+    """
+    fresh = set()  # sizes whose members are all re-stat'ed
+    stats = 0
+    todo = [size for size, entries in files_by_size.items() if len(entries) >= 2]
+    while todo:
+        size = todo.pop()
+        if size in fresh:
+            continue
+        fresh.add(size)
+        kept = []
+        for entry in files_by_size[size]:
+            stats += 1
+            try:
+                entry = file_entry(entry.path, os.stat(entry.path))
+            except OSError as e:
+                _count_error(errors, e)
+                continue
+            if entry.st_size == size:
+                kept.append(entry)
+                continue
+            bucket = files_by_size.setdefault(entry.st_size, [])
+            bucket.append(entry)
+            if entry.st_size in fresh:
+                continue  # joins members that are already fresh
+            if len(bucket) >= 2:
+                todo.append(entry.st_size)
+        files_by_size[size] = kept
+    return stats
+
+
+def _index_trusted(roots):
+    """True when every root had a full (non-incremental) walk within FULL_VERIFY_INTERVAL."""
+    now = time.time()
+    return all(now - float(database.get_meta(f"last_full_walk:{root}", 0)) < FULL_VERIFY_INTERVAL
+               for root in roots)
+
+
+def scan_folder(folder_path, on_progress=None, cancel_flag=None,
+                workers=HASH_WORKERS, pool=HASH_POOL, per_device=None,
+                walk_threads=WALK_THREADS, algorithm=HASH_ALGORITHM,
+                incremental=INCREMENTAL_SCAN, entries=None):
     """
     Scan one or more folders and log duplicates with history support.
     - folder_path: str or list of str
     - on_progress: callback(info: dict)
     - cancel_flag: dict or callable -> bool (if True, abort scan)
+    - workers / pool: hashing parallelism ("thread" or "process" pool)
+    - per_device: max concurrent hash jobs per device (default: 1 on spinning disks)
+    - walk_threads: threads listing directories during phase 1
+    - algorithm: hash backend (quickpurge.hashing.HASH_BACKENDS), recorded on the scan
+    - incremental: reuse the stored listing of directories whose mtime and
+      entry count haven't changed since the last scan instead of stat'ing
+      their files; every FULL_VERIFY_INTERVAL the walk is a full one
+    - entries: optional list; receives the FileEntry of every file the walk
+      accepted (watch mode builds its index from it instead of re-walking)
+    Progress is checkpointed to the DB; a cancelled or crashed scan can be
+    continued with resume_scan(scan_id).
     """
     # Normalize folder list
     if isinstance(folder_path, str):
@@ -84,87 +311,324 @@ def scan_folder(folder_path, on_progress=None, cancel_flag=None):
         folders = list(folder_path)
     else:
         raise ValueError("folder_path must be a string or list of strings")
+    folders = _distinct_roots(folders)
 
-    scan_id = database.start_scan()
-    database.clear_duplicates()
-    total_files = 0
+    get_backend(algorithm)  # fail fast on unknown algorithms
+    # keep the previous scan's results (and resumable scans) instead of wiping them
+    database.prune_scan_results()
+    scan_id = database.start_scan(hash_algo=algorithm)
+    return _run_scan(scan_id, folders, algorithm, None, on_progress, cancel_flag,
+                     workers, pool, per_device, walk_threads, incremental, entries)
+
+
+def resume_scan(scan_id, on_progress=None, cancel_flag=None,
+                workers=HASH_WORKERS, pool=HASH_POOL, per_device=None,
+                walk_threads=WALK_THREADS):
+    """
+    Continue an interrupted scan from its last checkpoint: directories
+    already walked are not listed again and size buckets whose groups were
+    written are not hashed again. An incremental scan stays incremental.
+    Same callbacks / options as scan_folder.
+    Raises ValueError if the scan has no checkpoint (finished or unknown).
+    """
+    checkpoint = database.load_checkpoint(scan_id)
+    if checkpoint is None:
+        raise ValueError(f"Scan {scan_id} has no checkpoint to resume from")
+    algorithm = checkpoint["algorithm"]
+    get_backend(algorithm)
+    log(f"Resuming scan {scan_id} in the {checkpoint['phase']} phase.")
+    return _run_scan(scan_id, checkpoint["folders"], algorithm, checkpoint, on_progress,
+                     cancel_flag, workers, pool, per_device, walk_threads,
+                     checkpoint["incremental"])
+
+
+def _run_scan(scan_id, folders, algorithm, checkpoint, on_progress, cancel_flag,
+              workers, pool, per_device, walk_threads, incremental=False, entries=None):
+    """Walk + hash for scan_folder / resume_scan (checkpoint is None for a new scan)."""
+    counters = checkpoint["counters"] if checkpoint else {}
+    total_files = counters.get("total_files", 0)
+    entries_skipped = counters.get("entries_skipped", 0)
+    dirs_pruned = counters.get("dirs_pruned", 0)
+    files_stated = counters.get("files_stated", 0)
+    walk_errors = dict(counters.get("errors", {}))
+    phase = checkpoint["phase"] if checkpoint else "walk"
     files_by_size = {}
+    inodes = {}  # (st_dev, st_ino) -> entries, for files with more than one link
+
+    def group(entry):
+        if entries is not None:
+            entries.append(entry)
+        if entry.st_nlink > 1 and entry.st_ino:
+            # hardlinks: only the first path of an inode is hashed
+            links = inodes.setdefault((entry.st_dev, entry.st_ino), [])
+            links.append(entry)
+            if len(links) > 1:
+                return
+        files_by_size.setdefault(entry.st_size, []).append(entry)
+
+    if checkpoint:
+        # files walked before the interruption
+        for row in database.iter_checkpoint_files(scan_id):
+            group(FileEntry(*row))
+
+    # exclusion rules are compiled once per scan (reloaded only if edited)
+    matcher = get_matcher(refresh=True)
+    metrics = ScanMetrics()
+    clock = time.perf_counter
 
     # ---- Phase 1: group by file size ----
-    for folder in folders:
-        log(f"Scanning folder: {folder}")
-        _emit(on_progress, stage="start", folder=folder)
-
-        for root, dirs, files in os.walk(folder):
-            for file in files:
-                if _is_cancelled(cancel_flag):
-                    log("Scan cancelled during grouping.")
-                    _emit(on_progress, stage="done", scan_id=None,
-                          files_scanned=total_files, total_files=total_files)
-                    return None
-
-                file_path = os.path.join(root, file)
-                if should_exclude(file_path):
+    # one scandir stat per file; the FileEntry is reused for exclusion and hashing
+    index = None
+    full_walk = False
+    if incremental and phase == "walk":
+        full_walk = not _index_trusted(folders)
+        if full_walk:
+            log("Incremental scan: full verify walk (index is due for a refresh).")
+        index = database.DirIndex(folders, trust=not full_walk)
+    walker = Walker(prune=matcher.prunes_dir, threads=walk_threads, index=index)
+    new_files = []  # accepted since the last checkpoint
+
+    def walk_counters():
+        errors = dict(walk_errors)
+        for kind, n in walker.error_types.items():
+            errors[kind] = errors.get(kind, 0) + n
+        return {
+            "total_files": total_files,
+            "entries_skipped": entries_skipped,
+            "dirs_pruned": dirs_pruned + walker.dirs_pruned,
+            "files_stated": files_stated + walker.files_seen,
+            "dirs_reused": walker.dirs_reused,
+            "files_reused": walker.files_reused,
+            "errors": errors,
+        }
+
+    def save_checkpoint(next_phase, frontier, link_sets=()):
+        with metrics.timed("db_write"):
+            database.save_checkpoint(scan_id, next_phase, folders, algorithm, frontier,
+                                     walk_counters(), new_files, link_sets, incremental)
+        new_files.clear()
+
+    def cancelled_done(files_scanned, snapshot):
+        database.set_scan_metrics(scan_id, snapshot)
+        log(f"Scan {scan_id} checkpointed; continue it with resume_scan({scan_id}).")
+        _emit(on_progress, stage="done", scan_id=None, resume_scan_id=scan_id,
+              files_scanned=files_scanned, total_files=total_files)
+
+    if phase == "walk":
+        if checkpoint:
+            frontier = checkpoint["frontier"]
+            _emit(on_progress, stage="resume", scan_id=scan_id, phase=phase,
+                  files_scanned=total_files, total_files=total_files)
+        else:
+            frontier = []
+            for folder in folders:
+                log(f"Scanning folder: {folder}")
+                _emit(on_progress, stage="start", folder=folder)
+                if matcher.excludes_folder(folder):
+                    log(f"Skipping excluded folder: {folder}")
+                    dirs_pruned += 1
                     continue
-                try:
-                    size = os.path.getsize(file_path)
-                    files_by_size.setdefault(size, []).append(file_path)
-                    total_files += 1
-
-                    if total_files % 200 == 0:
-                        _emit(on_progress, stage="grouping",
-                              files_scanned=total_files, total_files=total_files, path=file_path)
-                except (PermissionError, FileNotFoundError):
+                frontier.append(folder)
+            save_checkpoint("walk", frontier)
+
+        listing = walker.walk(frontier)
+        last_checkpoint = clock()
+        while True:
+            # walk = waiting on directory listings; exclusion = matcher calls;
+            # grouping = everything else done per file
+            t_walk = clock()
+            try:
+                root, dirs, files = next(listing)
+            except StopIteration:
+                metrics.add_time("walk", clock() - t_walk)
+                break
+            t_dir = clock()
+            metrics.add_time("walk", t_dir - t_walk)
+            excluding = 0.0
+            # a directory is handled as a whole, so checkpoints never split one
+            for entry in files:
+                t_excl = clock()
+                excluded = matcher.excludes(entry.path, entry)
+                excluding += clock() - t_excl
+                if excluded:
+                    entries_skipped += 1
                     continue
+                total_files += 1
+                new_files.append(entry)
+                group(entry)
+
+                if total_files % METRICS_EVERY == 0:
+                    metrics.counters.update(files_stated=files_stated + walker.files_seen,
+                                            excluded_entries=entries_skipped,
+                                            dirs_pruned=dirs_pruned + walker.dirs_pruned)
+                    _emit(on_progress, stage="grouping",
+                          files_scanned=total_files, total_files=total_files, path=entry.path,
+                          dirs_pruned=dirs_pruned + walker.dirs_pruned,
+                          entries_skipped=entries_skipped,
+                          metrics=metrics.snapshot())
+            metrics.add_time("exclusion", excluding)
+            metrics.add_time("grouping", clock() - t_dir - excluding)
+
+            if _is_cancelled(cancel_flag):
+                log("Scan cancelled during grouping.")
+                save_checkpoint("walk", walker.frontier())
+                listing.close()
+                if index is not None:
+                    index.close()  # listings recorded so far are valid
+                cancelled_done(total_files, metrics.snapshot(status="cancelled"))
+                return None
+            if clock() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                save_checkpoint("walk", walker.frontier())
+                last_checkpoint = clock()
+
+        if index is not None:
+            with metrics.timed("db_write"):
+                index.close()
+            if full_walk:
+                for root in folders:
+                    database.set_meta(f"last_full_walk:{root}", int(time.time()))
+        if walker.dirs_reused:
+            # reused listings may hold stale stats; refresh what will be hashed
+            with metrics.timed("walk"):
+                files_stated += _restat_candidates(files_by_size, walk_errors)
+            log(f"Incremental walk: {walker.dirs_reused} unchanged dirs reused "
+                f"({walker.files_reused} files not stat'ed).")
+    else:
+        _emit(on_progress, stage="resume", scan_id=scan_id, phase=phase,
+              files_scanned=total_files, total_files=total_files)
+
+    final = walk_counters()
+    dirs_pruned = final["dirs_pruned"]
+    metrics.counters.update(files_stated=final["files_stated"], excluded_entries=entries_skipped,
+                            dirs_pruned=dirs_pruned, dirs_reused=final["dirs_reused"],
+                            files_reused=final["files_reused"])
+    for kind, n in final["errors"].items():
+        metrics.error(kind, n)
+    entries_skipped += sum(final["errors"].values())
+    log(f"Grouping done: {total_files} files in {walker.dirs_listed} dirs, "
+        f"{dirs_pruned} dirs pruned, {entries_skipped} entries skipped.")
+
+    # hardlink sets are reported on their own; they share storage, so they
+    # never count as reclaimable bytes
+    link_sets = [links for links in inodes.values() if len(links) > 1]
+    if phase == "walk":
+        # walk finished: everything needed for hashing, hardlink sets
+        # included, goes to the DB in the transaction that moves to "hash"
+        save_checkpoint("hash", [], link_sets)
+    hardlinked_paths = sum(len(links) for links in link_sets)
+    hardlink_bytes = sum(links[0].st_size * (len(links) - 1) for links in link_sets)
+    if link_sets:
+        log(f"Hardlinks: {len(link_sets)} inodes reached through {hardlinked_paths} paths.")
 
     # ---- Phase 2: hash and detect duplicates ----
-    total_duplicates = 0
-    total_size_saved = 0
     processed_files = 0
+    stages = _new_stage_stats()
+
+    # one connection, batched inserts (flushed on cancel and at finish)
+    writer = database.DuplicateWriter()
+    cache = database.HashCache(scan_id, algorithm=algorithm)
+    executor = HashExecutor(workers=workers, kind=pool, per_device=per_device)
+    # buckets finished before an interruption already have their groups written
+    done_buckets = database.get_done_buckets(scan_id) if checkpoint else set()
+    candidates = {size: paths for size, paths in files_by_size.items()
+                  if len(paths) >= 2 and size not in done_buckets}
+    # a size bucket is final once every member has been resolved; its groups
+    # are then written once, with exact member counts
+    remaining = {size: len(entries) for size, entries in candidates.items()}
+    groups_by_size = {}  # size -> {digest: [FileEntry]}
+    hash_errors = {}
+    hardlink_write_s = metrics.phases["db_write"]
+    t_hash = clock()
+
+    def hash_metrics(**extra):
+        # hashing time excludes the writer's / cache's DB flushes (db_write)
+        db_s = writer.write_seconds + cache.write_seconds
+        metrics.phases["hashing"] = clock() - t_hash - db_s
+        metrics.phases["db_write"] = hardlink_write_s + db_s
+        metrics.counters.update(
+            files_hashed=stages["sample"]["files"] + stages["full"]["files"],
+            bytes_read=stages["sample"]["bytes_read"] + stages["full"]["bytes_read"],
+            cache_hits=cache.hits,
+            cache_misses=cache.misses,
+        )
+        snap = metrics.snapshot(resumed=checkpoint is not None, **extra)
+        for kind, n in hash_errors.items():
+            snap["errors"][kind] = snap["errors"].get(kind, 0) + n
+        return snap
 
-    for size, paths in files_by_size.items():
-        if len(paths) < 2:
-            continue
-
-        hashes = {}
-        for file_path in paths:
+    try:
+        results = _hash_candidates(candidates, cache, stages, executor,
+                                   cancelled=lambda: _is_cancelled(cancel_flag),
+                                   algorithm=algorithm, errors=hash_errors)
+        for size, entry, file_hash in results:
             if _is_cancelled(cancel_flag):
-                log("Scan cancelled during hashing.")
-                _emit(on_progress, stage="done", scan_id=None,
-                      files_scanned=processed_files, total_files=total_files)
-                return None
-
+                break
+            file_path = entry.path
             processed_files += 1
-            _emit(
-                on_progress,
+            progress = dict(
                 stage="hashing",
                 path=file_path,
                 files_scanned=processed_files,
                 total_files=total_files,
                 progress=int(processed_files / total_files * 100) if total_files else 0,
             )
-
-            file_hash = calculate_hash(file_path)
-            if not file_hash:
+            if processed_files % METRICS_EVERY == 0:
+                progress["metrics"] = hash_metrics()
+            _emit(on_progress, **progress)
+
+            if file_hash:
+                members = groups_by_size.setdefault(size, {}).setdefault(file_hash, [])
+                members.append(entry)
+                # stream the new rows so the UI can append instead of re-querying
+                if len(members) == 2:
+                    _emit(on_progress, stage="group_found", file_hash=file_hash, size=size,
+                          rows=[_group_row(m) for m in members])
+                elif len(members) > 2:
+                    _emit(on_progress, stage="group_extended", file_hash=file_hash, size=size,
+                          rows=[_group_row(entry)])
+
+            remaining[size] -= 1
+            if remaining[size]:
                 continue
+            del remaining[size]
+            for digest, members in groups_by_size.pop(size, {}).items():
+                if len(members) < 2:
+                    continue
+                writer.add_group(scan_id, digest, size,
+                                 [(m.path, m.st_mtime_ns / 1e9) for m in members])
+            # checkpoint: this bucket is never hashed again on resume
+            writer.finish_bucket(scan_id, size)
 
-            if file_hash in hashes:
-                # ✅ Always insert in consistent format: (scan_id, file_hash, joined_paths, size)
-                original_path = hashes[file_hash]
-                dup_path = file_path
-                # Insert both rows (original + duplicate) in the DB in correct API order
-                database.insert_duplicate(scan_id, original_path, file_hash, size)
-                database.insert_duplicate(scan_id, dup_path, file_hash, size)
-
-                total_duplicates += 1
-                total_size_saved += size
-    
-            else:
-                hashes[file_hash] = file_path
+        if _is_cancelled(cancel_flag):
+            log("Scan cancelled during hashing.")
+            writer.flush()
+            cache.flush()  # keep digests computed so far
+            cancelled_done(processed_files, hash_metrics(status="cancelled"))
+            return None
+
+        # the walk already stat'ed every file: only rows it didn't visit are stat'ed again
+        walked = {e.path: e for entries in files_by_size.values() for e in entries}
+        walked.update((e.path, e) for links in link_sets for e in links)
+        evicted = cache.evict_missing(folders, walked)
+        writer.flush()
+        cache.flush()
+    finally:
+        executor.shutdown()
+        writer.close()
+        cache.close()
+    scan_metrics = hash_metrics(status="ok", cache_evicted=evicted)
 
     # ---- Finish ----
-    database.finish_scan(scan_id, total_files, total_duplicates, total_size_saved)
+    # totals are summed from the groups actually written
+    total_duplicates, total_size_saved = database.finish_scan(scan_id, total_files, metrics=scan_metrics)
+    database.clear_checkpoint(scan_id)
     log(f"Scan complete: {total_files} files, {total_duplicates} duplicates, {total_size_saved} bytes saved.")
+    log(f"Hash cache: {cache.hits} hits, {cache.misses} misses, "
+        f"{cache.bytes_avoided} bytes not re-read, {evicted} stale entries evicted.")
+    for name, st in stages.items():
+        st["elimination_rate"] = round(st["eliminated"] / st["files"], 4) if st["files"] else 0.0
+        log(f"Stage {name}: {st['files']} files, {st['bytes_read']} bytes read, "
+            f"{st['eliminated']} eliminated ({st['elimination_rate']:.0%}).")
     try:
         notify(
             "QuickPurge - Scan Complete",
@@ -181,13 +645,26 @@ def scan_folder(folder_path, on_progress=None, cancel_flag=None):
         total_files=total_files,
         total_duplicates=total_duplicates,
         total_size_saved=total_size_saved,
+        dirs_pruned=dirs_pruned,
+        dirs_reused=final["dirs_reused"],
+        entries_skipped=entries_skipped,
+        cache_hits=cache.hits,
+        cache_misses=cache.misses,
+        bytes_avoided=cache.bytes_avoided,
+        cache_evicted=evicted,
+        stages=stages,
+        hardlink_sets=len(link_sets),
+        hardlinked_paths=hardlinked_paths,
+        hardlink_bytes=hardlink_bytes,
+        metrics=scan_metrics,
     )
     return scan_id
 
 
-def scan_entire_system(on_progress=None, cancel_flag=None):
+def scan_entire_system(on_progress=None, cancel_flag=None, **scan_options):
     """Scan all drives or root directories for duplicates, skipping exclusions.
-       Returns last scan_id or None if cancelled."""
+       Returns last scan_id or None if cancelled.
+       scan_options are passed through to scan_folder (workers, pool, ...)."""
     drives = []
     if os.name == "nt":  # Windows
         import string
@@ -212,7 +689,7 @@ def scan_entire_system(on_progress=None, cancel_flag=None):
 
         log(f"Scanning drive: {drive}")
         _emit(on_progress, stage="drive", drive=drive)
-        sid = scan_folder(drive, on_progress=on_progress, cancel_flag=cancel_flag)
+        sid = scan_folder(drive, on_progress=on_progress, cancel_flag=cancel_flag, **scan_options)
         if sid:
             last_id = sid
     return last_id
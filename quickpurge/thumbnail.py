@@ -1,5 +1,4 @@
 import os
-from PIL import Image
 import io
 
 # Thumbnail cache (size-limited)
@@ -27,6 +26,8 @@ def get_thumbnail(file_path):
         return _thumbnail_cache[file_path]
 
     try:
+        from PIL import Image  # lazy: Pillow is only needed once previews are shown
+
         # Load image in memory-efficient way
         with Image.open(file_path) as img:
             img.thumbnail(THUMBNAIL_SIZE)
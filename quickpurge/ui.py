@@ -12,17 +12,19 @@ from quickpurge import database
 logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(levelname)s %(message)s")
 
 
-from .scanner import scan_folder, scan_entire_system
+from .scanner import scan_folder, scan_entire_system, resume_scan
 from .database import (
     get_all_duplicates,
     get_exclusions,
     add_exclusion,
     remove_exclusion,
     get_scan_history,
+    get_hardlink_sets,
     clear_db,
-    safe_get_all_duplicates,
 )
-from .safe_delete import safe_delete, permanent_delete, ARCHIVE_DIR, ensure_archive_folder
+from .safe_delete import (permanent_delete, archive_many, restore_many,
+                          ARCHIVE_DIR, ensure_archive_folder)
+from .utils import log, format_size
     
 
 
@@ -37,6 +39,10 @@ PANEL_BG = "#1a1a1a"
 TEXT_DIM = "#c7c7c7"
 
 TABLE_HEADERS = ["✔", "Name", "Size (bytes)", "Modified", "Path"]
+PAGE_SIZE = 500  # rows per duplicates-table page
+SORT_KEYS = ["size", "wasted", "path", "mtime"]
+# header click -> sort key (column index as in TABLE_HEADERS)
+HEADER_SORTS = {1: "path", 2: "size", 3: "mtime", 4: "path"}
 # checkbox symbols (consistent text-friendly)
 UNCHECK = "[ ]"
 CHECK = "[✔]"
@@ -90,103 +96,227 @@ def popup_get_folders(parent=None):
 
 
 
-def _format_duplicates_rows(rows):
-    table = []
-    SEP = "\x1f"  # unit separator — used by DB GROUP_CONCAT
-    for row in rows:
-        try:
-            if not row:
-                continue
-            # normalize: take last two fields as (joined_paths, size)
-            if len(row) >= 2:
-                joined_paths = row[-2]
-                size = row[-1]
-            else:
-                continue
-            if not joined_paths:
-                continue
+def _table_row(path, size, mtime=None, checked=False):
+    """One duplicates-table row: [check, name, size, modified, path]."""
+    if mtime is None:
+        mtime_str = "-"
+    else:
+        mtime_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(mtime))
+    return [CHECK if checked else UNCHECK, os.path.basename(path), size, mtime_str, path]
 
-            # split on SEP, not comma
-            paths = str(joined_paths).split(SEP)
-            for p in paths:
-                p = p.strip()
-                if not p:
-                    continue
-                try:
-                    stat = os.stat(p)
-                    mtime_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stat.st_mtime))
-                except Exception:
-                    mtime_str = "-"
-                name = os.path.basename(p)
-                table.append([UNCHECK, name, size, mtime_str, p])
-        except Exception:
-            logging.exception("Error formatting DB row %r", row)
-            continue
-    return table
 
+class DuplicateTableModel:
+    """
+    Paged, sortable view of one scan's duplicates (keyset pagination in SQLite).
+    Only the visible page is held in memory. Checkbox state is a set of row
+    ids: the checked ids, or after Select All the ids that were unchecked again.
+    """
 
+    def __init__(self, page_size=PAGE_SIZE):
+        self.page_size = page_size
+        self.scan_id = None
+        self.sort = "size"
+        self.descending = True
+        self.total = 0
+        self.rows = []          # current page: database.get_duplicates_page tuples
+        self._cursors = [None]  # (sort_value, id) each visited page starts after
+        self._marked = set()
+        self._all = False
+
+    def clear(self):
+        self.scan_id = None
+        self.total = 0
+        self.rows = []
+        self._cursors = [None]
+        self.deselect_all()
+
+    def load(self, scan_id):
+        """Show the first page of `scan_id`, dropping checkbox state."""
+        self.clear()
+        self.scan_id = scan_id
+        self.total = database.count_duplicates(scan_id) if scan_id else 0
+        self._fetch()
+
+    def reload(self):
+        """Re-query the current page (e.g. after rows were archived)."""
+        if self.scan_id:
+            self.total = database.count_duplicates(self.scan_id)
+            self._fetch()
+            if not self.rows and len(self._cursors) > 1:
+                self.prev_page()
+
+    def _fetch(self):
+        if not self.scan_id:
+            self.rows = []
+            return
+        self.rows = database.get_duplicates_page(
+            self.scan_id, self.sort, self.descending, self._cursors[-1], self.page_size
+        )
 
+    @property
+    def page_start(self):
+        return (len(self._cursors) - 1) * self.page_size
 
+    def has_prev(self):
+        return len(self._cursors) > 1
 
-def _list_archive_files():
-    files = []
-    if os.path.isdir(ARCHIVE_DIR):
-        for f in os.listdir(ARCHIVE_DIR):
-            full = os.path.join(ARCHIVE_DIR, f)
-            if os.path.isfile(full) and not f.endswith(".meta.json"):
-                try:
-                    files.append((f, os.path.getsize(full), full))
-                except Exception:
-                    files.append((f, 0, full))
-    return files
+    def has_next(self):
+        return self.page_start + len(self.rows) < self.total
 
+    def next_page(self):
+        if self.has_next() and self.rows:
+            last = self.rows[-1]
+            self._cursors.append((last[-1], last[0]))
+            self._fetch()
 
-def _restore_from_meta(full_archive_path):
-    import json, shutil
+    def prev_page(self):
+        if self.has_prev():
+            self._cursors.pop()
+            self._fetch()
 
-    meta = full_archive_path + ".meta.json"
-    if not os.path.exists(meta):
-        return False, "No metadata to restore original path."
+    def set_sort(self, sort, descending=None):
+        """Sort server-side; picking the current column again flips the direction."""
+        if descending is None:
+            descending = (not self.descending) if sort == self.sort else sort != "path"
+        self.sort = sort
+        self.descending = descending
+        self._cursors = [None]
+        self._fetch()
+
+    # ---- checkbox state ----
+    def is_checked(self, row_id):
+        return (row_id in self._marked) != self._all
+
+    def toggle(self, indices):
+        for i in indices:
+            if 0 <= i < len(self.rows):
+                self._marked ^= {self.rows[i][0]}
+
+    def select_all(self):
+        self._all = True
+        self._marked = set()
+
+    def deselect_all(self):
+        self._all = False
+        self._marked = set()
+
+    @property
+    def checked_count(self):
+        return self.total - len(self._marked) if self._all else len(self._marked)
+
+    def checked_paths(self):
+        if not self._all:
+            return database.get_duplicate_paths(sorted(self._marked))
+        return [p for rid, p in database.iter_duplicate_ids(self.scan_id) if rid not in self._marked]
+
+    def values(self):
+        return [_table_row(r[1], r[2], r[3], self.is_checked(r[0])) for r in self.rows]
+
+
+def _append_table_rows(table, rows):
+    """
+    Append rows to an sg.Table without re-rendering the existing ones
+    (Table.update(values=...) deletes and re-inserts every Treeview item).
+    Mirrors the iid/tag scheme Table.update uses so selection indices stay valid.
+    """
+    if not rows:
+        return
     try:
-        with open(meta, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        orig = data.get("original_path")
-        if not orig:
-            return False, "Missing original path in metadata."
-        os.makedirs(os.path.dirname(orig), exist_ok=True)
-        shutil.move(full_archive_path, orig)
-        try:
-            os.remove(meta)
-        except Exception:
-            pass
-        return True, f"Restored to {orig}"
-    except Exception as e:
-        return False, str(e)
+        tv = table.Widget
+        start = len(table.Values)
+        for i, row in enumerate(rows, start):
+            iid = tv.insert("", "end", iid=i + 1, values=row, tag=i)
+            if table.AlternatingRowColor and i % 2:
+                tv.tag_configure(i, background=table.AlternatingRowColor)
+            table.tree_ids.append(iid)
+        table.Values.extend(rows)
+    except Exception:
+        logging.debug("In-place append failed; falling back to full table update", exc_info=True)
+        table.update(values=list(table.Values or []) + list(rows))
+
+
+class ArchiveTableModel:
+    """Paged view of the archive manifest (database.archive_entries), newest first."""
+
+    def __init__(self, page_size=PAGE_SIZE):
+        self.page_size = page_size
+        self.search = ""
+        self.total = 0
+        self.total_bytes = 0
+        self.rows = []          # current page: database.get_archive_page tuples
+        self._cursors = [None]  # (archived_at, id) each visited page starts after
+
+    def load(self, search=""):
+        self.search = search
+        self._cursors = [None]
+        self.reload()
+
+    def reload(self):
+        self.total, self.total_bytes = database.count_archive_entries(self.search)
+        self.rows = database.get_archive_page(self.search, self._cursors[-1], self.page_size)
+        if not self.rows and len(self._cursors) > 1:
+            self.prev_page()
+
+    @property
+    def page_start(self):
+        return (len(self._cursors) - 1) * self.page_size
+
+    def has_prev(self):
+        return len(self._cursors) > 1
+
+    def has_next(self):
+        return self.page_start + len(self.rows) < self.total
+
+    def next_page(self):
+        if self.has_next() and self.rows:
+            self._cursors.append((self.rows[-1][5], self.rows[-1][0]))
+            self.reload()
+
+    def prev_page(self):
+        if self.has_prev():
+            self._cursors.pop()
+            self.reload()
+
+    def table_rows(self):
+        return [
+            (os.path.basename(original), size,
+             time.strftime("%Y-%m-%d %H:%M", time.localtime(archived_at or 0)), original)
+            for _, _, original, size, _, archived_at, *_ in self.rows
+        ]
 
 
-def refresh_duplicates(window, scan_id):
+def render_duplicates(window, model):
+    """Draw the model's current page plus counters / button states."""
+    window["-TABLE-"].update(values=model.values())
+    checked = model.checked_count
+    if model.scan_id:
+        window["-DUP_COUNT-"].update(f"{model.total} duplicate files found")
+    else:
+        window["-DUP_COUNT-"].update("No scan yet")
+    if model.total:
+        end = model.page_start + len(model.rows)
+        window["-PAGE-"].update(f"{model.page_start + 1}–{end} of {model.total}  ·  {checked} checked")
+    else:
+        window["-PAGE-"].update("")
+    window["-PREV-"].update(disabled=not model.has_prev())
+    window["-NEXT-"].update(disabled=not model.has_next())
+    window["-SORT_DIR-"].update("↓" if model.descending else "↑")
+    window["-DELETE-"].update(disabled=(checked == 0))
+    window["-DESELECT_ALL-"].update(disabled=(checked == 0))
+    window["-SELECT_ALL-"].update(disabled=(model.total == 0))
+
+
+def refresh_duplicates(window, scan_id, model):
     """
-    Update duplicates table for a given scan_id.
+    Load duplicates for a given scan_id into the paged table model.
     If scan_id is falsy, don't query the DB — just clear the UI.
     """
     if not scan_id:
         # Don't call DB when no scan_id is available
-        window["-DUP_COUNT-"].update("No scan yet")
-        window["-TABLE-"].update(values=[])
-        window["-DELETE-"].update(disabled=True)
-        # SELECT_ALL should be disabled until we have rows
-        if "-SELECT_ALL-" in window.AllKeysDict:
-            window["-SELECT_ALL-"].update(disabled=True)
-        return
-
-    # when we have a valid scan_id, query the DB and render rows
-    rows = safe_get_all_duplicates(scan_id)  # keep your DB function name (or safe_get_all_duplicates)
-    table = _format_duplicates_rows(rows)
-    window["-TABLE-"].update(values=table)
-    window["-DUP_COUNT-"].update(f"{len(table)} duplicate files found")
-    window["-DELETE-"].update(disabled=(len(table) == 0))
-    if "-SELECT_ALL-" in window.AllKeysDict:
-        window["-SELECT_ALL-"].update(disabled=(len(table) == 0))
+        model.clear()
+    else:
+        model.load(scan_id)
+    render_duplicates(window, model)
 
 
 
@@ -268,14 +398,28 @@ def open_exclusion_rules(parent):
 
 def open_archive(parent):
     ensure_archive_folder()
+    model = ArchiveTableModel()
 
-    def refresh(tbl):
-        files = _list_archive_files()
-        tbl.update(values=[(f, sz, p) for f, sz, p in files])
+    def refresh(win):
+        win["-ARCHIVE_TABLE-"].update(values=model.table_rows())
+        shown = f"{model.page_start + 1}-{model.page_start + len(model.rows)}" if model.rows else "0"
+        win["-ARCHIVE_PAGE-"].update(
+            f"{shown} of {model.total} files ({model.total_bytes} bytes)"
+        )
+        win["-ARCHIVE_PREV-"].update(disabled=not model.has_prev())
+        win["-ARCHIVE_NEXT-"].update(disabled=not model.has_next())
 
-    headings = ["File", "Size", "Full Path"]
+    headings = ["File", "Size", "Archived", "Original Path"]
     layout = [
         [sg.Text("Archive", font=("Segoe UI Semibold", 13), background_color=PANEL_BG)],
+        [
+            sg.Input(key="-ARCHIVE_SEARCH-", size=(40, 1)),
+            sg.Button("Search", button_color=("white", ACCENT_RED), bind_return_key=True),
+            sg.Push(background_color=PANEL_BG),
+            sg.Button("◀", key="-ARCHIVE_PREV-", disabled=True),
+            sg.Text("", key="-ARCHIVE_PAGE-", text_color=TEXT_DIM, background_color=PANEL_BG),
+            sg.Button("▶", key="-ARCHIVE_NEXT-", disabled=True),
+        ],
         [
             sg.Table(
                 values=[],
@@ -310,58 +454,78 @@ def open_archive(parent):
         size=(1000, 500),
         background_color=PANEL_BG,
     )
-    refresh(win["-ARCHIVE_TABLE-"])
+    def run_restore(paths):
+        # off the UI thread; write_event_value is safe to call from other threads
+        def post(key, value):
+            try:
+                win.write_event_value(key, value)
+            except Exception:
+                pass  # window closed while restoring; the work itself still completes
+
+        results = restore_many(paths, on_progress=lambda info: post("-BULK_PROGRESS-", info))
+        post("-BULK_DONE-", results)
+
+    model.load()
+    refresh(win)
     while True:
         ev, vals = win.read()
         if ev in (sg.WIN_CLOSED, "Close"):
             break
+        elif ev == "Search":
+            model.load(vals["-ARCHIVE_SEARCH-"].strip())
+            refresh(win)
+        elif ev == "-ARCHIVE_PREV-":
+            model.prev_page()
+            refresh(win)
+        elif ev == "-ARCHIVE_NEXT-":
+            model.next_page()
+            refresh(win)
         elif ev == "Open Folder":
             ensure_archive_folder()
             try:
                 os.startfile(ARCHIVE_DIR)
             except Exception:
                 sg.popup_error(f"Could not open: {ARCHIVE_DIR}")
-        elif ev in ("Permanently Delete Selected", "Restore Selected"):
-            rows = vals.get("-ARCHIVE_TABLE-", [])
-            if not rows:
+        elif ev == "Permanently Delete Selected":
+            for idx in vals.get("-ARCHIVE_TABLE-", []):
+                full = model.rows[idx][1]
+                if not permanent_delete(full):
+                    sg.popup_error(f"Delete failed for {full}")
+            model.reload()
+            refresh(win)
+        elif ev in ("Restore Selected", "Restore All"):
+            if ev == "Restore Selected":
+                paths = [model.rows[idx][1] for idx in vals.get("-ARCHIVE_TABLE-", [])]
+            else:
+                paths = [entry[1] for entry in database.iter_archive_entries(model.search)]
+            if not paths:
                 continue
-            data = win["-ARCHIVE_TABLE-"].get()
-            for idx in rows:
-                _, _, full = data[idx]
-                if ev == "Permanently Delete Selected":
-                    try:
-                        permanent_delete(full)
-                        meta = full + ".meta.json"
-                        if os.path.exists(meta):
-                            os.remove(meta)
-                    except Exception as e:
-                        sg.popup_error(f"Delete failed for {full}:\n{e}")
-                else:
-                    ok, msg = _restore_from_meta(full)
-                    if not ok:
-                        sg.popup_error(
-                            f"Restore failed for {os.path.basename(full)}:\n{msg}"
-                        )
-            refresh(win["-ARCHIVE_TABLE-"])
+            for key in ("Restore Selected", "Restore All"):
+                win[key].update(disabled=True)
+            threading.Thread(target=run_restore, args=(paths,), daemon=True).start()
+        elif ev == "-BULK_PROGRESS-":
+            info = vals[ev]
+            win["-ARCHIVE_PAGE-"].update(f"Restoring {info['done']}/{info['total']} ({info['failed']} failed)...")
+        elif ev == "-BULK_DONE-":
+            failures = [r for r in vals[ev] if not r["ok"]]
+            if failures:
+                sg.popup_scrolled(
+                    f"{len(vals[ev]) - len(failures)} files restored, {len(failures)} failed:\n\n"
+                    + "\n".join(f"{r['archive_path']}: {r['error']}" for r in failures[:200]),
+                    title="Restore", keep_on_top=True,
+                )
+            for key in ("Restore Selected", "Restore All"):
+                win[key].update(disabled=False)
+            model.reload()
+            refresh(win)
         elif ev == "Delete All":
-            data = win["-ARCHIVE_TABLE-"].get()
-            if data and sg.popup_ok_cancel(
+            if model.total and sg.popup_ok_cancel(
                 "Permanently delete ALL archived files?"
             ) == "OK":
-                for _, _, full in data:
-                    try:
-                        permanent_delete(full)
-                        meta = full + ".meta.json"
-                        if os.path.exists(meta):
-                            os.remove(meta)
-                    except Exception:
-                        pass
-                refresh(win["-ARCHIVE_TABLE-"])
-        elif ev == "Restore All":
-            data = win["-ARCHIVE_TABLE-"].get()
-            for _, _, full in data:
-                _restore_from_meta(full)
-            refresh(win["-ARCHIVE_TABLE-"])
+                for entry in list(database.iter_archive_entries(model.search)):
+                    permanent_delete(entry[1])
+                model.load(model.search)
+                refresh(win)
     win.close()
     parent.bring_to_front()
 
@@ -391,6 +555,16 @@ def _make_progress_window():
             )
         ],
         [sg.ProgressBar(100, orientation="h", size=(40, 20), key="-PB-")],
+        [
+            sg.Text(
+                "",
+                key="-LOOP_STATS-",
+                size=(50, 1),
+                font=("Segoe UI", 8),
+                text_color=TEXT_DIM,
+                background_color=PANEL_BG,
+            )
+        ],
         [
             sg.Button("Cancel Scan", key="-CANCEL-", button_color=("white", ACCENT_RED)),
             sg.Push(),
@@ -437,8 +611,9 @@ def _update_circle(canvas, arc_id, percent):
 # ============== Duplicate History ==============
 
 
-def open_history(parent):
-    rows = get_scan_history(limit=50)
+def open_history(parent, rows=None):
+    if rows is None:
+        rows = get_scan_history(limit=50)
     layout = [
         [
             sg.Text(
@@ -502,6 +677,7 @@ def run():
     action_row = [
         sg.Button("Select Folders", key="-SELECT_FOLDER-", button_color=("white", ACCENT_RED)),
         sg.Button("Scan Entire System", key="-SCAN_ALL-", button_color=("white", ACCENT_RED)),
+        sg.Button("Resume Scan", key="-RESUME-", button_color=("white", ACCENT_RED)),
         sg.Text(
             "0 duplicate files found",
             key="-DUP_COUNT-",
@@ -525,12 +701,20 @@ def run():
         alternating_row_color="#151515",
         select_mode=sg.TABLE_SELECT_MODE_EXTENDED,
         enable_events=True,
+        enable_click_events=True,  # header clicks sort
     )
 
     bottom_row = [
         sg.Button("Select All", key="-SELECT_ALL-", button_color=("white", ACCENT_RED), disabled=True),
         sg.Button("Deselect All", key="-DESELECT_ALL-", button_color=("white", ACCENT_RED), disabled=True),
         sg.Button("Delete Selected", key="-DELETE-", button_color=("white", ACCENT_RED), disabled=True),
+        sg.Push(background_color=PANEL_BG),
+        sg.Text("Sort", text_color=TEXT_DIM, background_color=PANEL_BG),
+        sg.Combo(SORT_KEYS, default_value="size", key="-SORT-", readonly=True, enable_events=True, size=(8, 1)),
+        sg.Button("↓", key="-SORT_DIR-", size=(2, 1)),
+        sg.Button("◀", key="-PREV-", disabled=True, size=(2, 1)),
+        sg.Text("", key="-PAGE-", size=(28, 1), text_color=TEXT_DIM, background_color=PANEL_BG),
+        sg.Button("▶", key="-NEXT-", disabled=True, size=(2, 1)),
     ]
 
     sidebar = [
@@ -576,7 +760,7 @@ def run():
     def on_progress(info: dict):
         progress_q.put(info)
 
-    def run_scan(folder: str = None, full: bool = False):
+    def run_scan(folder: str = None, full: bool = False, resume_id: int = None):
         nonlocal current_scan_id
         cancel_flag["cancel"] = False
 
@@ -584,7 +768,11 @@ def run():
         progress_q.put({"stage": "reset_ui"})
 
         try:
-          if full:
+          if resume_id is not None:
+            current_scan_id = resume_scan(
+                resume_id, on_progress=on_progress, cancel_flag=cancel_flag
+            )
+          elif full:
             current_scan_id = scan_entire_system(
                 on_progress=on_progress, cancel_flag=cancel_flag
             )
@@ -597,7 +785,28 @@ def run():
         # NOTE: NO LOCAL DONE.
 
 
+    def run_archive(paths, scan_id):
+        try:
+            results = archive_many(
+                paths, scan_id=scan_id,
+                on_progress=lambda info: progress_q.put(dict(info, stage="bulk_progress")),
+            )
+        except Exception as e:
+            results = [{"path": "", "ok": False, "error": str(e)}]
+        progress_q.put({"stage": "bulk_done", "results": results})
+
     REFRESH_MS = 120
+    # render-tick state: latest progress snapshot + dirty flags per widget
+    progress_snapshot = {}
+    pending_rows = []
+    streamed_count = 0
+    dup_model = DuplicateTableModel()
+    errors = []
+    history_rows = None
+    bulk_progress = None  # latest archive_many progress, drawn once per tick
+    bulk_results = None
+    dirty = dict.fromkeys(("reset", "table", "full_reload", "progress", "history", "done"), False)
+    loop_stats = {"events": 0, "ticks": 0, "drawn": 0, "max_frame_ms": 0.0, "slow_frames": 0}
     while True:
         event, values = window.read(timeout=REFRESH_MS)
         if event in (sg.WIN_CLOSED, "Exit"):
@@ -646,6 +855,34 @@ def run():
                 progress_win, progress_canvas, progress_Arc = _make_progress_window()
             progress_win.bring_to_front()
             threading.Thread(target=run_scan, kwargs={"full": True}, daemon=True).start()
+
+        elif event == "-RESUME-":
+            resumable = database.get_resumable_scans()
+            if not resumable:
+                sg.popup("No interrupted scans to resume.", keep_on_top=True)
+                continue
+            choices = [
+                f"#{sid}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(updated))}  "
+                f"({phase})  {', '.join(folders)}"
+                for sid, _, phase, folders, updated in resumable
+            ]
+            pick = sg.Window(
+                "Resume Scan",
+                [[sg.Listbox(choices, default_values=choices[:1], size=(90, min(len(choices), 8)), key="-PICK-")],
+                 [sg.Button("Resume", button_color=("white", ACCENT_RED)), sg.Button("Cancel")]],
+                modal=True,
+                keep_on_top=True,
+            )
+            ev_pick, val_pick = pick.read()
+            pick.close()
+            if ev_pick != "Resume" or not val_pick["-PICK-"]:
+                continue
+            resume_id = resumable[choices.index(val_pick["-PICK-"][0])][0]
+
+            if progress_win is None:
+                progress_win, progress_canvas, progress_arc = _make_progress_window()
+            progress_win.bring_to_front()
+            threading.Thread(target=run_scan, kwargs={"resume_id": resume_id}, daemon=True).start()
             
                 
         elif event == "-MENU_RULES-":
@@ -667,71 +904,65 @@ def run():
             )
             window.bring_to_front()
         elif event == "-MENU_DUP-":
-            refresh_duplicates(window, current_scan_id)
+            refresh_duplicates(window, current_scan_id, dup_model)
         elif event == "-MENU_HISTORY-":
-            open_history(window)
+            open_history(window, history_rows)
+            history_rows = None  # refetch next time (it may have changed since)
+
 
+        # Header click → server-side sort
+        if isinstance(event, tuple) and event[:2] == ("-TABLE-", "+CLICKED+"):
+            row, col = event[2] if event[2] else (None, None)
+            if row == -1 and col in HEADER_SORTS and dup_model.scan_id:
+                dup_model.set_sort(HEADER_SORTS[col])
+                window["-SORT-"].update(value=dup_model.sort)
+                render_duplicates(window, dup_model)
 
-        # Table click → toggle checkbox
-        if event == "-TABLE-":
+        # Table click → toggle checkbox (state lives in the model as row ids)
+        elif event == "-TABLE-":
             selected = values.get("-TABLE-", [])
-            if selected:
-                data = window["-TABLE-"].get()
-                for i in selected:
-                    row = data[i]
-                    row[0] = CHECK if row[0] == UNCHECK else UNCHECK
-                window["-TABLE-"].update(values=data)
-
-                # Enable/disable select/deselect depending on content
-                checked = any(r[0] == CHECK for r in data)
-                window["-DELETE-"].update(disabled=not checked)
-                window["-SELECT_ALL-"].update(disabled=(len(data) == 0))
-                window["-DESELECT_ALL-"].update(disabled=(not checked))
-        
+            if selected and dup_model.rows:
+                dup_model.toggle(selected)
+                render_duplicates(window, dup_model)
+
+        elif event == "-SORT-" and dup_model.scan_id:
+            dup_model.set_sort(values["-SORT-"])
+            render_duplicates(window, dup_model)
+
+        elif event == "-SORT_DIR-" and dup_model.scan_id:
+            dup_model.set_sort(dup_model.sort, not dup_model.descending)
+            render_duplicates(window, dup_model)
+
+        elif event in ("-PREV-", "-NEXT-"):
+            if event == "-PREV-":
+                dup_model.prev_page()
+            else:
+                dup_model.next_page()
+            render_duplicates(window, dup_model)
+
         # Select All (toggle behavior): if all checked -> deselect all, else select all
         elif event == "-SELECT_ALL-":
-            data = window["-TABLE-"].get()
-            if not data:
+            if not dup_model.total:
                 continue
-                # if every row already checked -> uncheck all (toggle)
-            if all(row[0] == CHECK for row in data):
-                new_data = [[UNCHECK] + row[1:] for row in data]
+            if dup_model.checked_count == dup_model.total:
+                dup_model.deselect_all()
             else:
-                new_data = [[CHECK] + row[1:] for row in data]
-            window["-TABLE-"].update(values=new_data)
-            checked = any(r[0] == CHECK for r in new_data)
-            window["-DELETE-"].update(disabled=not checked)
-            window["-DESELECT_ALL-"].update(disabled=(not checked))
+                dup_model.select_all()
+            render_duplicates(window, dup_model)
 
         # Deselect All explicit button
         elif event == "-DESELECT_ALL-":
-            data = window["-TABLE-"].get()
-            if not data:
-                continue
-            new_data = [[UNCHECK] + row[1:] for row in data]
-            window["-TABLE-"].update(values=new_data)
-            window["-DELETE-"].update(disabled=True)
-            window["-DESELECT_ALL-"].update(disabled=True)
-            window["-SELECT_ALL-"].update(disabled=(len(new_data) == 0))
+            dup_model.deselect_all()
+            render_duplicates(window, dup_model)
 
         # Delete Selected (archive checked rows)
         elif event == "-DELETE-":
-            data = window["-TABLE-"].get()
-            to_delete = [row[-1] for row in data if row[0] == CHECK]
+            to_delete = dup_model.checked_paths()
             if to_delete:
-                for path in to_delete:
-                    try:
-                        safe_delete(path)
-                        database.remove_duplicate_by_path(current_scan_id, path)
-                    except Exception as e:
-                        sg.popup_error(f"Failed to archive {path}:\n{e}")
-                sg.popup("Checked files moved to archive.")
-                refresh_duplicates(window, current_scan_id)
-            # after delete, disable delete / deselect if nothing left
-            window["-DELETE-"].update(disabled=True)
-            window["-DESELECT_ALL-"].update(disabled=True)
-            window["-SELECT_ALL-"].update(disabled=False)
-         
+                # moves and DB bookkeeping run off the UI thread; results come back via progress_q
+                window["-DELETE-"].update(disabled=True)
+                threading.Thread(target=run_archive, args=(to_delete, current_scan_id), daemon=True).start()
+
 
         # progress window events (non-blocking)
         if progress_win is not None:
@@ -741,93 +972,172 @@ def run():
             elif ev2 == "Hide":
                 progress_win.hide()
 
-        # Drain progress queue and update UI elements
+        # Drain progress queue: fold messages into the latest-state snapshot
+        # and mark what needs redrawing; nothing is drawn per message
+        tick_start = time.perf_counter()
+        drained = 0
         while True:
             try:
                 info = progress_q.get_nowait()
             except queue.Empty:
                 break
+            drained += 1
 
             stage = info.get("stage")
 
             if stage == "reset_ui":
-              window["-TABLE-"].update(values=[])
-              window["-DUP_COUNT-"].update("Scanning...")
-              window["-DELETE-"].update(disabled=True)
-              window["-SELECT_ALL-"].update(disabled=True)
-              window["-DESELECT_ALL-"].update(disabled=True)
+                pending_rows.clear()
+                progress_snapshot.clear()
+                dirty["reset"] = True
 
             elif stage == "error":
-                sg.popup_error(f"Scan failed: {info.get('message')}")
-                continue
+                errors.append(info.get("message"))
 
-            elif stage == "done":
-                      # final refresh of duplicates table
-                if current_scan_id:
-                    try:
-                      refresh_duplicates(window, current_scan_id)
-                    except Exception as e:
-                      print("final refresh failed:", e)
-
-                # close progress window
-                if progress_win is not None:
-                    sg.popup_no_titlebar(
-                        "Scan completed.", keep_on_top=True, auto_close=True, auto_close_duration=2
-                    )
-                    try:
-                        progress_win.close()
-                    except Exception:
-                        pass
-                    progress_win = progress_canvas = progress_arc = None
-
-                # refresh history list
-                try:
-                    _ = get_scan_history(limit=50)
-                except Exception as e:
-                    print("Couldnt refresh history:", e)
+            elif stage == "bulk_progress":
+                bulk_progress = info
 
+            elif stage == "bulk_done":
+                bulk_progress = None
+                bulk_results = info["results"]
 
+            elif stage in ("group_found", "group_extended"):
+                pending_rows.extend(info.get("rows", []))
+                dirty["table"] = True
 
-                 
-                       
-                    
+            elif stage == "done":
+                current_scan_id = info.get("scan_id") or current_scan_id
+                pending_rows.clear()  # superseded by the full reload
+                dirty["full_reload"] = True
+                dirty["history"] = True
+                dirty["done"] = True
+
+            if "files_scanned" in info or "path" in info:
+                progress_snapshot.update(info)
+                dirty["progress"] = True
+
+        # ---- render: each widget at most once per tick, only when dirty ----
+        if dirty["reset"]:
+            dup_model.clear()
+            streamed_count = 0
+            window["-TABLE-"].update(values=[])
+            window["-PAGE-"].update("")
+            window["-DUP_COUNT-"].update("Scanning...")
+            window["-DELETE-"].update(disabled=True)
+            window["-SELECT_ALL-"].update(disabled=True)
+            window["-DESELECT_ALL-"].update(disabled=True)
+            loop_stats.update(events=0, ticks=0, drawn=0, max_frame_ms=0.0, slow_frames=0)
+
+        for message in errors:
+            sg.popup_error(f"Scan failed: {message}")
+        errors.clear()
 
-            # refresh history tab after scan
+        if bulk_progress is not None:
+            window["-DUP_COUNT-"].update(
+                f"Archiving {bulk_progress['done']}/{bulk_progress['total']} files "
+                f"({bulk_progress['failed']} failed)..."
+            )
+            bulk_progress = None
+        if bulk_results is not None:
+            failures = [r for r in bulk_results if not r["ok"]]
+            copied = sum(1 for r in bulk_results if r.get("copied"))
+            note = f" ({copied} had to be copied across filesystems)" if copied else ""
+            if failures:
+                sg.popup_scrolled(
+                    f"{len(bulk_results) - len(failures)} files moved to archive{note}, "
+                    f"{len(failures)} failed:\n\n"
+                    + "\n".join(f"{r['path']}: {r['error']}" for r in failures[:200]),
+                    title="Archive", keep_on_top=True,
+                )
+            else:
+                sg.popup(f"{len(bulk_results)} checked files moved to archive{note}.")
+            bulk_results = None
+            dup_model.deselect_all()
+            dup_model.reload()
+            render_duplicates(window, dup_model)
+
+        if dirty["table"] and pending_rows:
+            # streamed duplicate rows: one in-place append for the whole tick,
+            # filling the first page only (the paged model takes over on "done")
+            streamed_count += len(pending_rows)
+            room = dup_model.page_size - len(window["-TABLE-"].Values or [])
+            new_rows = [_table_row(p, size, mtime) for p, size, mtime in pending_rows[:max(room, 0)]]
+            pending_rows.clear()
+            _append_table_rows(window["-TABLE-"], new_rows)
+            window["-DUP_COUNT-"].update(f"{streamed_count} duplicate files found (scanning...)")
+
+        if dirty["full_reload"] and current_scan_id:
+            # the only DB reload of the duplicates table per scan (first page)
             try:
-                rows = get_scan_history(limit=50)
+                refresh_duplicates(window, current_scan_id, dup_model)
             except Exception as e:
-                print("Couldn't refresh history:", e)
+                print("final refresh failed:", e)
 
+        if dirty["progress"] and progress_win is not None and progress_arc:
             # Read progress numbers (fallback defaults)
-            total = max(1, int(info.get("total_files", 1)))
-            done = int(info.get("files_scanned", 0))
+            total = max(1, int(progress_snapshot.get("total_files", 1) or 1))
+            done = int(progress_snapshot.get("files_scanned", 0) or 0)
             pct = done / total if total else 0.0
+            try:
+                _update_circle(progress_canvas, progress_arc, pct)
+                progress_win["-PB-"].update_bar(int(pct * 100))
+                sub = progress_snapshot.get("path") or ""
+                if sub:
+                    progress_win["-SUBTITLE-"].update(f"Scanning: {sub[:80]}")
+                progress_win["-LOOP_STATS-"].update(
+                    f"{loop_stats['events']} events / {loop_stats['drawn']} redraws, "
+                    f"max frame {loop_stats['max_frame_ms']:.0f} ms"
+                )
+            except Exception:
+                pass
+
+        if dirty["history"]:
+            # refresh history list once per finished scan
+            try:
+                history_rows = get_scan_history(limit=50)
+            except Exception as e:
+                print("Couldn't refresh history:", e)
 
-            # update progress visuals
-            if progress_win is not None and progress_arc:
+        # frame-time / coalescing counters (how well the loop keeps up)
+        if drained:
+            frame_ms = (time.perf_counter() - tick_start) * 1000
+            loop_stats["events"] += drained
+            loop_stats["ticks"] += 1
+            loop_stats["drawn"] += 1 if any(dirty.values()) else 0
+            loop_stats["max_frame_ms"] = max(loop_stats["max_frame_ms"], frame_ms)
+            if frame_ms > REFRESH_MS:
+                loop_stats["slow_frames"] += 1
+
+        if dirty["done"]:
+            log(
+                f"UI loop: {loop_stats['events']} events coalesced into {loop_stats['drawn']} redraws "
+                f"over {loop_stats['ticks']} ticks, max frame {loop_stats['max_frame_ms']:.1f} ms, "
+                f"{loop_stats['slow_frames']} frames over {REFRESH_MS} ms"
+            )
+            # close progress window
+            if progress_win is not None:
+                paused = progress_snapshot.get("resume_scan_id")
+                sg.popup_no_titlebar(
+                    "Scan paused. Use Resume Scan to continue it." if paused else "Scan completed.",
+                    keep_on_top=True, auto_close=True, auto_close_duration=2
+                )
                 try:
-                    _update_circle(progress_canvas, progress_arc, pct)
-                    progress_win["-PB-"].update_bar(int(pct * 100))
+                    progress_win.close()
                 except Exception:
                     pass
+                progress_win = progress_canvas = progress_arc = None
+            link_sets = get_hardlink_sets(current_scan_id) if current_scan_id else []
+            if link_sets and not progress_snapshot.get("resume_scan_id"):
+                # hardlinks share storage, so they are listed here rather than as duplicates
+                sg.popup_scrolled(
+                    f"{len(link_sets)} files are reached through more than one path (hardlinks). "
+                    "They share storage, so archiving one path frees nothing:\n\n"
+                    + "\n\n".join(f"{format_size(size)}:\n  " + "\n  ".join(paths)
+                                    for paths, size in link_sets[:200]),
+                    title="Hardlinks", keep_on_top=True,
+                )
 
-                sub = info.get("path") or ""
-                if sub:
-                    try:
-                        progress_win["-SUBTITLE-"].update(f"Scanning: {sub[:80]}")
-                    except Exception:
-                        pass
-
-            # live-refresh duplicates table if we have a scan id
-            if current_scan_id:
-                try:
-                    refresh_duplicates(window, current_scan_id)
-                except Exception as e:
-                    try:
-                        from .utils import log
-                        log(f"refresh_duplicates error: {e}")
-                    except Exception:
-                        print("refresh_duplicates error:", e)
+        for key in dirty:
+            dirty[key] = False
 
 
     # End main event loop; close window
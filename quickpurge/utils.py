@@ -1,6 +1,8 @@
 import os
+import sys
+import queue
 import datetime
-from plyer import notification
+import threading
 
 def format_size(num_bytes):
     """Convert bytes to human-readable format (KB, MB, GB)."""
@@ -40,17 +42,92 @@ def file_chunks(f, chunk_size):
             break
         yield data
 
+def adaptive_chunk_size(file_size, base=1024 * 1024):
+    """Read size for a file: whole small files in one go, bigger reads for huge files."""
+    if file_size <= 0:
+        return base
+    if file_size < base:
+        return file_size
+    if file_size >= 64 * base:
+        return 4 * base
+    return base
+
+def file_buffers(f, chunk_size, threaded=True):
+    """
+    Yield memoryviews of data read with f.readinto() into two preallocated
+    buffers, so no bytes object is allocated per chunk. A yielded view is only
+    valid until the next iteration.
+    With threaded=True a reader thread fills one buffer while the caller
+    consumes the other (hashlib releases the GIL, so reading and hashing overlap).
+    """
+    if not threaded:
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            yield view[:n]
+        return
+
+    bufs = [bytearray(chunk_size), bytearray(chunk_size)]
+    views = [memoryview(b) for b in bufs]
+    free = queue.Queue()
+    filled = queue.Queue()
+    free.put(0)
+    free.put(1)
+
+    def reader():
+        try:
+            while True:
+                i = free.get()
+                if i is None:
+                    break
+                n = f.readinto(bufs[i])
+                filled.put((i, n, None))
+                if not n:
+                    break
+        except Exception as e:
+            filled.put((None, 0, e))
+
+    t = threading.Thread(target=reader, name="quickpurge-reader", daemon=True)
+    t.start()
+    try:
+        while True:
+            i, n, err = filled.get()
+            if err is not None:
+                raise err
+            if not n:
+                break
+            yield views[i][:n]
+            free.put(i)
+    finally:
+        # unblock the reader if the caller stopped early, and never let it
+        # outlive the file handle
+        free.put(None)
+        t.join()
+
+# Where log() writes (None = current sys.stdout) and whether notify() shows
+# desktop notifications. The headless CLI moves logs to stderr and turns
+# notifications off, keeping stdout for machine-readable output.
+LOG_STREAM = None
+NOTIFICATIONS = True
+
+
 def log(message):
     """Print a log message with timestamp."""
     time_str = datetime.datetime.now().strftime("%H:%M:%S")
-    print(f"[{time_str}] {message}")
+    print(f"[{time_str}] {message}", file=LOG_STREAM or sys.stdout)
 
 
 def notify(title, message):
     """Send a desktop notification."""
+    if not NOTIFICATIONS:
+        return
     try:
+        from plyer import notification  # lazy: slow import, only needed here
         notification.notify(title=title, message=message, timeout=5)
     except Exception as e:
-        print(f"[Notify Error] {e}")
+        print(f"[Notify Error] {e}", file=LOG_STREAM or sys.stdout)
 
 
@@ -0,0 +1,193 @@
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# One stat per file, carried forward to exclusion, grouping and hashing.
+# Field names mirror os.stat_result so a FileEntry can stand in for one
+# (ExclusionMatcher.excludes, database.stat_key, HashCache.lookup).
+FileEntry = namedtuple(
+    "FileEntry",
+    ["path", "st_size", "st_dev", "st_ino", "st_nlink", "st_mtime_ns", "st_ctime_ns"],
+)
+
+# A directory changed within this long of being indexed may have changed
+# again without moving its mtime (FAT has 2 s mtime granularity), so such
+# a snapshot is never trusted.
+RACY_NS = 2 * 10**9
+
+
+def file_entry(path, st):
+    """Build a FileEntry from a path and its stat result."""
+    return FileEntry(path, st.st_size, st.st_dev, st.st_ino, st.st_nlink,
+                     st.st_mtime_ns, st.st_ctime_ns)
+
+
+def list_dir(path):
+    """
+    os.scandir one directory.
+    Returns (path, subdirs, files, errors, error, entries) where subdirs are
+    full paths, files are FileEntry tuples, errors counts entries that
+    couldn't be stat'ed by exception type ({name: count}), error is the
+    OSError if the directory itself couldn't be listed and entries is the
+    number of directory entries (including skipped ones).
+    Symlinks are skipped: following them would report a file as a copy of itself.
+    """
+    subdirs = []
+    files = []
+    errors = {}
+    entries = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                entries += 1
+                try:
+                    if entry.is_symlink():
+                        continue
+                    if entry.is_dir():
+                        subdirs.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                    if not st.st_ino:
+                        # Windows DirEntry.stat() leaves inode/device/nlink empty
+                        st = os.stat(entry.path)
+                    files.append(file_entry(entry.path, st))
+                except OSError as e:
+                    kind = type(e).__name__
+                    errors[kind] = errors.get(kind, 0) + 1
+    except OSError as e:
+        return path, [], [], errors, e, entries
+    return path, subdirs, files, errors, None, entries
+
+
+class Walker:
+    """
+    Directory walker built on os.scandir.
+    walk() yields (dirpath, subdirs, files) like os.walk, but files are
+    FileEntry tuples and subdirs are full paths. Subdirectories for which
+    `prune(path)` is True are never listed. With threads > 1 directories are
+    listed on a thread pool (helps most on network / high-latency filesystems);
+    results then arrive in completion order rather than top-down.
+    With an `index` (database.DirIndex) directories whose mtime and entry
+    count match their indexed snapshot are not listed: their stored listing
+    is yielded instead, and every directory actually listed is recorded.
+    """
+
+    def __init__(self, prune=None, threads=1, index=None):
+        self.prune = prune
+        self.threads = max(1, int(threads or 1))
+        self.index = index
+        self.dirs_listed = 0
+        self.dirs_reused = 0
+        self.files_reused = 0
+        self.dirs_pruned = 0
+        self.entry_errors = 0
+        self.dir_errors = 0
+        self.files_seen = 0
+        self.error_types = {}  # exception name -> count (entries and directories)
+
+    def _list(self, path):
+        """
+        Runs on the walk threads. Returns (list_dir result, mtime_ns,
+        listed_at_ns), or None when the indexed listing of `path` is still
+        valid: same mtime, not racy, same entry count. Counting entries
+        only reads names, so an unchanged directory costs one stat and no
+        per-file stats.
+        """
+        if self.index is None:
+            return list_dir(path), None, None
+        listed_at = time.time_ns()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return list_dir(path), None, None  # reports the error
+        known = self.index.known.get(path)
+        if known is not None and known[0] == mtime and mtime + RACY_NS < known[2]:
+            try:
+                if len(os.listdir(path)) == known[1]:
+                    return None
+            except OSError:
+                pass
+        return list_dir(path), mtime, listed_at
+
+    def _accept(self, path, listed):
+        if listed is None:
+            subdirs, files = self.index.listing(path)
+            self.dirs_reused += 1
+            self.files_reused += len(files)
+            return path, self._keep(subdirs), files
+        result, mtime, listed_at = listed
+        path, subdirs, files, errors, error, entries = result
+        self.files_seen += len(files)
+        for kind, n in errors.items():
+            self.entry_errors += n
+            self.error_types[kind] = self.error_types.get(kind, 0) + n
+        if error is not None:
+            self.dir_errors += 1
+            kind = type(error).__name__
+            self.error_types[kind] = self.error_types.get(kind, 0) + 1
+            return path, [], files
+        self.dirs_listed += 1
+        if mtime is not None:
+            self.index.record(path, mtime, entries, listed_at, subdirs, files)
+        return path, self._keep(subdirs), files
+
+    def _keep(self, subdirs):
+        kept = []
+        for d in subdirs:
+            if self.prune is not None and self.prune(d):
+                self.dirs_pruned += 1
+            else:
+                kept.append(d)
+        return kept
+
+    def walk(self, roots):
+        if isinstance(roots, str):
+            roots = [roots]
+        if self.threads == 1:
+            yield from self._walk_serial(roots)
+        else:
+            yield from self._walk_threaded(roots)
+
+    def frontier(self):
+        """
+        Directories of the current walk not yet yielded (queued or being
+        listed). Walking them later, e.g. walk(frontier) after a restart,
+        continues the walk where it stopped.
+        """
+        return list(self._frontier())
+
+    def _frontier(self):
+        return []
+
+    def _walk_serial(self, roots):
+        stack = list(reversed(roots))
+        self._frontier = lambda: reversed(stack)
+        while stack:
+            path = stack.pop()
+            path, kept, files = self._accept(path, self._list(path))
+            # queue children before yielding so frontier() is complete while suspended
+            stack.extend(reversed(kept))
+            yield path, kept, files
+
+    def _walk_threaded(self, roots):
+        pending = deque(roots)
+        in_flight = {}  # future -> path, until its result has been yielded
+        self._frontier = lambda: list(pending) + list(in_flight.values())
+        limit = self.threads * 2
+        pool = ThreadPoolExecutor(max_workers=self.threads)
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < limit:
+                    path = pending.popleft()
+                    in_flight[pool.submit(self._list, path)] = path
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    path, kept, files = self._accept(in_flight[fut], fut.result())
+                    pending.extend(kept)
+                    del in_flight[fut]
+                    yield path, kept, files
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,517 @@
+"""
+Watch mode: keep a scan's duplicate groups live as files change.
+
+An initial scan_folder() produces the scan; after that, file system events
+(inotify on Linux, polling elsewhere) are fed through size grouping and
+hashing one path at a time, and only the groups a changed file left or
+joined are rewritten (database.replace_group).
+"""
+import os
+import sys
+import time
+import select
+import struct
+
+from config import HASH_ALGORITHM
+from . import database
+from .utils import log
+from .walker import Walker, file_entry
+from .exclusion_rules import get_matcher
+
+POLL_INTERVAL = 2.0  # seconds between re-walks of the polling backend
+WATCH_SETTLE = 0.3   # quiet time that ends a burst of events
+MAX_SETTLE = 2.0     # a burst is applied after this long even if events keep coming
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len (then len bytes of name)
+
+BACKENDS = ("auto", "inotify", "poll")
+
+
+class InotifyBackend:
+    """
+    inotify through ctypes (no third-party dependency). One watch per
+    directory; directories created or moved in are watched as they appear.
+    read() returns [(kind, path)] with kind "changed", "deleted" or
+    "rescan" (the kernel queue overflowed; path is None).
+    """
+
+    def __init__(self, roots, prune=None):
+        import ctypes
+        import ctypes.util
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.prune = prune
+        self.watch_errors = 0
+        self._paths = {}  # wd -> directory
+        for root in roots:
+            self.add_tree(root)
+
+    def add_tree(self, root):
+        """Watch `root` and every directory below it that isn't pruned."""
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            if not self._add_watch(path):
+                continue
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False) and not (self.prune and self.prune(entry.path)):
+                            stack.append(entry.path)
+            except OSError:
+                pass
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = self._ctypes.get_errno()
+            if not self.watch_errors:
+                # usually ENOSPC: fs.inotify.max_user_watches is too low for the tree
+                log(f"inotify: cannot watch {path}: {os.strerror(err)}")
+            self.watch_errors += 1
+            return False
+        self._paths[wd] = path
+        return True
+
+    def _forget_tree(self, path):
+        prefix = path + os.sep
+        for wd, watched in list(self._paths.items()):
+            if watched == path or watched.startswith(prefix):
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self._paths[wd]
+
+    def read(self, timeout):
+        """Wait up to `timeout` seconds for events and return them."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        events = []
+        while ready:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            events.extend(self._parse(data))
+        return events
+
+    def _parse(self, data):
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.append(("rescan", None))
+                continue
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            parent = self._paths.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, os.fsdecode(name))
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                if mask & IN_ISDIR:
+                    self._forget_tree(path)
+                events.append(("deleted", path))
+            elif mask & IN_ISDIR:
+                if self.prune is None or not self.prune(path):
+                    self.add_tree(path)
+                    events.append(("changed", path))
+            else:
+                # IN_CREATE alone covers new hardlinks; a copy also ends with IN_CLOSE_WRITE
+                events.append(("changed", path))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingBackend:
+    """
+    Fallback for platforms (or filesystems) without inotify: re-walk the
+    roots every `interval` seconds and diff (size, mtime, inode) per file.
+    """
+
+    def __init__(self, roots, prune=None, interval=POLL_INTERVAL):
+        self.roots = list(roots)
+        self.prune = prune
+        self.interval = interval
+        self._snapshot = self._walk()
+        self._next = time.monotonic() + interval
+
+    def _walk(self):
+        snapshot = {}
+        for _, _, files in Walker(prune=self.prune).walk(self.roots):
+            for f in files:
+                snapshot[f.path] = (f.st_size, f.st_mtime_ns, f.st_ino)
+        return snapshot
+
+    def read(self, timeout):
+        wait = self._next - time.monotonic()
+        if wait > timeout:
+            time.sleep(max(0.0, timeout))
+            return []
+        time.sleep(max(0.0, wait))
+        self._next = time.monotonic() + self.interval
+        old, self._snapshot = self._snapshot, self._walk()
+        events = [("deleted", path) for path in old if path not in self._snapshot]
+        events.extend(("changed", path) for path, key in self._snapshot.items() if old.get(path) != key)
+        return events
+
+    def close(self):
+        pass
+
+
+def open_backend(roots, prune=None, backend="auto", interval=POLL_INTERVAL):
+    """inotify where available (backend "auto" or "inotify"), else polling."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown watch backend: {backend!r} (use one of {BACKENDS})")
+    if backend != "poll":
+        if sys.platform.startswith("linux"):
+            try:
+                return InotifyBackend(roots, prune)
+            except (OSError, AttributeError) as e:
+                if backend == "inotify":
+                    raise
+                log(f"inotify unavailable ({e}); polling every {interval}s instead.")
+        elif backend == "inotify":
+            raise ValueError("The inotify backend is only available on Linux")
+    return PollingBackend(roots, prune, interval)
+
+
+class LiveIndex:
+    """
+    In-memory size buckets of every file under the roots, plus the digests
+    of files that share a size, mirrored into one scan's groups. update()
+    re-stats the paths of a batch of events, hashes only files whose size
+    bucket gained a member, and rewrites only the groups that changed.
+    Extra hardlinks of an indexed inode are tracked but never grouped,
+    as in scan_folder.
+    """
+
+    def __init__(self, scan_id, roots, algorithm=HASH_ALGORITHM):
+        self.scan_id = scan_id
+        self.roots = list(roots)
+        self.algorithm = algorithm
+        self.matcher = get_matcher()
+        self.entries = {}   # path -> FileEntry, for files in by_size
+        self.by_size = {}   # size -> {path: FileEntry}
+        self.digests = {}   # path -> digest (hashed once its bucket has two members)
+        self.inodes = {}    # (st_dev, st_ino) -> indexed path, files with more than one link
+        self.links = {}     # path -> (st_dev, st_ino), further links of an indexed inode
+        self.tree = {}      # directory -> child paths (files and directories) holding indexed files
+        self.cache = database.HashCache(scan_id, algorithm=algorithm)
+        self.files_hashed = 0
+
+    def load(self, entries=None):
+        """
+        Fill the index from the scan's stored groups and `entries`, the
+        FileEntry list its walk accepted (scan_folder(entries=...)); without
+        them the roots are walked again.
+        """
+        if entries is None:
+            roots = [r for r in self.roots if not self.matcher.excludes_folder(r)]
+            entries = (entry for _, _, files in Walker(prune=self.matcher.prunes_dir).walk(roots)
+                       for entry in files if not self.matcher.excludes(entry.path, entry))
+        for entry in entries:
+            self._insert(entry)
+        for digest, joined, _ in database.get_all_duplicates(self.scan_id):
+            for path in joined.split("\x1f"):
+                self.digests[path] = digest
+
+    def _insert(self, entry):
+        if entry.st_nlink > 1 and entry.st_ino:
+            key = (entry.st_dev, entry.st_ino)
+            owner = self.inodes.setdefault(key, entry.path)
+            if owner != entry.path:
+                self.links[entry.path] = key
+                self._link(entry.path)
+                return False
+        self.entries[entry.path] = entry
+        self.by_size.setdefault(entry.st_size, {})[entry.path] = entry
+        self._link(entry.path)
+        return True
+
+    def _link(self, path):
+        """Record `path` under its parent directories, up to the first one already known."""
+        while True:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return
+            children = self.tree.get(parent)
+            if children is not None:
+                children.add(path)
+                return
+            self.tree[parent] = {path}
+            path = parent
+
+    def _unlink(self, path):
+        """Drop `path` from the directory tree, and directories left empty with it."""
+        while True:
+            parent = os.path.dirname(path)
+            children = self.tree.get(parent)
+            if children is None:
+                return
+            children.discard(path)
+            if children:
+                return
+            del self.tree[parent]
+            path = parent
+
+    def _files_under(self, path):
+        """Indexed paths below directory `path` (none unless it holds indexed files)."""
+        files = []
+        stack = [path]
+        while stack:
+            for child in self.tree.get(stack.pop(), ()):
+                if child in self.tree:
+                    stack.append(child)
+                else:
+                    files.append(child)
+        return files
+
+    def _discard(self, path):
+        """
+        Drop `path`; returns (group key or None, other links of its inode).
+        The group key is (size, digest) of the group it may have been in.
+        """
+        if self.links.pop(path, None) is not None:
+            self._unlink(path)
+            return None, []
+        entry = self.entries.pop(path, None)
+        if entry is None:
+            return None, []
+        self._unlink(path)
+        bucket = self.by_size[entry.st_size]
+        del bucket[path]
+        if not bucket:
+            del self.by_size[entry.st_size]
+        digest = self.digests.pop(path, None)
+        orphans = []
+        key = (entry.st_dev, entry.st_ino)
+        if self.inodes.get(key) == path:
+            del self.inodes[key]
+            orphans = [p for p, k in self.links.items() if k == key]
+            for p in orphans:
+                del self.links[p]
+                self._unlink(p)
+        return ((entry.st_size, digest) if digest else None), orphans
+
+    def _expand(self, events):
+        """Paths to re-stat for a batch of (kind, path) events."""
+        paths = set()
+        for kind, path in events:
+            if kind == "rescan":
+                paths.update(self.entries, self.links)
+                roots = self.roots
+            else:
+                paths.add(path)
+                if path in self.entries or path in self.links:
+                    continue  # a known file: nothing below it
+                # a directory that was moved away or deleted takes its files with it
+                paths.update(self._files_under(path))
+                if kind == "deleted" or not os.path.isdir(path):
+                    continue
+                roots = [path]
+            for _, _, files in Walker(prune=self.matcher.prunes_dir).walk(roots):
+                paths.update(f.path for f in files)
+        return paths
+
+    def _stat(self, path):
+        """FileEntry for an indexable regular file, else None (gone, excluded, ...)."""
+        try:
+            if os.path.islink(path):
+                return None
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        entry = file_entry(path, st)
+        if self.matcher.excludes(path, entry):
+            return None
+        return entry
+
+    def _hash(self, entry):
+        from .scanner import _full_hash
+        digest = self.cache.lookup(entry)
+        if digest is not None:
+            return digest
+        key = database.stat_key(entry)
+        try:
+            digest, _, stable = _full_hash(entry.path, key, self.algorithm)
+        except OSError as e:
+            log(f"Watch: cannot hash {entry.path}: {e}")
+            return None
+        self.files_hashed += 1
+        if stable:
+            self.cache.store(entry.path, entry, digest)
+        return digest
+
+    def update(self, events):
+        """
+        Apply a batch of events. Returns one dict per rewritten group:
+        {"digest", "size", "paths"} (fewer than two paths: the group is gone).
+        Exclusions edited since the last batch are applied with a rescan.
+        """
+        matcher = get_matcher(refresh=True)
+        if matcher is not self.matcher:
+            self.matcher = matcher
+            events = list(events) + [("rescan", None)]
+        touched = set()      # (size, digest) of groups to rewrite
+        grown = set()        # sizes whose bucket gained a member
+        todo = sorted(self._expand(events))
+        while todo:
+            path = todo.pop()
+            entry = self._stat(path)
+            old = self.entries.get(path)
+            if entry is not None and old is not None and database.stat_key(entry) == database.stat_key(old):
+                continue  # unchanged
+            if entry is not None and path in self.links and self.links[path] == (entry.st_dev, entry.st_ino):
+                continue  # still a link of the same inode
+            group, orphans = self._discard(path)
+            if group:
+                touched.add(group)
+            todo.extend(orphans)  # another link of the inode becomes the indexed one
+            if entry is not None and self._insert(entry):
+                grown.add(entry.st_size)
+
+        for size in grown:
+            bucket = self.by_size.get(size, {})
+            if len(bucket) < 2:
+                continue
+            for path, entry in bucket.items():
+                if path not in self.digests:
+                    digest = self._hash(entry)
+                    if digest:
+                        self.digests[path] = digest
+                        touched.add((size, digest))
+        self.cache.flush()
+
+        changes = []
+        groups = []
+        for size, digest in sorted(touched):
+            members = [(path, entry.st_mtime_ns / 1e9) for path, entry in self.by_size.get(size, {}).items()
+                       if self.digests.get(path) == digest]
+            groups.append((digest, size, members))
+            changes.append({"digest": digest, "size": size, "paths": [p for p, _ in members]})
+        if groups:
+            # one transaction: a file moving between groups leaves its old row first
+            database.replace_groups(self.scan_id, groups)
+        if changes:
+            database.finish_scan(self.scan_id, len(self.entries) + len(self.links))
+        return changes
+
+    def close(self):
+        self.cache.close()
+
+
+class Watcher:
+    """
+    Scan `folder_path` once, then keep that scan's groups live.
+        w = Watcher(paths); w.start(); while ...: w.step(); w.close()
+    step() waits for events, lets a burst settle and applies it.
+    Extra keyword arguments go to scan_folder (workers, pool, algorithm, cancel_flag, ...).
+    """
+
+    def __init__(self, folder_path, backend="auto", poll_interval=POLL_INTERVAL,
+                 settle=WATCH_SETTLE, on_progress=None, **scan_options):
+        from .scanner import _distinct_roots
+        roots = [folder_path] if isinstance(folder_path, str) else list(folder_path)
+        self.roots = _distinct_roots(roots)
+        self.backend_name = backend
+        self.poll_interval = poll_interval
+        self.settle = settle
+        self.on_progress = on_progress
+        self.scan_options = scan_options
+        self.scan_id = None
+        self.backend = None
+        self.index = None
+        self._matcher = None
+
+    def start(self):
+        """Subscribe to events, run the initial scan and load the index. Returns the scan id."""
+        from .scanner import scan_folder, _emit
+        # subscribe first: changes made during the initial scan are re-applied afterwards
+        self._matcher = get_matcher(refresh=True)
+        self.backend = open_backend(self.roots, prune=self._prunes_dir,
+                                    backend=self.backend_name, interval=self.poll_interval)
+        entries = []
+        self.scan_id = scan_folder(self.roots, on_progress=self.on_progress, entries=entries,
+                                   **self.scan_options)
+        if self.scan_id is None:
+            return None
+        self.index = LiveIndex(self.scan_id, self.roots,
+                               algorithm=self.scan_options.get("algorithm", HASH_ALGORITHM))
+        self.index.load(entries)  # the scan's own walk: no second stat of the tree
+        log(f"Watching {len(self.roots)} folder(s) with {type(self.backend).__name__}.")
+        _emit(self.on_progress, stage="watching", scan_id=self.scan_id, roots=self.roots)
+        return self.scan_id
+
+    def _prunes_dir(self, path):
+        # the index's matcher follows exclusion edits; the backend prunes with it too
+        matcher = self.index.matcher if self.index is not None else self._matcher
+        return matcher.prunes_dir(path)
+
+    def step(self, timeout=1.0):
+        """Wait up to `timeout` seconds for changes and apply them. Returns the changed groups."""
+        from .scanner import _emit
+        events = self.backend.read(timeout)
+        if not events:
+            return []
+        deadline = time.monotonic() + MAX_SETTLE
+        while time.monotonic() < deadline:
+            more = self.backend.read(self.settle)
+            if not more:
+                break
+            events.extend(more)
+        changes = self.index.update(events)
+        for change in changes:
+            _emit(self.on_progress, stage="watch_update", scan_id=self.scan_id, **change)
+        return changes
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+        if self.index is not None:
+            self.index.close()
+
+
+def watch(folder_path, on_progress=None, cancel_flag=None, **options):
+    """
+    Scan `folder_path`, then keep its duplicate groups up to date until
+    `cancel_flag` is set (dict or callable, as for scan_folder).
+    Progress and group changes go to on_progress ("watch_update" events).
+    Returns the scan id.
+    """
+    from .scanner import _is_cancelled
+    # the initial scan stops on the same flag
+    watcher = Watcher(folder_path, on_progress=on_progress, cancel_flag=cancel_flag, **options)
+    try:
+        if watcher.start() is None:
+            return None
+        while not _is_cancelled(cancel_flag):
+            watcher.step(timeout=0.5)
+    finally:
+        watcher.close()
+    return watcher.scan_id
@@ -1,2 +1,8 @@
 from setuptools import setup, find_packages
-setup(name="quickpurge", version="0.0.1", packages=find_packages())
+setup(
+    name="quickpurge",
+    version="0.0.1",
+    packages=find_packages(),
+    py_modules=["config"],
+    entry_points={"console_scripts": ["quickpurge=quickpurge.cli:main"]},
+)
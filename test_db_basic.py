@@ -9,7 +9,7 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from quickpurge import database
-from quickpurge.database import DB_PATH
+from config import DB_PATH
 
 print("DB_PATH:", DB_PATH)
 print("Removing DB (if exists) to test fresh creation...")
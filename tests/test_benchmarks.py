@@ -0,0 +1,53 @@
+import hashlib
+import os
+import tempfile
+
+from benchmarks.run import run_benchmarks, _scratch_dir
+from benchmarks.synthetic import generate_tree
+
+
+def _digest_tree(root):
+    h = hashlib.sha256()
+    for d, dirs, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            path = os.path.join(d, name)
+            h.update(os.path.relpath(path, root).encode())
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def test_generate_tree_is_seeded(tmp_path):
+    a = generate_tree(str(tmp_path / "a"), files=80, seed=7, mean_size=2048, depth=2, fanout=3)
+    b = generate_tree(str(tmp_path / "b"), files=80, seed=7, mean_size=2048, depth=2, fanout=3)
+    generate_tree(str(tmp_path / "c"), files=80, seed=8, mean_size=2048, depth=2, fanout=3)
+    assert a == b and a["files"] == 80 and a["duplicates"] > 0
+    assert _digest_tree(tmp_path / "a") == _digest_tree(tmp_path / "b")
+    assert _digest_tree(tmp_path / "a") != _digest_tree(tmp_path / "c")
+
+
+def test_run_benchmarks_smoke(tmp_path):
+    results = run_benchmarks(files=60, mean_size=1024, workers=1, workdir=str(tmp_path / "w"))
+    cold, warm = results["scan"]["cold"], results["scan"]["warm"]
+    assert cold["files"] > 0
+    assert cold["files"] == warm["files"] == 60
+    assert cold["duplicates"] == warm["duplicates"] == results["tree"]["duplicates"]
+    assert warm["cache_hits"] > 0 and cold["cache_hits"] == 0
+    assert results["database"]["rows"] > 0 and results["exclusions"]["calls"] > 0
+    assert results["reads"]["file_buffers_threaded_mb_per_s"] > 0
+    assert not os.path.exists(tmp_path / "w")
+
+
+def test_scratch_dir_skips_excluded_temp_dirs(tmp_path, monkeypatch):
+    from quickpurge import exclusion_rules
+    # like macOS, where mkdtemp() lands under /var/folders and /var is protected
+    protected, cwd = tmp_path / "var", tmp_path / "cwd"
+    protected.mkdir()
+    cwd.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(protected))
+    monkeypatch.setattr(exclusion_rules, "DEFAULT_PROTECTED_FOLDERS", [str(protected)])
+    monkeypatch.chdir(cwd)
+
+    path = _scratch_dir()
+    assert os.path.dirname(path) == str(cwd)
+    assert os.listdir(protected) == []
@@ -0,0 +1,135 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import config
+from quickpurge import cli, safe_delete, scanner
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _records(out):
+    return [json.loads(line) for line in out.splitlines() if line.strip()]
+
+
+def test_cli_scan_report_archive_restore(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    d = tmp_path / "folder"
+    d.mkdir()
+    for name in ("a", "b", "c"):
+        (d / name).write_bytes(b"same bytes")
+    (d / "u").write_bytes(b"unique")
+
+    assert cli.main(["scan", str(d), "--fail-on-duplicates"]) == cli.EXIT_DUPLICATES
+    out = capsys.readouterr()
+    records = _records(out.out)
+    assert [r["type"] for r in records] == ["group", "summary"]
+    group, summary = records
+    assert group["member_count"] == 3 and group["wasted_bytes"] == 20
+    assert summary["status"] == "ok" and summary["total_duplicates"] == 2
+    assert "done:" in out.err
+
+    assert cli.main(["report"]) == cli.EXIT_OK
+    assert _records(capsys.readouterr().out)[0]["paths"] == group["paths"]
+
+    victim = group["paths"][1]
+    assert cli.main(["archive", victim]) == cli.EXIT_OK
+    assert _records(capsys.readouterr().out) == [{"type": "archived", "path": victim, "ok": True}]
+    assert not os.path.exists(victim)
+    cli.main(["report"])
+    assert _records(capsys.readouterr().out)[0]["member_count"] == 2
+
+    assert cli.main(["archive", str(d / "missing")]) == cli.EXIT_PARTIAL
+    capsys.readouterr()
+
+    assert cli.main(["restore", "--all"]) == cli.EXIT_OK
+    assert [r["ok"] for r in _records(capsys.readouterr().out)] == [True]
+    assert os.path.exists(victim)
+
+    assert cli.main(["history"]) == cli.EXIT_OK
+    assert _records(capsys.readouterr().out)[0]["type"] == "scan"
+
+    assert cli.main(["report", "--scan-id", "999"]) == cli.EXIT_NOT_FOUND
+    assert capsys.readouterr().out == ""
+
+
+def test_cli_reports_hardlink_sets(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    d = tmp_path / "folder"
+    d.mkdir()
+    (d / "a").write_bytes(b"linked bytes")
+    os.link(d / "a", d / "b")
+
+    assert cli.main(["scan", str(d), "--quiet"]) == cli.EXIT_OK
+    records = _records(capsys.readouterr().out)
+    assert [r["type"] for r in records] == ["hardlinks", "summary"]
+    assert sorted(records[0]["paths"]) == [str(d / "a"), str(d / "b")] and records[0]["size"] == 12
+
+    assert cli.main(["report"]) == cli.EXIT_OK
+    assert _records(capsys.readouterr().out) == records[:1]
+
+
+def test_cli_usage_errors_and_failures(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    for argv in (["scan", str(tmp_path), "--algorithm", "crc0"],
+                 ["scan", str(tmp_path), "--workers", "0"],
+                 ["report", "--limit", "-1"]):
+        with pytest.raises(SystemExit) as exc:
+            cli.main(argv)
+        assert exc.value.code == cli.EXIT_USAGE
+    capsys.readouterr()
+
+    # a ValueError raised while scanning is a failure, not a usage error
+    def broken(*args, **kwargs):
+        raise ValueError("bug")
+
+    monkeypatch.setattr(scanner, "scan_folder", broken)
+    with pytest.raises(ValueError):
+        cli.main(["scan", str(tmp_path), "-q"])
+
+
+def test_cli_runs_without_gui(tmp_path):
+    db = str(tmp_path / "db.sqlite")
+    code = (
+        "import sys\n"
+        "from quickpurge import cli\n"
+        "rc = cli.main(['--db', %r, 'history'])\n"
+        "gui = [m for m in ('PySimpleGUI', 'tkinter', 'quickpurge.ui') if m in sys.modules]\n"
+        "assert not gui, gui\n"
+        "sys.exit(rc)\n" % db
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert proc.returncode == cli.EXIT_OK, proc.stderr
+    assert proc.stdout == ""
+
+    # no scans yet: nothing on stdout, "not found" exit code
+    proc = subprocess.run([sys.executable, "-m", "quickpurge", "--db", db, "report"],
+                          cwd=ROOT, capture_output=True, text=True)
+    assert proc.returncode == cli.EXIT_NOT_FOUND and proc.stdout == ""
+
+
+def test_cli_resume(tmp_path, monkeypatch, capsys):
+    from quickpurge import database, scanner
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    d = tmp_path / "folder"
+    d.mkdir()
+    (d / "a").write_bytes(b"same bytes")
+    (d / "b").write_bytes(b"same bytes")
+
+    assert cli.main(["resume"]) == cli.EXIT_NOT_FOUND
+    assert scanner.scan_folder(str(d), cancel_flag={"cancel": True}) is None
+    capsys.readouterr()
+
+    assert cli.main(["resume", "--list"]) == cli.EXIT_OK
+    (listed,) = _records(capsys.readouterr().out)
+    assert listed["type"] == "resumable" and listed["folders"] == [str(d)]
+
+    assert cli.main(["resume", "-q"]) == cli.EXIT_OK
+    records = _records(capsys.readouterr().out)
+    assert [r["type"] for r in records] == ["group", "summary"]
+    assert records[-1]["scan_id"] == listed["scan_id"] and records[-1]["total_duplicates"] == 1
+    assert database.get_resumable_scans() == []
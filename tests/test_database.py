@@ -1,4 +1,5 @@
 import os
+import sqlite3
 from quickpurge import database
 import config
 
@@ -31,3 +32,148 @@ def test_database_operations(tmp_path, monkeypatch):
     assert last[2] == 2
     assert last[3] == 1
     assert last[4] == 123
+
+
+def test_duplicate_writer_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    scan_id = database.start_scan()
+
+    with database.DuplicateWriter(batch_size=3, max_age=60) as writer:
+        writer.add_group(scan_id, "h", 10, [(f"/x/{i}", None) for i in range(2)])
+        assert writer.rows_written == 0
+        writer.add_group(scan_id, "g", 20, [(f"/y/{i}", None) for i in range(4)])
+        # 6 member rows queued -> both groups flushed in one transaction
+        assert writer.groups_written == 2 and writer.rows_written == 6
+        writer.add_group(scan_id, "k", 30, [("/z/0", None), ("/z/1", None)])
+    assert writer.groups_written == 3 and writer.rows_written == 8
+
+    rows = database.get_all_duplicates(scan_id)
+    assert len(rows) == 3
+    assert [len(r[1].split("\x1f")) for r in rows] == [2, 4, 2]
+
+
+def test_duplicates_keyset_paging(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    scan_id = database.start_scan()
+
+    with database.DuplicateWriter() as writer:
+        for g in range(5):                 # group g: g + 2 copies of size 100 * (g + 1)
+            writer.add_group(scan_id, f"h{g}", 100 * (g + 1),
+                             [(f"/d/{g}/{i}", float(i)) for i in range(g + 2)])
+
+    assert database.count_duplicates(scan_id) == 20
+    for sort in database.DUPLICATE_SORTS:
+        for descending in (True, False):
+            seen, after = [], None
+            while True:
+                page = database.get_duplicates_page(scan_id, sort, descending, after, limit=3)
+                if not page:
+                    break
+                seen += page
+                after = (page[-1][-1], page[-1][0])
+            keys = [(r[-1], r[0]) for r in seen]
+            assert len(seen) == 20 and len(set(r[0] for r in seen)) == 20
+            assert keys == sorted(keys, reverse=descending)
+
+    top = database.get_duplicates_page(scan_id, "wasted", True, limit=1)[0]
+    assert top[4] == "h4" and top[5] == 5 * 500
+
+    # shrinking a group re-sorts its members by the new wasted_bytes
+    database.remove_duplicates_by_paths(scan_id, ["/d/4/0", "/d/4/1", "/d/4/2", "/d/4/3"])
+    top = database.get_duplicates_page(scan_id, "wasted", True, limit=1)[0]
+    assert top[4] == "h3" and top[5] == 4 * 400
+
+
+def test_duplicates_page_uses_index_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    conn = database.get_connection()
+    for sort in database.DUPLICATE_SORTS:
+        for descending in (True, False):
+            for after in (None, (1, 1)):
+                sql, params = database._duplicates_page_query(1, sort, descending, after, 500)
+                plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+                assert "TEMP B-TREE" not in plan, (sort, plan)
+    conn.close()
+
+
+def test_duplicate_groups_accounting(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    scan_id = database.start_scan()
+
+    with database.DuplicateWriter() as writer:
+        writer.add_group(scan_id, "a", 100, [("/a/1", 1.0), ("/a/2", 2.0), ("/a/3", 3.0)])
+        writer.add_group(scan_id, "b", 10, [("/b/1", 1.0), ("/b/2", 2.0)])
+
+    groups = database.get_duplicate_groups(scan_id)
+    assert [g[1:] for g in groups] == [("a", 100, 3, 200), ("b", 10, 2, 10)]
+    assert [p for p, _ in database.get_group_members(groups[0][0])] == ["/a/1", "/a/2", "/a/3"]
+    assert database.finish_scan(scan_id, total_files=5) == (3, 210)
+
+    # archiving a member shrinks its group; a lone survivor is no longer a duplicate
+    database.remove_duplicate_by_path(scan_id, "/a/2")
+    database.remove_duplicate_by_path(scan_id, "/b/1")
+    assert [g[1:] for g in database.get_duplicate_groups(scan_id)] == [("a", 100, 2, 100)]
+    assert database.count_duplicates(scan_id) == 2
+
+
+def test_migrates_repeated_original_rows(tmp_path, monkeypatch):
+    db = tmp_path / "db.sqlite"
+    monkeypatch.setattr(config, "DB_PATH", str(db))
+    # schema-1 layout: the original path was inserted once per extra copy
+    conn = sqlite3.connect(str(db))
+    conn.execute("""CREATE TABLE duplicates (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    scan_id INTEGER, file_path TEXT, file_hash TEXT, file_size INTEGER)""")
+    conn.executemany("INSERT INTO duplicates (scan_id, file_path, file_hash, file_size) VALUES (1, ?, 'h', 5)",
+                     [("/o",), ("/c1",), ("/o",), ("/c2",)])
+    conn.commit()
+    conn.close()
+
+    database.init_db()
+    assert database.count_duplicates(1) == 3
+    assert [g[1:] for g in database.get_duplicate_groups(1)] == [("h", 5, 3, 10)]
+
+
+def test_dir_index_drops_vanished_subtrees(tmp_path, monkeypatch):
+    from quickpurge.walker import FileEntry
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    root = os.path.join(os.sep, "share")
+    sub, deep = os.path.join(root, "sub"), os.path.join(root, "sub", "deep")
+    f = FileEntry(os.path.join(sub, "f"), 5, 1, 2, 1, 10, 10)
+
+    with database.DirIndex(trust=False) as index:
+        index.record(root, 100, 2, 200, [sub, os.path.join(root, "subx")], [])
+        index.record(sub, 100, 2, 200, [deep], [f])
+        index.record(deep, 100, 0, 200, [], [])
+    index = database.DirIndex([root])
+    assert set(index.known) == {root, sub, deep}
+    assert index.listing(sub) == ([deep], [f])
+
+    # "sub" is gone from the root listing: its subtree goes too, "subx" stays
+    index.record(root, 300, 1, 400, [os.path.join(root, "subx")], [])
+    index.close()
+    assert set(database.DirIndex([root]).known) == {root}
+    assert database.DirIndex([sub]).listing(sub) == ([], [])
+
+
+def test_scan_history_reads_columns_by_name(tmp_path, monkeypatch):
+    from quickpurge import history
+    db = tmp_path / "db.sqlite"
+    monkeypatch.setattr(config, "DB_PATH", str(db))
+    # a scans table whose later columns were added in another order
+    conn = sqlite3.connect(str(db))
+    conn.execute("""CREATE TABLE scans (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp INTEGER NOT NULL,
+                    metrics TEXT, total_files INTEGER, total_duplicates INTEGER, total_size_saved INTEGER)""")
+    conn.execute("INSERT INTO scans (timestamp, metrics, total_files, total_duplicates, total_size_saved) "
+                 "VALUES (0, '{\"status\": \"ok\"}', 7, 2, 40)")
+    conn.commit()
+    conn.close()
+
+    database.init_db()
+    record = history.get_scan_history(limit=1)[0]
+    assert (record["total_files"], record["total_duplicates"], record["total_size_saved"]) == (7, 2, 40)
+    assert record["hash_algo"] == "sha256" and record["metrics"] == {"status": "ok"}
@@ -0,0 +1,59 @@
+from quickpurge import database, exclusion_rules
+import config
+
+def test_matcher_rules_and_reload(tmp_path, monkeypatch):
+    tmp_db = tmp_path / "db.sqlite"
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_db))
+    database.init_db()
+
+    keep = tmp_path / "keep" / "a.txt"
+    skipped = tmp_path / "skip" / "deep" / "b.txt"
+    suffixed = tmp_path / "keep" / "c.bak"
+
+    database.add_exclusion(str(tmp_path / "skip"), is_folder=True)
+    database.add_exclusion(".bak", is_folder=False)
+
+    matcher = exclusion_rules.get_matcher()
+    assert not matcher.excludes(str(keep))
+    assert matcher.excludes(str(skipped))
+    assert matcher.excludes(str(tmp_path / "skip"))
+    assert not matcher.excludes(str(tmp_path / "skipper" / "x.txt"))
+    assert matcher.excludes(str(suffixed))
+    # unchanged rules -> the same compiled matcher is reused
+    assert exclusion_rules.get_matcher() is matcher
+
+    # editing rules bumps the version stamp and the matcher recompiles
+    database.add_exclusion(str(tmp_path / "keep"), is_folder=True)
+    fresh = exclusion_rules.get_matcher()
+    assert fresh is not matcher
+    assert fresh.excludes(str(keep))
+    assert exclusion_rules.should_exclude(str(keep))
+
+
+def test_should_exclude_stays_off_the_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    database.add_exclusion("cache/x.tmp", is_folder=False)
+    target = str(tmp_path / "cache" / "x.tmp")
+    assert exclusion_rules.should_exclude(target)
+
+    def no_db():
+        raise AssertionError("per-path checks must not open the database")
+    monkeypatch.setattr(database, "get_connection", no_db)
+    # suffix rules match the end of the whole path, not just the file name
+    assert exclusion_rules.should_exclude(target)
+    assert not exclusion_rules.should_exclude(str(tmp_path / "other" / "x.tmp"))
+    assert not exclusion_rules.should_exclude(str(tmp_path / "cache" / "y.txt"))
+    monkeypatch.undo()
+
+    # an edit made by another process is picked up when an operation refreshes
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    conn = database.get_connection()
+    with conn:
+        conn.execute("INSERT INTO exclusions (pattern, is_folder) VALUES (?, 1)", (str(tmp_path / "other"),))
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'exclusions_version'")
+    conn.close()
+    other = str(tmp_path / "other" / "a.txt")
+    assert not exclusion_rules.should_exclude(other)
+    assert exclusion_rules.get_matcher(refresh=True).excludes(other)
+    assert exclusion_rules.should_exclude(other)
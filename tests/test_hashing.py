@@ -0,0 +1,74 @@
+import threading
+import time
+from quickpurge import database, scanner
+from quickpurge.hashing import HashExecutor
+import config
+
+
+def test_executor_respects_per_device_cap():
+    active = {}
+    peak = {}
+    lock = threading.Lock()
+
+    def job(dev):
+        with lock:
+            active[dev] = active.get(dev, 0) + 1
+            peak[dev] = max(peak.get(dev, 0), active[dev])
+        time.sleep(0.01)
+        with lock:
+            active[dev] -= 1
+        return dev * 10
+
+    jobs = [(i, i % 2, (i % 2,)) for i in range(12)]
+    with HashExecutor(workers=4, per_device=1) as ex:
+        results = list(ex.run(job, jobs))
+
+    assert sorted(tag for tag, _, _ in results) == list(range(12))
+    assert all(err is None and res == (tag % 2) * 10 for tag, res, err in results)
+    assert peak == {0: 1, 1: 1}
+
+
+def test_parallel_scan_matches_sequential(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+
+    for pool in ("thread", "process"):
+        # fresh files per pool so the hash cache can't answer for them
+        d = tmp_path / pool
+        d.mkdir()
+        for i in range(6):
+            (d / f"dup{i}.bin").write_bytes(b"d" * 300_000)
+            (d / f"uniq{i}.bin").write_bytes(bytes([i]) * 300_000)
+        events = []
+        scan_id = scanner.scan_folder(str(d), on_progress=events.append, workers=3, pool=pool)
+        rows = database.get_all_duplicates(scan_id)
+        assert len(rows) == 1
+        assert events[-1]["total_duplicates"] == 5
+        assert events[-1]["cache_misses"] == 12
+
+
+def test_algorithm_recorded_and_cache_kept_separate(tmp_path, monkeypatch):
+    import hashlib
+    from quickpurge import hashing, history
+
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    d = tmp_path / "folder"
+    d.mkdir()
+    (d / "a").write_bytes(b"same bytes")
+    (d / "b").write_bytes(b"same bytes")
+
+    events = []
+    sid = scanner.scan_folder(str(d), on_progress=events.append, algorithm="sha256")
+    assert events[-1]["cache_misses"] == 2
+    assert database.get_all_duplicates(sid)[0][0] == hashlib.sha256(b"same bytes").hexdigest()
+
+    # sha256 digests in the cache must not answer a blake2b scan
+    events = []
+    sid = scanner.scan_folder(str(d), on_progress=events.append, algorithm="blake2b")
+    assert events[-1]["cache_hits"] == 0
+    assert database.get_all_duplicates(sid)[0][0] == hashlib.blake2b(b"same bytes").hexdigest()
+    assert history.get_scan_history(1)[0]["hash_algo"] == "blake2b"
+
+    speeds = hashing.benchmark_backends(size=1024 * 1024, names=["sha256", "blake2b"])
+    assert set(speeds) == {"sha256", "blake2b"} and all(v > 0 for v in speeds.values())
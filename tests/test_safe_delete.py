@@ -1,10 +1,16 @@
 import os
-from quickpurge import safe_delete
+import errno
+import json
+import config
+import pytest
+from quickpurge import safe_delete, database
 
 def test_safe_delete_and_permanent(tmp_path, monkeypatch):
     # Point archive to temp folder for the test
     archive_dir = tmp_path / "archive"
     monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(archive_dir))
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
 
     # Create a test file
     f = tmp_path / "to_archive.txt"
@@ -29,3 +35,312 @@ def test_safe_delete_and_permanent(tmp_path, monkeypatch):
     ok2 = safe_delete.permanent_delete(str(f2))
     assert ok2 is True
     assert not f2.exists()
+
+    # an archived file removed behind our back: its entry is dropped, not left dangling
+    archived = str(archived_files[0])
+    assert database.get_archive_entry(archived) is not None
+    os.remove(archived)
+    assert safe_delete.permanent_delete(archived) is True
+    assert database.get_archive_entry(archived) is None
+    assert safe_delete.permanent_delete(archived) is False
+
+
+def test_archive_manifest_restore_and_search(tmp_path, monkeypatch):
+    archive_dir = tmp_path / "archive"
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(archive_dir))
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+
+    files = []
+    for i in range(5):
+        f = tmp_path / "photos" / f"img_{i}.jpg"
+        f.parent.mkdir(exist_ok=True)
+        f.write_bytes(b"x" * (i + 1))
+        files.append(str(f))
+        assert safe_delete.safe_delete(str(f), digest=f"d{i}")
+
+    assert database.count_archive_entries() == (5, 15)
+    assert database.count_archive_entries("img_3") == (1, 4)
+    pages = [database.get_archive_page(after=None, limit=2)]
+    while len(pages[-1]) == 2:
+        last = pages[-1][-1]
+        pages.append(database.get_archive_page(after=(last[5], last[0]), limit=2))
+    entries = [e for page in pages for e in page]
+    assert sorted(e[2] for e in entries) == files
+    assert [e[0] for e in entries] == sorted((e[0] for e in entries), reverse=True)
+
+    entry = database.get_archive_page("img_0")[0]
+    assert entry[4] == "d0" and os.path.exists(entry[1])
+    assert safe_delete.restore_file(entry[1])
+    assert os.path.exists(files[0]) and database.get_archive_entry(entry[1]) is None
+
+    # a failed move leaves no manifest row behind
+    assert not safe_delete.safe_delete(str(tmp_path / "missing"))
+    assert database.count_archive_entries()[0] == 4
+
+
+def test_import_sidecars(tmp_path, monkeypatch):
+    archive_dir = tmp_path / "archive"
+    archive_dir.mkdir()
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(archive_dir))
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+
+    archived = archive_dir / "20240101-120000-1_notes.txt"
+    archived.write_text("old archive")
+    (archive_dir / (archived.name + ".meta.json")).write_text(
+        json.dumps({"original_path": str(tmp_path / "notes.txt")}))
+    (archive_dir / "orphan.meta.json").write_text("{}")
+
+    safe_delete.ensure_manifest()
+    assert not (archive_dir / (archived.name + ".meta.json")).exists()
+    entry = database.get_archive_entry(str(archived))
+    assert entry[2] == str(tmp_path / "notes.txt") and entry[3] == len("old archive")
+    assert safe_delete.restore_file(str(archived))
+    assert (tmp_path / "notes.txt").read_text() == "old archive"
+
+
+def test_archive_many_and_restore_many(tmp_path, monkeypatch):
+    archive_dir = tmp_path / "archive"
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(archive_dir))
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+
+    src = tmp_path / "src"
+    src.mkdir()
+    paths = []
+    for i in range(20):
+        # same basename in two folders: archive names must not collide
+        f = src / f"d{i % 2}" / "same.bin"
+        f = f.with_name(f"same{i // 2}.bin")
+        f.parent.mkdir(exist_ok=True)
+        f.write_bytes(b"dup")
+        paths.append(str(f))
+    scan_id = database.start_scan()
+    with database.DuplicateWriter() as writer:
+        writer.add_group(scan_id, "h", 3, [(p, 0.0) for p in paths])
+
+    progress = []
+    results = safe_delete.archive_many(paths + [str(src / "missing")], scan_id=scan_id, workers=3,
+                                       batch_size=7, on_progress=progress.append)
+    assert [r["ok"] for r in results].count(True) == 20
+    assert [r for r in results if not r["ok"]][0]["path"] == str(src / "missing")
+    assert progress[-1] == {"stage": "archive", "done": 21, "total": 21, "failed": 1, "copied": 0}
+    assert len(progress) == 4  # planning + three batches
+    assert database.count_archive_entries() == (20, 60)
+    assert len(set(r["archive_path"] for r in results if r["ok"])) == 20
+    assert database.get_duplicate_groups(scan_id) == []  # bookkeeping done in bulk
+    assert all(e[4] == "h" for e in database.iter_archive_entries())
+
+    # one original is back in place: that restore is refused, the others succeed
+    archived = [r["archive_path"] for r in results if r["ok"]]
+    (src / "d0" / "same0.bin").write_bytes(b"new")
+    results = safe_delete.restore_many(archived + [str(archive_dir / "unknown")], workers=3, batch_size=7)
+    failed = {r["archive_path"]: r["error"] for r in results if not r["ok"]}
+    assert len(failed) == 2 and "no archive entry" in failed[str(archive_dir / "unknown")]
+    assert database.count_archive_entries()[0] == 1
+    assert sum(os.path.exists(p) for p in paths) == 20
+    assert (src / "d0" / "same0.bin").read_bytes() == b"new"
+
+    # cancelled before the first batch: nothing moves
+    results = safe_delete.archive_many(paths[:3], cancel_flag={"cancel": True})
+    assert [r["error"] for r in results] == ["cancelled"] * 3
+    assert all(os.path.exists(p) for p in paths[:3])
+
+
+def test_archive_root_per_filesystem(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    src = tmp_path / "mnt" / "photos"
+    src.mkdir(parents=True)
+    f = src / "a.jpg"
+    f.write_bytes(b"x")
+    dev = f.stat().st_dev
+    mount_top = safe_delete._mount_top
+
+    # the home archive is on the same device: use it
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    assert safe_delete.archive_root(str(f), dev) == str(tmp_path / "archive")
+
+    # pretend it isn't (it can't even be created): the mount top gets a hidden archive
+    (tmp_path / "blocker").write_bytes(b"")
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(tmp_path / "blocker" / "archive"))
+    monkeypatch.setattr(safe_delete, "_mount_top", lambda path, st_dev: str(tmp_path / "mnt"))
+    renames = []
+    real_rename = os.rename
+    monkeypatch.setattr(safe_delete.os, "rename", lambda a, b: renames.append(a) or real_rename(a, b))
+    results = safe_delete.archive_many([str(f)])
+    root = tmp_path / "mnt" / safe_delete.MOUNT_ARCHIVE_NAME
+    assert results[0]["ok"] and not results[0]["copied"]
+    assert os.path.dirname(results[0]["archive_path"]) == str(root)
+    assert renames == [str(f)]
+
+    # the real mount top is the highest directory still on the same device
+    top = mount_top(str(f), dev)
+    parent = os.path.dirname(top)
+    assert os.stat(top).st_dev == dev
+    assert parent == top or os.stat(parent).st_dev != dev
+
+
+def test_archive_cross_device_copy_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    f = tmp_path / "a.txt"
+    f.write_text("data")
+
+    def exdev(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+    monkeypatch.setattr(safe_delete.os, "rename", exdev)
+    progress = []
+    results = safe_delete.archive_many([str(f)], on_progress=progress.append)
+    assert results[0]["ok"] and results[0]["copied"]
+    assert progress[-1]["copied"] == 1
+    assert not f.exists()
+    with open(results[0]["archive_path"]) as fh:
+        assert fh.read() == "data"
+
+
+def test_content_addressed_archive(tmp_path, monkeypatch):
+    from quickpurge import scanner
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    src = tmp_path / "src"
+    paths = []
+    for i in range(5):
+        f = src / f"d{i % 2}" / f"copy{i}.bin"
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_bytes(b"same content" * 100)
+        paths.append(str(f))
+    other = src / "other.bin"
+    other.write_bytes(b"different" * 100)
+    scan_id = scanner.scan_folder(str(src))
+
+    # the copies reuse the scan's digests; only other.bin (unique size, never hashed) is read
+    hashed = []
+    full_hash = scanner._full_hash
+    monkeypatch.setattr(scanner, "_full_hash", lambda path, *a: hashed.append(path) or full_hash(path, *a))
+    results = safe_delete.archive_many(paths + [str(other)], scan_id=scan_id, batch_size=2, dedup=True)
+    assert all(r["ok"] for r in results)
+    assert hashed == [str(other)]
+    assert [r["deduplicated"] for r in results] == [False, True, True, True, True, False]
+    assert database.get_archive_blob_usage() == (2, 1200 + 900)
+    blob_files = [os.path.join(d, f) for d, _, fs in os.walk(tmp_path / "archive") for f in fs]
+    assert len(blob_files) == 2
+    assert database.get_duplicate_groups(scan_id) == []
+
+    # dropping one reference keeps the blob; the last restore takes it
+    entries = [r["archive_path"] for r in results]
+    assert safe_delete.permanent_delete(entries[0])
+    assert database.get_archive_blob_usage() == (2, 2100)
+    restored = safe_delete.restore_many(entries[1:], batch_size=3)
+    assert all(r["ok"] for r in restored)
+    assert not os.path.exists(paths[0])
+    assert all(open(p, "rb").read() == b"same content" * 100 for p in paths[1:])
+    assert other.read_bytes() == b"different" * 100
+    assert database.get_archive_blob_usage() == (0, 0)
+    assert [f for _, _, fs in os.walk(tmp_path / "archive") for f in fs] == []
+
+
+def test_archive_refuses_archived_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    paths = []
+    for name in ("a", "b"):
+        f = tmp_path / name
+        f.write_bytes(b"shared")
+        paths.append(str(f))
+    results = safe_delete.archive_many(paths, dedup=True)
+    blob = database.get_archive_entry(results[0]["archive_path"])[7]
+
+    # e.g. a rescan that walked into the archive reports the blob as a duplicate
+    for path in (blob, str(tmp_path / "x" / safe_delete.MOUNT_ARCHIVE_NAME / "f")):
+        again = safe_delete.archive_many([path], dedup=True)
+        assert not again[0]["ok"] and again[0]["error"] == "already in the archive"
+    assert os.path.exists(blob)
+
+    # _absorb never deletes the blob it is absorbing into
+    outcome = safe_delete._absorb(blob, [(blob, blob)], False)
+    assert isinstance(outcome[0][1], ValueError) and os.path.exists(blob)
+
+    restored = safe_delete.restore_many([r["archive_path"] for r in results])
+    assert all(r["ok"] for r in restored)
+    assert all(open(p, "rb").read() == b"shared" for p in paths)
+
+
+def test_dedup_never_deletes_different_bytes(tmp_path, monkeypatch):
+    from quickpurge import scanner
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    paths = []
+    for name, data in (("a", b"same"), ("b", b"same"), ("c", b"diff")):
+        (tmp_path / name).write_bytes(data)
+        paths.append(str(tmp_path / name))
+
+    # a stale cache entry (or a collision) gives "c" the digest of the others
+    content_digests = safe_delete._content_digests
+    monkeypatch.setattr(safe_delete, "_content_digests", lambda planned, cache: ["d" * 64] * len(planned))
+    results = safe_delete.archive_many(paths, dedup=True)
+    assert all(r["ok"] for r in results)
+    assert [r["deduplicated"] for r in results] == [False, True, False]
+    assert database.get_archive_entry(results[2]["archive_path"])[7] is None
+    assert database.get_archive_blob_usage()[0] == 1
+    assert all(r["ok"] for r in safe_delete.restore_many([r["archive_path"] for r in results]))
+    assert [open(p, "rb").read() for p in paths] == [b"same", b"same", b"diff"]
+
+    # digests of a hash that isn't collision resistant never stand in for the bytes
+    monkeypatch.setattr(safe_delete, "_content_digests", content_digests)
+    scan_id = scanner.scan_folder(str(tmp_path), algorithm="md5")
+    results = safe_delete.archive_many(paths[:2], scan_id=scan_id, dedup=True)
+    assert all(r["ok"] and not r["deduplicated"] for r in results)
+    assert database.get_archive_blob_usage() == (0, 0)
+
+
+def test_interrupted_batches_are_reconciled(tmp_path, monkeypatch):
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    paths = []
+    for name in ("a", "b", "c"):
+        f = tmp_path / name
+        f.write_bytes(b"shared")
+        paths.append(str(f))
+    run_groups = safe_delete._run_groups
+
+    def crash_before(*args):
+        raise KeyboardInterrupt
+
+    def crash_after(*args):
+        run_groups(*args)
+        raise KeyboardInterrupt
+
+    # killed before the files moved: the pending rows and blob references go away
+    monkeypatch.setattr(safe_delete, "_run_groups", crash_before)
+    with pytest.raises(KeyboardInterrupt):
+        safe_delete.archive_many(paths[:2], dedup=True)
+    assert database.count_archive_entries()[0] == 2
+    assert safe_delete.reconcile_pending() == 2
+    assert database.count_archive_entries()[0] == 0
+    assert database.get_archive_blob_usage() == (0, 0)
+    assert all(os.path.exists(p) for p in paths)
+
+    # killed after the moves, before they were confirmed: the rows are kept
+    monkeypatch.setattr(safe_delete, "_run_groups", crash_after)
+    with pytest.raises(KeyboardInterrupt):
+        safe_delete.archive_many(paths, dedup=True)
+    safe_delete.ensure_manifest()
+    assert database.get_pending_archive_entries() == []
+    assert database.count_archive_entries()[0] == 3
+    assert database.get_archive_blob_usage()[0] == 1
+    assert not any(os.path.exists(p) for p in paths)
+
+    # an interrupted restore: restored entries are dropped and the blob freed
+    with pytest.raises(KeyboardInterrupt):
+        safe_delete.restore_many([e[1] for e in database.iter_archive_entries()])
+    assert safe_delete.reconcile_pending() == 3
+    assert database.count_archive_entries()[0] == 0
+    assert database.get_archive_blob_usage() == (0, 0)
+    assert all(open(p, "rb").read() == b"shared" for p in paths)
@@ -1,6 +1,6 @@
 import os
 import sqlite3
-from quickpurge import database, scanner
+from quickpurge import database, scanner, history
 import config
 
 def test_scan_finds_duplicates(tmp_path, monkeypatch):
@@ -37,3 +37,422 @@ def test_scan_finds_duplicates(tmp_path, monkeypatch):
         if str(f1) in joined and str(f2) in joined:
             found = True
     assert found, "Scanner did not record the identical files as duplicates"
+
+
+def test_scan_prunes_excluded_dirs(tmp_path, monkeypatch):
+    tmp_db = tmp_path / "test_quickpurge.db"
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_db))
+    database.init_db()
+
+    d = tmp_path / "folder"
+    (d / "node_modules" / "pkg").mkdir(parents=True)
+    (d / "backup").mkdir()
+    (d / "a.txt").write_bytes(b"same")
+    (d / "node_modules" / "pkg" / "b.txt").write_bytes(b"same")
+    (d / "backup" / "c.txt").write_bytes(b"same")
+    database.add_exclusion(str(d / "backup"))
+
+    events = []
+    scan_id = scanner.scan_folder(str(d), on_progress=events.append)
+
+    done = events[-1]
+    assert done["stage"] == "done" and done["scan_id"] == scan_id
+    assert done["dirs_pruned"] == 2
+    assert done["files_scanned"] == 1
+    assert database.get_all_duplicates(scan_id) == []
+
+
+def test_scan_skips_archive_folders(tmp_path, monkeypatch):
+    from quickpurge import safe_delete
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "test_quickpurge.db"))
+    database.init_db()
+    d = tmp_path / "folder"
+    monkeypatch.setattr(safe_delete, "ARCHIVE_DIR", str(d / "home_archive"))
+    (d / ".quickpurge_archive" / "blobs").mkdir(parents=True)
+    (d / "home_archive").mkdir()
+    (d / "a.txt").write_bytes(b"same")
+    (d / ".quickpurge_archive" / "blobs" / "b").write_bytes(b"same")
+    (d / "home_archive" / "c.txt").write_bytes(b"same")
+
+    events = []
+    scan_id = scanner.scan_folder(str(d), on_progress=events.append)
+    assert events[-1]["dirs_pruned"] == 2
+    assert events[-1]["files_scanned"] == 1
+    assert database.get_all_duplicates(scan_id) == []
+
+
+def test_rescan_uses_hash_cache(tmp_path, monkeypatch):
+    tmp_db = tmp_path / "test_quickpurge.db"
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_db))
+    database.init_db()
+
+    d = tmp_path / "folder"
+    d.mkdir()
+    (d / "a.bin").write_bytes(b"x" * 4096)
+    (d / "b.bin").write_bytes(b"x" * 4096)
+    (d / "c.bin").write_bytes(b"y" * 4096)
+
+    first = []
+    scanner.scan_folder(str(d), on_progress=first.append)
+    assert first[-1]["cache_hits"] == 0
+    assert first[-1]["cache_misses"] == 3
+
+    (d / "c.bin").unlink()
+    second = []
+    scan_id = scanner.scan_folder(str(d), on_progress=second.append)
+    done = second[-1]
+    assert done["cache_hits"] == 2 and done["cache_misses"] == 0
+    assert done["bytes_avoided"] == 2 * 4096
+    assert done["cache_evicted"] == 1
+    assert len(database.get_all_duplicates(scan_id)) == 1
+
+
+def test_cache_eviction_reuses_the_walk(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "test_quickpurge.db"))
+    database.init_db()
+    d = tmp_path / "folder"
+    d.mkdir()
+    (d / "a.bin").write_bytes(b"x" * 4096)
+    (d / "b.bin").write_bytes(b"x" * 4096)
+    scanner.scan_folder(str(d))
+
+    # a.bin now has a unique size: never looked up, so never "seen" by the cache
+    (d / "b.bin").unlink()
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda path, *a, **kw: stats.append(str(path)) or real_stat(path, *a, **kw))
+    events = []
+    scanner.scan_folder(str(d), on_progress=events.append)
+    assert events[-1]["cache_evicted"] == 1
+    assert str(d / "a.bin") not in stats  # the walk's stat is reused
+    assert str(d / "b.bin") in stats      # gone from the walk: checked on disk
+
+
+def test_sample_stage_eliminates_before_full_hash(tmp_path, monkeypatch):
+    tmp_db = tmp_path / "test_quickpurge.db"
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_db))
+    database.init_db()
+
+    size = 4 * scanner.SAMPLE_SIZE
+    d = tmp_path / "folder"
+    d.mkdir()
+    (d / "a.bin").write_bytes(b"a" * size)
+    (d / "b.bin").write_bytes(b"a" * size)
+    (d / "c.bin").write_bytes(b"c" + b"a" * (size - 1))  # differs in the head
+    (d / "small1").write_bytes(b"tiny")
+    (d / "small2").write_bytes(b"tiny")
+
+    events = []
+    scan_id = scanner.scan_folder(str(d), on_progress=events.append)
+    stages = events[-1]["stages"]
+
+    assert stages["sample"]["files"] == 3
+    assert stages["sample"]["eliminated"] == 1
+    assert stages["sample"]["bytes_read"] == 3 * 2 * scanner.SAMPLE_SIZE
+    # a.bin + b.bin (sampled) and the two small files (straight to full)
+    assert stages["full"]["files"] == 4
+    assert stages["full"]["bytes_read"] == 2 * size + 8
+    assert stages["full"]["eliminated"] == 0
+    assert len(database.get_all_duplicates(scan_id)) == 2
+
+
+def test_hardlinks_grouped_by_inode(tmp_path, monkeypatch):
+    tmp_db = tmp_path / "test_quickpurge.db"
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_db))
+    database.init_db()
+
+    d = tmp_path / "folder"
+    d.mkdir()
+    (d / "a.bin").write_bytes(b"payload" * 100)
+    os.link(d / "a.bin", d / "a_link.bin")
+    (d / "copy.bin").write_bytes(b"payload" * 100)
+    (d / "solo.bin").write_bytes(b"other" * 100)
+    os.link(d / "solo.bin", d / "solo_link.bin")
+
+    events = []
+    scan_id = scanner.scan_folder(str(d), on_progress=events.append)
+    done = events[-1]
+
+    assert done["files_scanned"] == 5
+    # a.bin's inode is hashed once, then compared with the real copy
+    assert done["cache_misses"] == 2
+    assert done["total_duplicates"] == 1
+    assert done["total_size_saved"] == 700
+    assert done["hardlink_sets"] == 2 and done["hardlinked_paths"] == 4
+
+    sets = sorted(sorted(os.path.basename(p) for p in paths)
+                  for paths, _ in database.get_hardlink_sets(scan_id))
+    assert sets == [["a.bin", "a_link.bin"], ["solo.bin", "solo_link.bin"]]
+
+
+def test_scan_streams_group_events(tmp_path, monkeypatch):
+    tmp_db = tmp_path / "test_quickpurge.db"
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_db))
+    database.init_db()
+
+    d = tmp_path / "folder"
+    d.mkdir()
+    for name in ("a", "b", "c"):
+        (d / name).write_bytes(b"three copies")
+
+    events = []
+    scanner.scan_folder(str(d), on_progress=events.append, workers=1)
+    groups = [e for e in events if e["stage"] in ("group_found", "group_extended")]
+
+    assert [e["stage"] for e in groups] == ["group_found", "group_extended"]
+    streamed = [row for e in groups for row in e["rows"]]
+    assert sorted(os.path.basename(p) for p, _, _ in streamed) == ["a", "b", "c"]
+    assert all(size == 12 and mtime > 0 for _, size, mtime in streamed)
+
+
+def test_scan_writes_each_group_once(tmp_path, monkeypatch):
+    tmp_db = tmp_path / "test_quickpurge.db"
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_db))
+    database.init_db()
+
+    d = tmp_path / "folder"
+    (d / "sub").mkdir(parents=True)
+    for name in ("a", "b", "sub/c"):
+        (d / name).write_bytes(b"three copies")
+    (d / "x").write_bytes(b"pair" * 10)
+    (d / "y").write_bytes(b"pair" * 10)
+
+    events = []
+    # the nested root is folded into its parent instead of being walked twice
+    scan_id = scanner.scan_folder([str(d), str(d / "sub")], on_progress=events.append)
+    done = events[-1]
+
+    groups = database.get_duplicate_groups(scan_id)
+    assert sorted(g[2:] for g in groups) == [(12, 3, 24), (40, 2, 40)]
+    assert database.count_duplicates(scan_id) == 5
+    assert done["total_duplicates"] == 3 and done["total_size_saved"] == 64
+    assert database.get_scan_history(limit=1)[0][3:5] == (3, 64)
+
+
+def test_scan_records_metrics(tmp_path, monkeypatch):
+    tmp_db = tmp_path / "test_quickpurge.db"
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_db))
+    database.init_db()
+
+    d = tmp_path / "folder"
+    d.mkdir()
+    for name in ("a", "b", "c"):
+        (d / name).write_bytes(b"same" * 50)
+    (d / "skip.tmp").write_bytes(b"same" * 50)
+    database.add_exclusion(".tmp", is_folder=False)
+
+    real_full_hash = scanner._full_hash
+
+    def flaky(path, *args):
+        if path.endswith("c"):
+            raise PermissionError(13, "denied", path)
+        return real_full_hash(path, *args)
+
+    monkeypatch.setattr(scanner, "_full_hash", flaky)
+    events = []
+    scan_id = scanner.scan_folder(str(d), on_progress=events.append, workers=1)
+
+    live = events[-1]["metrics"]
+    stored = history.get_scan_history(limit=1)[0]["metrics"]
+    assert stored == live and stored["status"] == "ok"
+    assert set(stored["phases"]) == {"walk", "exclusion", "grouping", "hashing", "db_write"}
+    assert stored["files_stated"] == 4 and stored["excluded_entries"] == 1
+    assert stored["files_hashed"] == 2 and stored["bytes_read"] == 400
+    assert stored["errors"] == {"PermissionError": 1}
+    assert stored["peak_rss_bytes"] is None or stored["peak_rss_bytes"] > 0
+    assert len(database.get_all_duplicates(scan_id)) == 1
+
+
+def _cancel_after(n):
+    calls = {"n": 0}
+
+    def cancelled():
+        calls["n"] += 1
+        return calls["n"] > n
+    return cancelled
+
+
+def test_cancelled_scan_resumes_from_checkpoint(tmp_path, monkeypatch):
+    from quickpurge import walker
+    tmp_db = tmp_path / "test_quickpurge.db"
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_db))
+    database.init_db()
+
+    d = tmp_path / "folder"
+    for i in range(4):
+        sub = d / f"sub{i}"
+        sub.mkdir(parents=True)
+        (sub / "a").write_bytes(b"copy" * (i + 1))
+        (sub / "b").write_bytes(b"copy" * (i + 1))
+    (d / "sub0" / "c").write_bytes(b"copy" * 4)
+
+    listed = []
+    real_list_dir = walker.list_dir
+
+    def recording(path):
+        listed.append(path)
+        return real_list_dir(path)
+
+    monkeypatch.setattr(walker, "list_dir", recording)
+    events = []
+    # cancelled after two directories have been walked
+    assert scanner.scan_folder(str(d), cancel_flag=_cancel_after(2), walk_threads=1,
+                               on_progress=events.append) is None
+    scan_id = events[-1]["resume_scan_id"]
+    assert database.load_checkpoint(scan_id)["phase"] == "walk"
+    assert [r[0] for r in database.get_resumable_scans()] == [scan_id]
+    assert len(listed) == 3
+
+    # a new scan keeps the interrupted one's checkpoint
+    database.prune_scan_results()
+    assert database.load_checkpoint(scan_id) is not None
+
+    assert scanner.resume_scan(scan_id, walk_threads=1, on_progress=events.append) == scan_id
+    assert sorted(listed) == sorted(set(listed)) and len(listed) == 5  # nothing listed twice
+    groups = database.get_duplicate_groups(scan_id)
+    assert sorted(g[2:] for g in groups) == [(4, 2, 4), (8, 2, 8), (12, 2, 12), (16, 3, 32)]
+    assert events[-1]["metrics"]["resumed"] is True
+    assert events[-1]["files_scanned"] == 9
+    assert database.load_checkpoint(scan_id) is None
+    assert database.get_resumable_scans() == []
+
+
+def test_resume_skips_finished_buckets(tmp_path, monkeypatch):
+    tmp_db = tmp_path / "test_quickpurge.db"
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_db))
+    database.init_db()
+
+    d = tmp_path / "folder"
+    d.mkdir()
+    for size in (10, 20, 30):
+        (d / f"a{size}").write_bytes(b"x" * size)
+        (d / f"b{size}").write_bytes(b"x" * size)
+
+    hashed = []
+    real_full_hash = scanner._full_hash
+
+    def recording(path, *args):
+        hashed.append(path)
+        return real_full_hash(path, *args)
+
+    monkeypatch.setattr(scanner, "_full_hash", recording)
+    events = []
+    # cancelled once the first bucket has been hashed
+    scanner.scan_folder(str(d), workers=1, on_progress=events.append,
+                        cancel_flag=lambda: sum(e["stage"] == "hashing" for e in events) >= 2)
+    scan_id = events[-1]["resume_scan_id"]
+    checkpoint = database.load_checkpoint(scan_id)
+    assert checkpoint["phase"] == "hash"
+    done = database.get_done_buckets(scan_id)
+    assert done and len(done) < 3
+
+    hashed.clear()
+    assert scanner.resume_scan(scan_id, workers=1) == scan_id
+    assert not any(os.path.getsize(p) in done for p in hashed)
+    groups = database.get_duplicate_groups(scan_id)
+    assert sorted(g[2:] for g in groups) == [(10, 2, 10), (20, 2, 20), (30, 2, 30)]
+    assert database.get_scan_history(limit=1)[0][3:5] == (3, 60)
+
+
+def test_crash_ending_walk_keeps_hardlinks(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "test_quickpurge.db"))
+    database.init_db()
+    d = tmp_path / "folder"
+    d.mkdir()
+    (d / "a").write_bytes(b"linked")
+    os.link(d / "a", d / "b")
+
+    real_save = database.save_checkpoint
+
+    def crashing(scan_id, phase, *args, **kwargs):
+        real_save(scan_id, phase, *args, **kwargs)
+        if phase == "hash":
+            raise RuntimeError("crash right after the walk's last checkpoint")
+
+    monkeypatch.setattr(database, "save_checkpoint", crashing)
+    import pytest
+    with pytest.raises(RuntimeError):
+        scanner.scan_folder(str(d))
+    monkeypatch.setattr(database, "save_checkpoint", real_save)
+    scan_id = database.get_resumable_scans()[0][0]
+    assert database.load_checkpoint(scan_id)["phase"] == "hash"
+
+    assert scanner.resume_scan(scan_id) == scan_id
+    assert [sorted(paths) for paths, _ in database.get_hardlink_sets(scan_id)] == [[str(d / "a"), str(d / "b")]]
+
+
+def test_resumed_incremental_scan_stays_incremental(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "test_quickpurge.db"))
+    database.init_db()
+    d = tmp_path / "folder"
+    for i in range(3):
+        (d / f"sub{i}").mkdir(parents=True)
+        (d / f"sub{i}" / "f").write_bytes(b"x")
+
+    events = []
+    assert scanner.scan_folder(str(d), incremental=True, walk_threads=1,
+                               cancel_flag=_cancel_after(1), on_progress=events.append) is None
+    scan_id = events[-1]["resume_scan_id"]
+    assert database.load_checkpoint(scan_id)["incremental"] is True
+
+    indexes = []
+
+    class RecordingIndex(database.DirIndex):
+        def __init__(self, *args, **kwargs):
+            indexes.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(database, "DirIndex", RecordingIndex)
+    assert scanner.resume_scan(scan_id, walk_threads=1) == scan_id
+    assert len(indexes) == 1
+
+
+def test_resume_without_checkpoint_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "test_quickpurge.db"))
+    database.init_db()
+    scan_id = scanner.scan_folder(str(tmp_path))
+    import pytest
+    with pytest.raises(ValueError):
+        scanner.resume_scan(scan_id)
+
+
+def test_incremental_scan_reuses_unchanged_dirs(tmp_path, monkeypatch):
+    tmp_db = tmp_path / "test_quickpurge.db"
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_db))
+    database.init_db()
+
+    d = tmp_path / "folder"
+    for name in ("x", "y", "z"):
+        (d / name).mkdir(parents=True)
+        (d / name / "a").write_bytes(b"same" * 10)
+    (d / "z" / "b").write_bytes(b"diff" * 10)
+    old = 1_600_000_000
+
+    def age():
+        # snapshots of directories modified moments ago are not trusted
+        for p in [d, *d.iterdir()]:
+            os.utime(p, (old, old))
+
+    age()
+    first = []
+    scanner.scan_folder(str(d), incremental=True, walk_threads=1, on_progress=first.append)
+    assert first[-1]["dirs_reused"] == 0  # first walk is the full verify
+    assert first[-1]["total_duplicates"] == 2
+
+    (d / "y" / "new").write_bytes(b"same" * 10)  # y's mtime changes
+    (d / "z" / "b").write_bytes(b"same" * 10)    # in place: z's mtime does not
+    age()
+    os.utime(d / "y", None)
+    second = []
+    scanner.scan_folder(str(d), incremental=True, walk_threads=1, on_progress=second.append)
+    done = second[-1]
+    assert done["dirs_reused"] == 3  # root, x and z
+    assert done["metrics"]["files_reused"] == 3
+    # the in-place change is caught by re-stat'ing candidates before hashing
+    assert done["total_duplicates"] == 4
+
+    # once the verify interval has passed everything is listed again
+    monkeypatch.setattr(scanner, "FULL_VERIFY_INTERVAL", 0)
+    third = []
+    scanner.scan_folder(str(d), incremental=True, walk_threads=1, on_progress=third.append)
+    assert third[-1]["dirs_reused"] == 0 and third[-1]["total_duplicates"] == 4
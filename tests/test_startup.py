@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# cumulative import time budget for the headless entry point (microseconds)
+IMPORT_BUDGET_US = 250_000
+HEAVY = ("PIL", "plyer", "PySimpleGUI", "tkinter", "multiprocessing", "quickpurge.ui")
+
+
+def _python(code, *flags):
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=ROOT,
+                          capture_output=True, text=True)
+
+
+def test_import_has_no_side_effects():
+    code = (
+        "import os, sys\n"
+        "def refuse(*args, **kwargs): raise AssertionError(f'makedirs at import time: {args}')\n"
+        "os.makedirs = refuse\n"
+        "import config, quickpurge, quickpurge.cli\n"
+        f"heavy = [m for m in {HEAVY!r} if m in sys.modules]\n"
+        "assert not heavy, heavy\n"
+    )
+    proc = _python(code)
+    assert proc.returncode == 0, proc.stderr
+
+    # bare package import loads no submodules at all
+    proc = _python("import sys, quickpurge; print(sorted(m for m in sys.modules if m.startswith('quickpurge.')))")
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "[]"
+
+
+def test_import_time_budget():
+    proc = _python("import quickpurge.cli", "-X", "importtime")
+    assert proc.returncode == 0, proc.stderr
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cum, name = line[len("import time:"):].split("|")
+            if cum.strip().isdigit():
+                cumulative[name.strip()] = int(cum)
+    assert cumulative["quickpurge.cli"] < IMPORT_BUDGET_US, cumulative["quickpurge.cli"]
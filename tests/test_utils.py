@@ -0,0 +1,65 @@
+import hashlib
+import tracemalloc
+from quickpurge.utils import file_chunks, file_buffers, adaptive_chunk_size
+
+CHUNK = 1024 * 1024
+
+
+def _consume(path, chunks):
+    h = hashlib.blake2b()
+    fresh = 0      # bytes objects allocated by read()
+    buffers = []   # distinct buffers behind the yielded memoryviews
+    tracemalloc.start()
+    with open(path, "rb", buffering=0) as f:
+        for data in chunks(f):
+            h.update(data)
+            if isinstance(data, memoryview):
+                if not any(data.obj is b for b in buffers):
+                    buffers.append(data.obj)
+            else:
+                fresh += 1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return h.hexdigest(), fresh + len(buffers), peak
+
+
+def _read_all(path, chunks):
+    # each chunk is copied before the next read can reuse its buffer
+    with open(path, "rb", buffering=0) as f:
+        return b"".join(bytes(data) for data in chunks(f))
+
+
+def test_file_buffers_vs_file_chunks(tmp_path):
+    path = tmp_path / "big.bin"
+    size = 24 * CHUNK + 123
+    content = bytes(range(256)) * (size // 256) + b"x" * (size % 256)
+    path.write_bytes(content)
+
+    old = _consume(path, lambda f: file_chunks(f, CHUNK))
+    serial = _consume(path, lambda f: file_buffers(f, CHUNK, threaded=False))
+    threaded = _consume(path, lambda f: file_buffers(f, CHUNK, threaded=True))
+
+    # same bytes, in order, and the same digest
+    for threaded_reads in (False, True):
+        assert _read_all(path, lambda f: file_buffers(f, CHUNK, threaded=threaded_reads)) == content
+    assert old[0] == serial[0] == threaded[0]
+    # allocations: one new bytes object per chunk vs. two reused buffers
+    assert old[1] >= 24
+    assert serial[1] == 1
+    assert threaded[1] == 2
+    assert threaded[2] <= 2 * CHUNK + 256 * 1024
+    # throughput is measured by the benchmarks (python -m benchmarks), not asserted here
+
+
+def test_file_buffers_early_stop_and_chunk_sizes(tmp_path):
+    path = tmp_path / "f.bin"
+    path.write_bytes(b"a" * (5 * CHUNK))
+    with open(path, "rb") as f:
+        gen = file_buffers(f, CHUNK)
+        first = next(gen)
+        assert len(first) == CHUNK
+        gen.close()  # reader thread must be joined, not left reading a closed file
+
+    assert adaptive_chunk_size(10, CHUNK) == 10
+    assert adaptive_chunk_size(5 * CHUNK, CHUNK) == CHUNK
+    assert adaptive_chunk_size(100 * CHUNK, CHUNK) == 4 * CHUNK
@@ -0,0 +1,30 @@
+import os
+from quickpurge.walker import Walker
+
+
+def test_walker_serial_and_threaded_agree(tmp_path):
+    for i in range(5):
+        sub = tmp_path / f"d{i}" / "inner"
+        sub.mkdir(parents=True)
+        (sub / "f.txt").write_bytes(b"x" * i)
+        (tmp_path / f"d{i}" / "g.txt").write_bytes(b"y")
+    (tmp_path / "skip").mkdir()
+    (tmp_path / "skip" / "hidden.txt").write_bytes(b"z")
+    os.symlink(tmp_path / "d0" / "g.txt", tmp_path / "link.txt")
+
+    def prune(path):
+        return os.path.basename(path) == "skip"
+
+    found = {}
+    for threads in (1, 4):
+        walker = Walker(prune=prune, threads=threads)
+        entries = [e for _, _, files in walker.walk(str(tmp_path)) for e in files]
+        found[threads] = sorted(entries)
+        assert walker.dirs_pruned == 1
+        assert walker.dirs_listed == 11
+
+    assert found[1] == found[4]
+    assert len(found[1]) == 10
+    for e in found[1]:
+        st = os.stat(e.path)
+        assert (e.st_size, e.st_ino, e.st_dev, e.st_mtime_ns) == (st.st_size, st.st_ino, st.st_dev, st.st_mtime_ns)
@@ -0,0 +1,147 @@
+import os
+import shutil
+import sys
+import time
+
+import pytest
+
+import config
+from quickpurge import database, watcher
+
+
+def _groups(scan_id):
+    return sorted((size, count) for _, _, size, count, _ in database.get_duplicate_groups(scan_id))
+
+
+def _wait_for(w, predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        w.step(timeout=0.2)
+        if predicate():
+            return True
+    return predicate()
+
+
+@pytest.mark.parametrize("backend", ["poll", "inotify"])
+def test_watch_keeps_groups_live(tmp_path, monkeypatch, backend):
+    if backend == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux only")
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    d = tmp_path / "folder"
+    (d / "sub").mkdir(parents=True)
+    (d / "a").write_bytes(b"original" * 10)
+    (d / "b").write_bytes(b"unique!!" * 10)  # same size, different bytes
+
+    w = watcher.Watcher(str(d), backend=backend, poll_interval=0.2, settle=0.1, workers=1)
+    try:
+        scan_id = w.start()
+        assert type(w.backend).__name__ == ("PollingBackend" if backend == "poll" else "InotifyBackend")
+        assert _groups(scan_id) == []
+
+        # a copy appears: the pair is grouped without a rescan
+        shutil.copy(d / "a", d / "sub" / "a-copy")
+        assert _wait_for(w, lambda: _groups(scan_id) == [(80, 2)])
+
+        # a new directory with another copy joins the same group
+        (d / "new").mkdir()
+        shutil.copy(d / "a", d / "new" / "a2")
+        assert _wait_for(w, lambda: _groups(scan_id) == [(80, 3)])
+        assert database.get_scan_history(limit=1)[0][3:5] == (2, 160)
+
+        # rewriting a member in place moves it to another group
+        (d / "b").write_bytes(b"original" * 10)
+        assert _wait_for(w, lambda: _groups(scan_id) == [(80, 4)])
+
+        # deletions dissolve the group
+        os.remove(d / "sub" / "a-copy")
+        shutil.rmtree(d / "new")
+        (d / "b").write_bytes(b"changed" * 3)
+        assert _wait_for(w, lambda: _groups(scan_id) == [])
+        assert database.get_scan_history(limit=1)[0][3:5] == (0, 0)
+    finally:
+        w.close()
+
+
+def test_open_backend_rejects_unknown(tmp_path):
+    with pytest.raises(ValueError):
+        watcher.open_backend([str(tmp_path)], backend="fsevents")
+
+
+def test_live_index_moves_file_between_groups(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    d = tmp_path / "folder"
+    (d / "sub").mkdir(parents=True)
+    for name in ("a1", "a2", "a3"):
+        (d / name).write_bytes(b"aaaa" * 10)
+    for name in ("b1", "sub/b2"):
+        (d / name).write_bytes(b"bbbb" * 10)
+    from quickpurge import scanner
+    scan_id = scanner.scan_folder(str(d), workers=1)
+    index = watcher.LiveIndex(scan_id, [str(d)])
+    index.load()
+    try:
+        # a3 now has b's content: it leaves one group and joins the other in one update
+        (d / "a3").write_bytes(b"bbbb" * 10)
+        os.utime(d / "a3", ns=(1, 1))
+        changes = index.update([("changed", str(d / "a3"))])
+        assert sorted(len(c["paths"]) for c in changes) == [2, 3]
+        assert _groups(scan_id) == [(40, 2), (40, 3)]
+        # and back (rows are rewritten in the other group order this time)
+        (d / "a3").write_bytes(b"aaaa" * 10)
+        os.utime(d / "a3", ns=(2, 2))
+        index.update([("changed", str(d / "a3"))])
+        assert _groups(scan_id) == [(40, 2), (40, 3)]
+        (d / "a3").write_bytes(b"bbbb" * 10)
+        os.utime(d / "a3", ns=(3, 3))
+        index.update([("changed", str(d / "a3"))])
+
+        # exclusions edited while watching apply on the next update
+        database.add_exclusion(str(d / "sub"))
+        index.update([])
+        assert _groups(scan_id) == [(40, 2), (40, 2)]
+    finally:
+        index.close()
+
+
+def test_live_index_reuses_the_scan_walk(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    d = tmp_path / "folder"
+    (d / "sub" / "deep").mkdir(parents=True)
+    for name in ("a", "sub/b", "sub/deep/c"):
+        (d / name).write_bytes(b"same" * 10)
+
+    walks = []
+    real_walker = watcher.Walker
+
+    def counting(*args, **kwargs):
+        walks.append(args)
+        return real_walker(*args, **kwargs)
+
+    monkeypatch.setattr(watcher, "Walker", counting)
+    w = watcher.Watcher(str(d), backend="poll", poll_interval=60, workers=1)
+    try:
+        scan_id = w.start()
+        assert len(walks) == 1  # the polling backend's snapshot; the index reuses the scan's walk
+        assert _groups(scan_id) == [(40, 3)]
+        index = w.index
+        # a file event re-stats that file only; a vanished directory takes its files along
+        assert index._expand([("changed", str(d / "a"))]) == {str(d / "a")}
+        assert index._expand([("deleted", str(d / "sub"))]) == {
+            str(d / "sub"), str(d / "sub" / "b"), str(d / "sub" / "deep" / "c")}
+        shutil.rmtree(d / "sub")
+        index.update([("deleted", str(d / "sub"))])
+        assert _groups(scan_id) == []
+        assert str(d / "sub") not in index.tree and index._files_under(str(d)) == [str(d / "a")]
+    finally:
+        w.close()
+
+
+def test_watch_cancels_the_initial_scan(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.sqlite"))
+    database.init_db()
+    (tmp_path / "folder").mkdir()
+    (tmp_path / "folder" / "a").write_bytes(b"x")
+    assert watcher.watch(str(tmp_path / "folder"), backend="poll", cancel_flag=lambda: True) is None